@@ -0,0 +1,143 @@
+import json
+import threading
+
+from django.conf import settings
+from .llm import cached_response, complete_chat, store_response, stream_chat
+from .utils import build_recommendations_prompt, get_fallback_recommendations, parse_recommendations_from_text
+
+
+def iter_json_objects(chunks):
+    """
+    Yield each top-level object of a JSON array as soon as its closing brace
+    arrives in a stream of text chunks, so a streamed reply can be shown
+    piece by piece. Text outside objects (prose, code fences) is skipped;
+    objects that fail to parse are dropped.
+    """
+    buffer = []
+    depth = 0
+    in_string = escaped = False
+    for chunk in chunks:
+        for char in chunk:
+            if depth:
+                buffer.append(char)
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"' and depth:
+                in_string = True
+            elif char == '{':
+                if not depth:
+                    buffer = [char]
+                depth += 1
+            elif char == '}' and depth:
+                depth -= 1
+                if not depth:
+                    try:
+                        yield json.loads(''.join(buffer))
+                    except ValueError:
+                        pass
+
+def is_recommendation(item):
+    return isinstance(item, dict) and bool(item.get('title'))
+
+
+class AIBackend:
+    """
+    Turns an analytics snapshot into recommendations. `recommendations`
+    returns the whole list (or None on failure); `stream_recommendations`
+    yields them one at a time as they become available.
+    """
+    name = ''
+    label = 'AI Analytics Engine'
+
+    def recommendations(self, analytics_data):
+        raise NotImplementedError
+
+    def stream_recommendations(self, analytics_data):
+        yield from self.recommendations(analytics_data) or []
+
+
+class ChatCompletionsBackend(AIBackend):
+    """Any OpenAI-compatible /v1/chat/completions endpoint."""
+
+    def __init__(self, name, url, model, api_key='', label=None, max_tokens=1200, temperature=0.7, top_p=0.95, timeout=None):
+        self.name = name
+        self.url = url
+        self.model = model
+        self.api_key = api_key
+        self.label = label or self.label
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.top_p = top_p
+        self.timeout = timeout
+
+    def headers(self):
+        return {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+
+    def payload(self, analytics_data):
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "user", "content": build_recommendations_prompt(analytics_data)}
+            ],
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+        }
+
+    def recommendations(self, analytics_data):
+        return complete_chat(
+            self.url, self.headers(), self.payload(analytics_data),
+            parse_recommendations_from_text, timeout=self.timeout,
+        )
+
+    def stream_recommendations(self, analytics_data):
+        payload = self.payload(analytics_data)
+        cached = cached_response(self.url, payload)
+        if cached is not None:
+            yield from cached
+            return
+
+        # stream_chat raises StreamInterrupted on a broken stream, so only a
+        # reply that ran to its end is cached
+        streamed = []
+        for item in iter_json_objects(stream_chat(self.url, self.headers(), payload, timeout=self.timeout)):
+            if is_recommendation(item):
+                streamed.append(item)
+                yield item
+        if streamed:
+            store_response(self.url, payload, streamed)
+
+
+class RulesBackend(AIBackend):
+    """Deterministic threshold rules; no network, same answer for the same snapshot."""
+    label = 'Rules engine'
+
+    def __init__(self, name='rules', **options):
+        self.name = name
+
+    def recommendations(self, analytics_data):
+        return get_fallback_recommendations(analytics_data)
+
+
+BACKEND_CLASSES = {
+    'chat_completions': ChatCompletionsBackend,
+    'rules': RulesBackend,
+}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+def get_ai_backend(name=None):
+    """Backend `name` from settings.AI_BACKENDS (default settings.AI_BACKEND), built once per process."""
+    name = name or getattr(settings, 'AI_BACKEND', 'remote')
+    with _backends_lock:
+        if name not in _backends:
+            options = dict(settings.AI_BACKENDS[name])
+            backend_class = BACKEND_CLASSES[options.pop('type')]
+            _backends[name] = backend_class(name=name, **options)
+        return _backends[name]
@@ -0,0 +1,97 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+SNAPSHOT_PREFIX = 'analytics:snapshot'
+
+# Models whose changes make a cached snapshot stale
+SNAPSHOT_MODELS = [
+    'billing.Payment',
+    'billing.Folio',
+    'reservations.Reservation',
+    'rooms.Room',
+    'guests.Guest',
+    'analytics.DailyMetrics',
+]
+
+SNAPSHOT_NAMES = [
+    'analytics_dashboard',
+    'revenue_analytics',
+    'guest_insights',
+    'performance_report',
+    'billing_dashboard',
+]
+
+
+def _version_key(label):
+    return f'{SNAPSHOT_PREFIX}:version:{label}'
+
+def _stats_key(name, outcome):
+    return f'{SNAPSHOT_PREFIX}:stats:{name}:{outcome}'
+
+def _increment(key, initial):
+    if cache.add(key, initial, None):
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, initial, None)
+
+def _versions(labels):
+    """
+    Current version of each model. A version that has been evicted restarts
+    from the clock so it can never line up with an older cached snapshot.
+    """
+    keys = [_version_key(label) for label in labels]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+def snapshot_ttl():
+    return getattr(settings, 'ANALYTICS_SNAPSHOT_TTL', 300)
+
+def cached_snapshot(name, window, build, models=SNAPSHOT_MODELS):
+    """
+    Return the snapshot `name` for the date `window`, calling `build()` only
+    when there is no cached copy. The key carries the version of every model
+    in `models`, so bumping a version (see invalidate_snapshots) retires all
+    snapshots built from it; the TTL bounds staleness for changes that
+    bypass the signals, such as queryset.update().
+    """
+    key = ':'.join(
+        [SNAPSHOT_PREFIX, name]
+        + [str(part) for part in window]
+        + [str(version) for version in _versions(models)]
+    )
+    data = cache.get(key)
+    if data is None:
+        _increment(_stats_key(name, 'misses'), 1)
+        data = build()
+        cache.set(key, data, snapshot_ttl())
+    else:
+        _increment(_stats_key(name, 'hits'), 1)
+    return data
+
+def invalidate_snapshots(label):
+    _increment(_version_key(label), time.time_ns())
+
+def snapshot_stats():
+    keys = [_stats_key(name, outcome) for name in SNAPSHOT_NAMES for outcome in ('hits', 'misses')]
+    counts = cache.get_many(keys)
+    stats = {}
+    for name in SNAPSHOT_NAMES:
+        hits = counts.get(_stats_key(name, 'hits'), 0)
+        misses = counts.get(_stats_key(name, 'misses'), 0)
+        stats[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses) * 100, 1) if hits + misses else 0.0,
+        }
+    return stats
+
+def reset_snapshot_stats():
+    cache.delete_many([_stats_key(name, outcome) for name in SNAPSHOT_NAMES for outcome in ('hits', 'misses')])
@@ -0,0 +1,239 @@
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import Count
+from core.utils import hotel_today
+from reservations.models import RoomNight
+from rooms.models import Room
+from .models import DailyMetrics
+from .utils import save_ai_report
+
+FORECAST_HORIZONS = [30, 60, 90]
+# Smoothing weight of the newest day in the deseasonalised level
+SMOOTHING_ALPHA = 0.2
+# History used for day-of-week indices and the pickup curve
+SEASON_DAYS = 364
+PICKUP_DAYS = 365
+
+
+def weekday_indices(values, weekdays):
+    """Multiplicative day-of-week indices (average 1) of a daily series."""
+    totals = np.bincount(weekdays, weights=values, minlength=7)
+    counts = np.bincount(weekdays, minlength=7)
+    means = np.divide(totals, counts, out=np.zeros(7), where=counts > 0)
+    overall = values.mean() if len(values) else 0
+    if overall <= 0:
+        return np.ones(7)
+    indices = means / overall
+    indices[counts == 0] = 1.0
+    return indices
+
+def smoothed_level(values, alpha=SMOOTHING_ALPHA):
+    """
+    Final level of simple exponential smoothing (seeded with the first
+    value), computed as a single weighted sum instead of a loop.
+    """
+    n = len(values)
+    if not n:
+        return 0.0
+    weights = alpha * (1 - alpha) ** np.arange(n - 1, -1, -1)
+    weights[0] = (1 - alpha) ** (n - 1)
+    return float(weights @ values)
+
+def seasonal_forecast(values, first_weekday, horizon, alpha=SMOOTHING_ALPHA):
+    """
+    Forecast the `horizon` days after a daily series: the exponentially
+    smoothed level of the series with day-of-week seasonality taken out,
+    multiplied back by each future day's weekday index.
+    """
+    values = np.asarray(values, dtype=float)
+    weekdays = (first_weekday + np.arange(len(values))) % 7
+    recent = slice(-SEASON_DAYS, None)
+    indices = weekday_indices(values[recent], weekdays[recent])
+    seasonal = indices[weekdays]
+    deseasonalised = np.divide(values, seasonal, out=values.copy(), where=seasonal > 0)
+    level = smoothed_level(deseasonalised, alpha)
+    future_weekdays = (first_weekday + len(values) + np.arange(horizon)) % 7
+    return np.maximum(level * indices[future_weekdays], 0.0)
+
+def pickup_curve(lead_days, max_lead):
+    """
+    Share of a night's final bookings that are usually on the books `h`
+    days before it, for h = 0..max_lead, from the lead times of past room
+    nights. None without history.
+    """
+    lead_days = np.asarray(lead_days, dtype=np.intp)
+    if not len(lead_days):
+        return None
+    counts = np.bincount(np.clip(lead_days, 0, max_lead), minlength=max_lead + 1)
+    booked_by = counts[::-1].cumsum()[::-1]
+    return booked_by / booked_by[0]
+
+def forecast_series(occupied, revenue, first_weekday, horizon, total_rooms, on_the_books=None, curve=None, alpha=SMOOTHING_ALPHA):
+    """
+    Occupied rooms and revenue for the `horizon` days after the history.
+    The seasonal baseline is combined with rooms already on the books:
+    forecast = on the books + the share of the baseline that usually
+    books later (or the baseline alone when no pickup curve is known).
+    Revenue scales with the adjusted room count.
+    Returns (occupied, revenue, baseline occupied) arrays.
+    """
+    baseline_rooms = seasonal_forecast(occupied, first_weekday, horizon, alpha)
+    baseline_revenue = seasonal_forecast(revenue, first_weekday, horizon, alpha)
+    rooms = baseline_rooms
+    if on_the_books is not None:
+        on_the_books = np.asarray(on_the_books, dtype=float)
+        if curve is not None:
+            leads = np.minimum(np.arange(horizon), len(curve) - 1)
+            rooms = on_the_books + (1 - curve[leads]) * baseline_rooms
+        # Never forecast fewer rooms than are already booked
+        rooms = np.maximum(rooms, on_the_books)
+    rooms = np.minimum(rooms, total_rooms) if total_rooms else rooms
+    scale = np.divide(rooms, baseline_rooms, out=np.ones(horizon), where=baseline_rooms > 0)
+    return rooms, baseline_revenue * scale, baseline_rooms
+
+
+def load_history(end_date, days=730):
+    """
+    (first date, occupied rooms, revenue) from DailyMetrics up to end_date.
+    Days missing from the table carry the previous day's figures.
+    """
+    rows = list(
+        DailyMetrics.objects.filter(date__range=(end_date - timedelta(days=days - 1), end_date))
+        .order_by('date').values_list('date', 'occupied_rooms', 'total_revenue')
+    )
+    if not rows:
+        return None, np.zeros(0), np.zeros(0)
+    first = rows[0][0]
+    length = (end_date - first).days + 1
+    table = np.full((length, 2), np.nan)
+    for date, occupied, revenue in rows:
+        table[(date - first).days] = [occupied, float(revenue)]
+    filled = np.where(np.isnan(table[:, 0]), 0, np.arange(length))
+    table = table[np.maximum.accumulate(filled)]
+    return first, table[:, 0], table[:, 1]
+
+def rooms_on_the_books(start_date, horizon):
+    counts = dict(
+        RoomNight.objects.filter(date__gte=start_date, date__lt=start_date + timedelta(days=horizon))
+        .order_by().values('date').annotate(rooms=Count('id')).values_list('date', 'rooms')
+    )
+    return np.array([counts.get(start_date + timedelta(days=i), 0) for i in range(horizon)], dtype=float)
+
+def booking_lead_days(end_date, days=PICKUP_DAYS):
+    """Days between booking and stay for every room night in the period before end_date."""
+    nights = RoomNight.objects.filter(
+        date__gt=end_date - timedelta(days=days),
+        date__lte=end_date,
+        reservation__business_date__isnull=False,
+    ).values_list('date', 'reservation__business_date')
+    return np.array([(night - booked).days for night, booked in nights.iterator(chunk_size=5000)], dtype=np.intp)
+
+def build_forecast(horizon=max(FORECAST_HORIZONS), today=None):
+    """
+    Daily occupancy and revenue forecast from today for `horizon` days,
+    trained on DailyMetrics up to yesterday. None without history.
+    """
+    today = today or hotel_today()
+    first, occupied, revenue = load_history(today - timedelta(days=1))
+    if first is None:
+        return None
+    total_rooms = Room.objects.count()
+    on_the_books = rooms_on_the_books(today, horizon)
+    curve = pickup_curve(booking_lead_days(today - timedelta(days=1)), horizon)
+    rooms, revenue_forecast, baseline = forecast_series(
+        occupied, revenue, first.weekday(), horizon, total_rooms, on_the_books, curve,
+    )
+    rates = rooms / total_rooms * 100 if total_rooms else np.zeros(horizon)
+    return {
+        'start': today,
+        'training_days': len(occupied),
+        'total_rooms': total_rooms,
+        'dates': [today + timedelta(days=i) for i in range(horizon)],
+        'occupied': rooms,
+        'occupancy_rate': rates,
+        'revenue': revenue_forecast,
+        'baseline': baseline,
+        'on_the_books': on_the_books,
+    }
+
+def summarise_forecast(forecast):
+    horizons = {}
+    for days in FORECAST_HORIZONS:
+        window = slice(0, days)
+        horizons[str(days)] = {
+            'occupancy_rate': round(float(forecast['occupancy_rate'][window].mean()), 2),
+            'room_nights': round(float(forecast['occupied'][window].sum()), 1),
+            'on_the_books': int(forecast['on_the_books'][window].sum()),
+            'revenue': round(float(forecast['revenue'][window].sum()), 2),
+        }
+    return horizons
+
+def forecast_recommendations(forecast):
+    """Flag the weakest and strongest upcoming weeks."""
+    recommendations = []
+    rates = forecast['occupancy_rate'][:28]
+    if len(rates) < 7:
+        return recommendations
+    weekly = rates[:len(rates) // 7 * 7].reshape(-1, 7).mean(axis=1)
+    low, high = int(weekly.argmin()), int(weekly.argmax())
+    if weekly[low] < 50:
+        start = forecast['dates'][low * 7]
+        recommendations.append({
+            'type': 'warning',
+            'title': 'Soft Week Ahead',
+            'message': f'Occupancy for the week of {start:%b %d} is forecast at {weekly[low]:.0f}%. Open promotional rates or packages for those dates now.',
+            'action': 'Launch Promotion',
+            'priority': 'high',
+        })
+    if weekly[high] > 85:
+        start = forecast['dates'][high * 7]
+        recommendations.append({
+            'type': 'success',
+            'title': 'Peak Week Forecast',
+            'message': f'Occupancy for the week of {start:%b %d} is forecast at {weekly[high]:.0f}%. Raise rates and restrict discounted channels for those dates.',
+            'action': 'Adjust Pricing',
+            'priority': 'medium',
+        })
+    return recommendations
+
+def save_forecast_report(forecast):
+    horizons = summarise_forecast(forecast)
+    insights = {
+        f'next {days} days': f"{figures['occupancy_rate']}% occupancy, ₦{figures['revenue']:,.0f} revenue ({figures['on_the_books']} room nights on the books)"
+        for days, figures in horizons.items()
+    }
+    daily = [
+        {
+            'date': date.isoformat(),
+            'occupancy_rate': round(float(rate), 2),
+            'occupied_rooms': round(float(rooms), 1),
+            'on_the_books': int(booked),
+            'revenue': round(float(revenue), 2),
+        }
+        for date, rate, rooms, booked, revenue in zip(
+            forecast['dates'], forecast['occupancy_rate'], forecast['occupied'],
+            forecast['on_the_books'], forecast['revenue'],
+        )
+    ]
+    first_month = horizons[str(FORECAST_HORIZONS[0])]
+    return save_ai_report(
+        report_type='revenue',
+        title=f"Revenue Forecast - {forecast['start']}",
+        summary=(
+            f"Over the next {FORECAST_HORIZONS[0]} days occupancy is forecast at {first_month['occupancy_rate']}% "
+            f"with ₦{first_month['revenue']:,.0f} in revenue, based on {forecast['training_days']} days of history "
+            f"and the rooms already on the books."
+        ),
+        data={
+            'start': forecast['start'].isoformat(),
+            'training_days': forecast['training_days'],
+            'total_rooms': forecast['total_rooms'],
+            'model': {'smoothing_alpha': SMOOTHING_ALPHA, 'season_days': SEASON_DAYS},
+            'horizons': horizons,
+            'daily': daily,
+        },
+        insights=insights,
+        recommendations=forecast_recommendations(forecast),
+        generated_by='Forecasting engine',
+    )
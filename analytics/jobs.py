@@ -0,0 +1,121 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from .ai_backends import get_ai_backend
+from .models import AIJob, AIReport, ReportPayload
+from .utils import (
+    get_fallback_recommendations, get_hotel_analytics_data,
+    request_ai_recommendations, save_ai_report,
+)
+
+FALLBACK_SOURCE = 'Rule-based fallback'
+ACTIVE_JOB_STATUSES = ['pending', 'running']
+
+
+def snapshot_hash(data):
+    return ReportPayload.fingerprint(data)[1]
+
+def find_reusable_report(report_type, digest):
+    """
+    Latest LLM-generated report built from the same analytics snapshot.
+    Fallback reports are never reused so a failed call gets retried.
+    """
+    return AIReport.objects.filter(
+        report_type=report_type,
+        snapshot_hash=digest,
+    ).exclude(generated_by=FALLBACK_SOURCE).first()
+
+def save_recommendations_report(data, digest, recommendations, generated_by):
+    return save_ai_report(
+        report_type='recommendations',
+        title=f'Smart Recommendations - {timezone.localdate()}',
+        summary=f'Generated {len(recommendations)} actionable recommendations based on current hotel performance',
+        data=data,
+        insights=[],
+        recommendations=recommendations,
+        generated_by=generated_by,
+        snapshot_hash=digest,
+    )
+
+def generate_recommendations_report(data, digest):
+    recommendations = request_ai_recommendations(data)
+    generated_by = get_ai_backend().label
+    if not recommendations:
+        recommendations = get_fallback_recommendations(data)
+        generated_by = FALLBACK_SOURCE
+    return save_recommendations_report(data, digest, recommendations, generated_by)
+
+# How each job type turns a snapshot into an AIReport
+JOB_HANDLERS = {
+    'recommendations': generate_recommendations_report,
+}
+
+def enqueue_report(report_type, data, requested_by=None):
+    """
+    Queue a job to build a `report_type` report from `data`. Returns
+    (job, report): when a report from an identical snapshot already exists
+    it is returned and nothing is queued; an identical job already waiting
+    or running is returned instead of queueing a duplicate.
+    """
+    digest = snapshot_hash(data)
+    report = find_reusable_report(report_type, digest)
+    if report is not None:
+        return None, report
+    job = AIJob.objects.filter(
+        report_type=report_type,
+        payload_id=digest,
+        status__in=ACTIVE_JOB_STATUSES,
+    ).first()
+    if job is None:
+        job = AIJob.objects.create(
+            report_type=report_type,
+            payload=ReportPayload.store(data, compress=getattr(settings, 'AI_REPORT_COMPRESS', True)),
+            requested_by=requested_by,
+        )
+    return job, None
+
+def enqueue_recommendations(requested_by=None):
+    return enqueue_report('recommendations', get_hotel_analytics_data(), requested_by)
+
+def claim_next_job(stale_after=600):
+    """
+    Mark the oldest pending job as running and return it, or None when the
+    queue is empty. The claim is a conditional UPDATE, so two workers never
+    pick up the same job. Jobs left running longer than `stale_after`
+    seconds (a worker that died) go back on the queue first.
+    """
+    now = timezone.now()
+    AIJob.objects.filter(
+        status='running',
+        started_at__lt=now - timedelta(seconds=stale_after),
+    ).update(status='pending')
+
+    pending = AIJob.objects.filter(status='pending').order_by('created_at').values_list('id', flat=True)
+    for job_id in pending[:10]:
+        claimed = AIJob.objects.filter(pk=job_id, status='pending').update(
+            status='running',
+            started_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return AIJob.objects.get(pk=job_id)
+    return None
+
+def run_job(job, max_attempts=3):
+    try:
+        report = find_reusable_report(job.report_type, job.payload_id)
+        job.reused_report = report is not None
+        if report is None:
+            report = JOB_HANDLERS[job.report_type](job.payload.load(), job.payload_id)
+        job.report = report
+        job.status = 'done'
+        job.error = ''
+    except Exception as e:
+        print(f"AI job {job.id} failed: {str(e)}")
+        job.error = str(e)
+        job.status = 'failed' if job.attempts >= max_attempts else 'pending'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['report', 'reused_report', 'status', 'error', 'finished_at'])
+    return job
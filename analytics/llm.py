@@ -0,0 +1,257 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from django.conf import settings
+
+
+class StreamInterrupted(Exception):
+    """The upstream failed after a streamed reply had started, so what arrived is incomplete."""
+
+
+class ResponseCache:
+    """
+    LRU cache of parsed LLM responses keyed by a hash of the request.
+    Entries expire after `ttl` seconds; the least recently used entry is
+    evicted once `max_entries` is reached.
+    """
+
+    def __init__(self, max_entries=128, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    @staticmethod
+    def key(url, payload):
+        encoded = json.dumps({'url': url, 'payload': payload}, sort_keys=True, default=str).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing upstream. After `failure_threshold` consecutive
+    failures the breaker opens and every call is refused for `cooldown`
+    seconds; the first call after that is let through as a trial, closing
+    the breaker on success and re-opening it on failure.
+    """
+
+    def __init__(self, failure_threshold=3, cooldown=60):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.trips = 0
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return 'open'
+        return 'half_open'
+
+    def allow(self):
+        with self.lock:
+            if self.state != 'half_open':
+                return self.state == 'closed'
+            # Let a single trial call through; hold the rest off for another cool-down
+            self.opened_at = time.monotonic()
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    self.trips += 1
+                self.opened_at = time.monotonic()
+
+    def reset(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trips = 0
+
+
+response_cache = ResponseCache(
+    max_entries=getattr(settings, 'LLM_CACHE_MAX_ENTRIES', 128),
+    ttl=getattr(settings, 'LLM_CACHE_TTL', 3600),
+)
+circuit_breaker = CircuitBreaker(
+    failure_threshold=getattr(settings, 'LLM_BREAKER_FAILURES', 3),
+    cooldown=getattr(settings, 'LLM_BREAKER_COOLDOWN', 60),
+)
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+def _reset_stats():
+    _stats.update({
+        'cache_hits': 0,
+        'cache_misses': 0,
+        'short_circuited': 0,
+        'upstream_calls': 0,
+        'upstream_failures': 0,
+        'parse_failures': 0,
+        'latency_total': 0.0,
+        'latency_max': 0.0,
+        'latency_last': 0.0,
+    })
+
+_reset_stats()
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+def _record_latency(seconds):
+    with _stats_lock:
+        _stats['latency_total'] += seconds
+        _stats['latency_max'] = max(_stats['latency_max'], seconds)
+        _stats['latency_last'] = seconds
+
+def llm_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    calls = stats.pop('upstream_calls')
+    latency_total = stats.pop('latency_total')
+    return {
+        **stats,
+        'upstream_calls': calls,
+        'latency_avg': round(latency_total / calls, 3) if calls else 0.0,
+        'latency_max': round(stats['latency_max'], 3),
+        'latency_last': round(stats['latency_last'], 3),
+        'cached_responses': len(response_cache.entries),
+        'breaker_state': circuit_breaker.state,
+        'breaker_trips': circuit_breaker.trips,
+    }
+
+def reset_llm_state():
+    response_cache.clear()
+    circuit_breaker.reset()
+    with _stats_lock:
+        _reset_stats()
+
+def cached_response(url, payload):
+    value = response_cache.get(response_cache.key(url, payload))
+    _count('cache_hits' if value is not None else 'cache_misses')
+    return value
+
+def store_response(url, payload, value):
+    response_cache.set(response_cache.key(url, payload), value)
+
+def _open_breaker_call():
+    if circuit_breaker.allow():
+        _count('upstream_calls')
+        return True
+    _count('short_circuited')
+    print("AI backend skipped: circuit breaker open")
+    return False
+
+def _upstream_failed(started, error):
+    _record_latency(time.perf_counter() - started)
+    _count('upstream_failures')
+    circuit_breaker.record_failure()
+    print(f"AI backend error: {str(error)}")
+
+def _upstream_succeeded(started):
+    _record_latency(time.perf_counter() - started)
+    circuit_breaker.record_success()
+
+def complete_chat(url, headers, payload, parse, timeout=None):
+    """
+    POST a chat-completions request and return `parse(text)` of the reply,
+    or None when the upstream fails, the breaker is open or the reply does
+    not parse. Parsed replies are cached by request, so an identical prompt
+    is answered without another call.
+    """
+    cached = cached_response(url, payload)
+    if cached is not None:
+        return cached
+    if not _open_breaker_call():
+        return None
+
+    started = time.perf_counter()
+    try:
+        response = requests.post(url, headers=headers, json=payload, timeout=timeout or getattr(settings, 'LLM_TIMEOUT', 30))
+        if response.status_code != 200:
+            raise requests.HTTPError(f"{response.status_code} - {response.text}")
+        text = response.json()["choices"][0]["message"]["content"]
+    except Exception as e:
+        _upstream_failed(started, e)
+        return None
+    _upstream_succeeded(started)
+
+    parsed = parse(text)
+    if not parsed:
+        _count('parse_failures')
+        print("AI response parsing failed")
+        return None
+    store_response(url, payload, parsed)
+    return parsed
+
+def stream_chat(url, headers, payload, timeout=None):
+    """
+    POST a streaming chat-completions request and yield the content of each
+    server-sent delta as it arrives. Yields nothing when the breaker is
+    open. If the upstream errors, the failure is reported and
+    StreamInterrupted raised, so callers never mistake the deltas already
+    yielded for a complete reply.
+    """
+    if not _open_breaker_call():
+        return
+
+    started = time.perf_counter()
+    try:
+        with requests.post(
+            url, headers=headers, json={**payload, 'stream': True}, stream=True,
+            timeout=timeout or getattr(settings, 'LLM_TIMEOUT', 30),
+        ) as response:
+            if response.status_code != 200:
+                raise requests.HTTPError(f"{response.status_code} - {response.text}")
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                data = line[5:].strip()
+                if data == '[DONE]':
+                    break
+                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+    except Exception as e:
+        _upstream_failed(started, e)
+        raise StreamInterrupted(str(e)) from e
+    _upstream_succeeded(started)
@@ -0,0 +1,75 @@
+import time
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from core.utils import hotel_today
+from analytics.rules import RULES, backtest_rules, with_thresholds
+
+
+class Command(BaseCommand):
+    help = 'Back-test the recommendation rules against the DailyMetrics history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365, help='Number of days to back-test, ending at --end')
+        parser.add_argument('--end', type=str, help='Last day to back-test (YYYY-MM-DD format, defaults to today)')
+        parser.add_argument(
+            '--threshold',
+            action='append',
+            default=[],
+            metavar='RULE=VALUE',
+            help='Try a different threshold, e.g. low_occupancy=45 or optimal_occupancy=55:80 (repeatable)',
+        )
+        parser.add_argument('--show-dates', action='store_true', help='List the days each rule fired on')
+
+    def handle(self, *args, **options):
+        try:
+            end_date = (
+                datetime.strptime(options['end'], '%Y-%m-%d').date()
+                if options['end'] else hotel_today()
+            )
+        except ValueError:
+            raise CommandError('Dates must be in YYYY-MM-DD format.')
+        start_date = end_date - timedelta(days=options['days'] - 1)
+
+        try:
+            rules = with_thresholds(self.parse_thresholds(options['threshold']))
+        except KeyError as e:
+            raise CommandError(e.args[0])
+
+        started = time.perf_counter()
+        result = backtest_rules(start_date, end_date, rules)
+        elapsed = time.perf_counter() - started
+        if not result['dates']:
+            raise CommandError(f'No daily metrics between {start_date} and {end_date}; run update_daily_metrics --start first.')
+
+        days = len(result['dates'])
+        self.stdout.write(f'Back-testing {len(rules)} rules over {days} days ({start_date} to {end_date})\n')
+        self.stdout.write(f"{'Rule':<26}{'Threshold':>20}{'Days fired':>12}{'Share':>8}")
+        for rule in rules:
+            fired = result['fired'].get(rule['key'])
+            if fired is None:
+                continue
+            threshold = ':'.join(str(bound) for bound in rule['threshold']) if rule['op'] == 'between' else rule['threshold']
+            count = int(fired.sum())
+            self.stdout.write(f"{rule['key']:<26}{rule['op'] + ' ' + str(threshold):>20}{count:>12}{count / days * 100:>7.0f}%")
+            if options['show_dates'] and count:
+                fired_on = [str(date) for date, hit in zip(result['dates'], fired) if hit]
+                self.stdout.write(f"  {', '.join(fired_on)}")
+
+        if result['skipped']:
+            self.stdout.write(f"\nNot back-tested (no daily history): {', '.join(result['skipped'])}")
+        self.stdout.write(self.style.SUCCESS(f'\nEvaluated in {elapsed * 1000:.1f} ms'))
+
+    def parse_thresholds(self, values):
+        overrides = {}
+        rule_ops = {rule['key']: rule['op'] for rule in RULES}
+        for value in values:
+            key, _, threshold = value.partition('=')
+            try:
+                if rule_ops.get(key) == 'between':
+                    low, high = threshold.split(':')
+                    overrides[key] = (float(low), float(high))
+                else:
+                    overrides[key] = float(threshold)
+            except ValueError:
+                raise CommandError(f'Invalid threshold {value!r}; use RULE=VALUE (RULE=LOW:HIGH for ranges).')
+        return overrides
@@ -0,0 +1,155 @@
+import random
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from billing.models import Folio, Payment
+from core.utils import business_date, get_hotel_timezone, hotel_today
+from guests.models import Guest
+from reservations.models import Reservation
+from rooms.models import Room, RoomType
+
+
+class Command(BaseCommand):
+    help = 'Seed a large payments table and time date-cast filters against the stored business_date column'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help='Number of payments to seed')
+        parser.add_argument('--days', type=int, default=730, help='Spread payments over this many past days')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query; the best time is reported')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded payments')
+
+    def handle(self, *args, **options):
+        tz = get_hotel_timezone()
+        today = hotel_today(tz)
+        folio = self.seed_folio()
+        try:
+            self.seed_payments(folio, options['rows'], options['days'], tz)
+            with connection.cursor() as cursor:
+                if connection.vendor == 'sqlite':
+                    cursor.execute('ANALYZE')
+                else:
+                    cursor.execute('ANALYZE billing_payment')
+
+            last_30_days = today - timedelta(days=30)
+            payments = Payment.objects.all()
+            queries = [
+                (
+                    'Revenue, last 30 days',
+                    lambda: payments.filter(status='completed', created_at__date__gte=last_30_days).aggregate(total=Sum('amount')),
+                    lambda: payments.filter(status='completed', business_date__gte=last_30_days).aggregate(total=Sum('amount')),
+                ),
+                (
+                    'Payments today',
+                    lambda: payments.filter(status='completed', created_at__date=today).count(),
+                    lambda: payments.filter(status='completed', business_date=today).count(),
+                ),
+                (
+                    'Daily revenue, last 90 days',
+                    lambda: dict(
+                        payments.filter(status='completed', created_at__date__gte=today - timedelta(days=90))
+                        .annotate(day=TruncDate('created_at')).order_by().values('day')
+                        .annotate(total=Sum('amount')).values_list('day', 'total')
+                    ),
+                    lambda: dict(
+                        payments.filter(status='completed', business_date__gte=today - timedelta(days=90))
+                        .order_by().values('business_date')
+                        .annotate(total=Sum('amount')).values_list('business_date', 'total')
+                    ),
+                ),
+            ]
+
+            self.stdout.write(f"{'Query':<30}{'created_at__date':>20}{'business_date':>16}{'Speed-up':>10}")
+            for label, before, after in queries:
+                if before() != after():
+                    self.stdout.write(self.style.WARNING(f'{label}: results differ'))
+                before_time = self.best_of(before, options['repeat'])
+                after_time = self.best_of(after, options['repeat'])
+                self.stdout.write(
+                    f'{label:<30}{before_time * 1000:>17.1f} ms{after_time * 1000:>13.1f} ms'
+                    f'{before_time / after_time if after_time else 0:>9.1f}x'
+                )
+
+            plan = payments.filter(status='completed', business_date__gte=last_30_days).values('business_date').annotate(n=Count('id')).explain()
+            self.stdout.write(f'\nQuery plan using business_date:\n{plan}')
+        finally:
+            if not options['keep']:
+                self.cleanup(folio)
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
+
+    def best_of(self, query, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            query()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
+
+    def seed_folio(self):
+        room_type = RoomType.objects.create(name='single', base_price=100, max_occupancy=1, description='Business date benchmark')
+        room = Room.objects.create(room_number=f'BENCH-{uuid.uuid4().hex[:8]}', floor=0, room_type=room_type, price_per_night=100)
+        guest = Guest.objects.create(first_name='Benchmark', last_name='Payments', email='benchmark@example.com', phone='0')
+        today = timezone.localdate()
+        reservation = Reservation.objects.create(
+            guest=guest, room=room, status='cancelled',
+            check_in_date=today, check_out_date=today + timedelta(days=1),
+            number_of_guests=1, total_price=100,
+        )
+        return Folio.objects.create(
+            reservation=reservation, guest=guest,
+            room_charges=100, total_amount=100, balance=100,
+        )
+
+    def seed_payments(self, folio, rows, days, tz):
+        self.stdout.write(f'Seeding {rows:,} payments over {days} days...')
+        started = time.perf_counter()
+        now = timezone.now()
+        statuses = ['completed'] * 8 + ['pending', 'failed']
+        methods = [choice for choice, _ in Payment.PAYMENT_METHOD_CHOICES]
+        # Keep the spread-out timestamps instead of letting auto_now_add stamp every row with now
+        created_field = Payment._meta.get_field('created_at')
+        created_field.auto_now_add = False
+        try:
+            self.insert_payments(folio, rows, days, tz, now, statuses, methods)
+        finally:
+            created_field.auto_now_add = True
+        self.stdout.write(f'Seeded in {time.perf_counter() - started:.1f}s')
+
+    def insert_payments(self, folio, rows, days, tz, now, statuses, methods):
+        batch = []
+        for i in range(rows):
+            created_at = now - timedelta(seconds=random.randrange(days * 86400))
+            batch.append(Payment(
+                folio=folio,
+                amount=random.randint(5000, 250000),
+                payment_method=random.choice(methods),
+                status=random.choice(statuses),
+                transaction_ref=f'BENCH-{folio.pk.hex[:8]}-{i}',
+                created_at=created_at,
+                business_date=business_date(created_at, tz),
+            ))
+            if len(batch) == 10000:
+                Payment.objects.bulk_create(batch, batch_size=2000)
+                batch = []
+        if batch:
+            Payment.objects.bulk_create(batch, batch_size=2000)
+
+    def cleanup(self, folio):
+        reservation = folio.reservation
+        guest = folio.guest
+        room = reservation.room
+        room_type = room.room_type
+        # A plain DELETE: going through the ORM would load every seeded row to send delete signals
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {Payment._meta.db_table} WHERE folio_id = %s', [Folio._meta.pk.get_db_prep_value(folio.pk, connection)])
+        folio.delete()
+        reservation.delete()
+        guest.delete()
+        room.delete()
+        room_type.delete()
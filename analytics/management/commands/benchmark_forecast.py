@@ -0,0 +1,84 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from analytics.forecast import FORECAST_HORIZONS, forecast_series, pickup_curve
+
+
+class Command(BaseCommand):
+    help = 'Back-test the forecasting engine on synthetic multi-year data and report error and runtime'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--years', type=int, default=3, help='Years of synthetic daily history')
+        parser.add_argument('--rooms', type=int, default=120)
+        parser.add_argument('--step', type=int, default=7, help='Days between forecast origins')
+        parser.add_argument('--seed', type=int, default=7)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        rooms = options['rooms']
+        days = options['years'] * 365
+        horizon = max(FORECAST_HORIZONS)
+        occupied, revenue, booked_by = self.synthesise(rng, days, rooms, horizon)
+
+        # Forecast origins over the final year, each trained on everything before it
+        origins = range(days - 365 - horizon, days - horizon + 1, options['step'])
+        errors = {name: {h: {'occupancy': [], 'revenue': []} for h in FORECAST_HORIZONS} for name in ['pickup', 'seasonal', 'naive']}
+        timings = []
+        # Lead times of past bookings, drawn from the same distribution as the synthetic pickup
+        curve = pickup_curve(rng.geometric(1 / 15, size=20000) - 1, horizon)
+        lead = np.arange(horizon)
+        for origin in origins:
+            actual_rooms = occupied[origin:origin + horizon]
+            actual_revenue = revenue[origin:origin + horizon]
+            # Night origin + i as it stood i days earlier, i.e. on the forecast date
+            on_the_books = booked_by[origin + lead, lead]
+
+            started = time.perf_counter()
+            with_pickup = forecast_series(occupied[:origin], revenue[:origin], 0, horizon, rooms, on_the_books, curve)
+            timings.append(time.perf_counter() - started)
+            seasonal = forecast_series(occupied[:origin], revenue[:origin], 0, horizon, rooms)
+            naive = (np.resize(occupied[origin - 7:origin], horizon), np.resize(revenue[origin - 7:origin], horizon))
+
+            for name, (rooms_forecast, revenue_forecast) in [
+                ('pickup', with_pickup[:2]), ('seasonal', seasonal[:2]), ('naive', naive),
+            ]:
+                for h in FORECAST_HORIZONS:
+                    errors[name][h]['occupancy'].append(np.abs(rooms_forecast[:h] - actual_rooms[:h]).mean() / rooms * 100)
+                    errors[name][h]['revenue'].append(abs(revenue_forecast[:h].sum() - actual_revenue[:h].sum()) / actual_revenue[:h].sum() * 100)
+
+        self.stdout.write(
+            f"{options['years']} years x {rooms} rooms, {len(timings)} forecast origins over the final year\n"
+        )
+        self.stdout.write(f"{'Model':<12}{'Horizon':>8}{'Occupancy MAE':>16}{'Revenue error':>15}")
+        labels = {'pickup': 'Pickup', 'seasonal': 'Seasonal', 'naive': 'Last week'}
+        for name, horizons in errors.items():
+            for h, figures in horizons.items():
+                self.stdout.write(
+                    f"{labels[name]:<12}{h:>7}d{np.mean(figures['occupancy']):>14.2f}pp{np.mean(figures['revenue']):>14.2f}%"
+                )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\nForecast runtime: {np.mean(timings) * 1000:.2f} ms average, '
+                f'{np.max(timings) * 1000:.2f} ms worst ({days} days of history, {horizon}-day horizon)'
+            )
+        )
+
+    def synthesise(self, rng, days, rooms, horizon):
+        """
+        Daily occupied rooms and revenue with trend, yearly and weekly
+        seasonality and noise, plus for every night the rooms already
+        booked 0..horizon-1 days before it (geometric booking lead times).
+        """
+        t = np.arange(days)
+        weekday = np.array([-0.10, -0.06, -0.04, 0.0, 0.08, 0.14, -0.02])[t % 7]
+        demand = 0.58 + 0.0001 * t + 0.12 * np.sin(2 * np.pi * t / 365.25) + weekday
+        occupied = np.clip(np.round(rooms * (demand + rng.normal(0, 0.04, days))), 0, rooms)
+        rate = 25000 * (1 + 0.5 * weekday) * (1 + 0.0002 * t)
+        revenue = occupied * rate * rng.normal(1, 0.05, days)
+
+        # Chance that a booking is made at least `lead` days ahead
+        lead = np.arange(horizon)
+        share = (1 - 1 / 15) ** lead
+        booked_by = rng.binomial(occupied.astype(np.int64)[:, None], share[None, :])
+        return occupied, revenue, booked_by.astype(float)
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from analytics.forecast import FORECAST_HORIZONS, build_forecast, save_forecast_report, summarise_forecast
+
+
+class Command(BaseCommand):
+    help = 'Forecast occupancy and revenue from DailyMetrics and the rooms on the books'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Print the forecast without saving a report')
+
+    def handle(self, *args, **options):
+        forecast = build_forecast()
+        if forecast is None:
+            raise CommandError('No daily metrics to forecast from; run update_daily_metrics --start first.')
+
+        self.stdout.write(f"Forecast from {forecast['start']} ({forecast['training_days']} days of history)")
+        for days, figures in summarise_forecast(forecast).items():
+            self.stdout.write(
+                f"  Next {days:>2} days: {figures['occupancy_rate']:>6.2f}% occupancy, "
+                f"₦{figures['revenue']:,.0f} revenue, {figures['on_the_books']} room nights on the books"
+            )
+        if options['dry_run']:
+            return
+
+        report = save_forecast_report(forecast)
+        self.stdout.write(self.style.SUCCESS(f'Saved {report.title} (covers {", ".join(str(days) for days in FORECAST_HORIZONS)} days)'))
@@ -0,0 +1,52 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from analytics.utils import ai_report_storage_stats, compact_ai_reports, prune_ai_reports
+
+
+class Command(BaseCommand):
+    help = 'Delete old AI reports and finished jobs, and drop analytics payloads no report uses'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=getattr(settings, 'AI_REPORT_RETENTION_DAYS', 90),
+            help='Keep reports and jobs from this many past days',
+        )
+        parser.add_argument(
+            '--keep-latest',
+            type=int,
+            default=1,
+            help='Always keep this many of the newest reports of each type',
+        )
+        parser.add_argument(
+            '--compact',
+            action='store_true',
+            help='Also move analytics data stored on report rows into shared payloads',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+
+    def handle(self, *args, **options):
+        before = ai_report_storage_stats()
+        if options['compact'] and not options['dry_run']:
+            moved = compact_ai_reports(compress=getattr(settings, 'AI_REPORT_COMPRESS', True))
+            self.stdout.write(f'Moved the data of {moved} report(s) into shared payloads')
+
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        counts = prune_ai_reports(cutoff, keep_latest=options['keep_latest'], dry_run=options['dry_run'])
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(
+            f"{verb} {counts['reports']} report(s), {counts['jobs']} job(s) and "
+            f"{counts['payloads']} payload(s) older than {options['days']} days"
+        )
+
+        after = ai_report_storage_stats()
+        for label, stats in [('Before', before), ('After', after)]:
+            self.stdout.write(
+                f"{label}: {stats['reports']} reports ({stats['inline_reports']} inline), "
+                f"{stats['payloads']} payloads, {stats['payload_raw_bytes'] / 1024:.1f} KB of data "
+                f"stored in {stats['payload_stored_bytes'] / 1024:.1f} KB"
+            )
+        self.stdout.write(self.style.SUCCESS('AI report storage pruned'))
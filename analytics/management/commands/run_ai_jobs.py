@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from analytics.jobs import claim_next_job, run_job
+from analytics.llm import llm_stats
+
+
+class Command(BaseCommand):
+    help = 'Work through queued AI report jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty instead of polling')
+        parser.add_argument('--poll', type=float, default=5, help='Seconds to wait between polls of an empty queue')
+        parser.add_argument('--max-jobs', type=int, default=0, help='Exit after this many jobs (0 = no limit)')
+        parser.add_argument('--max-attempts', type=int, default=3, help='Give up on a job after this many tries')
+        parser.add_argument('--stale-after', type=int, default=600, help='Requeue jobs left running this many seconds')
+
+    def handle(self, *args, **options):
+        processed = 0
+        self.stdout.write('Waiting for AI jobs...' if not options['once'] else 'Processing queued AI jobs...')
+        while not options['max_jobs'] or processed < options['max_jobs']:
+            close_old_connections()
+            job = claim_next_job(stale_after=options['stale_after'])
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll'])
+                continue
+
+            started = time.perf_counter()
+            job = run_job(job, max_attempts=options['max_attempts'])
+            processed += 1
+            elapsed = time.perf_counter() - started
+            if job.status == 'done':
+                source = 'reused existing report' if job.reused_report else f'generated by {job.report.generated_by}'
+                self.stdout.write(self.style.SUCCESS(
+                    f'{job.get_report_type_display()} job {job.id}: {source} in {elapsed:.1f}s'
+                ))
+            else:
+                self.stdout.write(self.style.WARNING(
+                    f'{job.get_report_type_display()} job {job.id} {job.get_status_display().lower()} '
+                    f'after attempt {job.attempts}: {job.error}'
+                ))
+
+        stats = llm_stats()
+        self.stdout.write(
+            f"LLM calls: {stats['upstream_calls']} ({stats['upstream_failures']} failed, "
+            f"avg {stats['latency_avg']}s, max {stats['latency_max']}s), "
+            f"cache hits: {stats['cache_hits']}, skipped by breaker: {stats['short_circuited']}, "
+            f"breaker trips: {stats['breaker_trips']}"
+        )
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} job(s)'))
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+CANNED_RECOMMENDATIONS = [
+    {
+        "type": "warning",
+        "priority": "high",
+        "title": "Lift Midweek Occupancy",
+        "message": "Tuesday to Thursday occupancy trails the weekend. Offer a corporate midweek rate and push it to your top repeat guests.",
+        "action": "Create Midweek Rate",
+    },
+    {
+        "type": "info",
+        "priority": "medium",
+        "title": "Chase Outstanding Folios",
+        "message": "Several folios still carry a balance after checkout. Send payment reminders and review the pending payments list daily.",
+        "action": "Review Balances",
+    },
+    {
+        "type": "success",
+        "priority": "low",
+        "title": "Reward Repeat Guests",
+        "message": "Repeat guests make up a healthy share of bookings. A simple loyalty perk would keep them booking direct.",
+        "action": "Set Up Loyalty Perk",
+    },
+    {
+        "type": "warning",
+        "priority": "high",
+        "title": "Reduce Cancellations",
+        "message": "Cancellations are eroding confirmed revenue. Ask for a deposit on bookings made more than two weeks out.",
+        "action": "Update Deposit Policy",
+    },
+    {
+        "type": "info",
+        "priority": "medium",
+        "title": "Upsell Premium Rooms",
+        "message": "Standard rooms fill first while suites sit empty. Offer upgrades at check-in for a modest supplement.",
+        "action": "Enable Upgrade Offers",
+    },
+    {
+        "type": "info",
+        "priority": "low",
+        "title": "Clear Housekeeping Backlog",
+        "message": "Pending housekeeping tasks delay room turnover. Rebalance shifts so rooms are ready before the afternoon check-in peak.",
+        "action": "Review Task Board",
+    },
+]
+
+
+class Command(BaseCommand):
+    help = 'Serve an OpenAI-compatible chat-completions stand-in with canned recommendations and injected latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0.5, help='Seconds before the first token')
+        parser.add_argument('--token-delay', type=float, default=0.02, help='Seconds between streamed tokens')
+        parser.add_argument('--jitter', type=float, default=0.2, help='Random extra latency, as a fraction of --latency')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of requests answered with a 503')
+
+    def handle(self, *args, **options):
+        handler = type('StandInHandler', (StandInHandler,), {'options': options})
+        server = ThreadingHTTPServer((options['host'], options['port']), handler)
+        self.stdout.write(self.style.SUCCESS(
+            f"AI stand-in listening on http://{options['host']}:{options['port']}/v1/chat/completions"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        self.stdout.write('AI stand-in stopped')
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    options = {}
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/v1/chat/completions':
+            self.send_json(404, {"error": "not found"})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self.send_json(400, {"error": "invalid JSON"})
+            return
+
+        latency = self.options['latency'] * (1 + random.random() * self.options['jitter'])
+        time.sleep(latency)
+        if random.random() < self.options['failure_rate']:
+            self.send_json(503, {"error": "stand-in failure"})
+            return
+
+        text = json.dumps(self.recommendations(payload), indent=2)
+        model = payload.get('model', 'hotel-pms-standin')
+        if payload.get('stream'):
+            self.stream(text, model)
+        else:
+            self.send_json(200, {
+                "object": "chat.completion",
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            })
+
+    def recommendations(self, payload):
+        # Same prompt, same answer: pick the canned set from the prompt hash
+        prompt = ''.join(message.get('content', '') for message in payload.get('messages', []))
+        seed = int(hashlib.sha256(prompt.encode()).hexdigest(), 16)
+        count = 3 + seed % 3
+        start = seed % len(CANNED_RECOMMENDATIONS)
+        return [CANNED_RECOMMENDATIONS[(start + i) % len(CANNED_RECOMMENDATIONS)] for i in range(count)]
+
+    def stream(self, text, model):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        try:
+            for i in range(0, len(text), 8):
+                self.send_event({
+                    "object": "chat.completion.chunk",
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": text[i:i + 8]}, "finish_reason": None}],
+                })
+                time.sleep(self.options['token_delay'])
+            self.wfile.write(b'data: [DONE]\n\n')
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def send_event(self, data):
+        self.wfile.write(f'data: {json.dumps(data)}\n\n'.encode())
+        self.wfile.flush()
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
@@ -1,6 +1,8 @@
-from django.core.management.base import BaseCommand
-from django.utils import timezone
-from analytics.utils import update_daily_metrics
+import time
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from core.utils import hotel_today
+from analytics.utils import update_daily_metrics, reconcile_daily_metrics, backfill_daily_metrics
 
 
 class Command(BaseCommand):
@@ -12,16 +14,54 @@ class Command(BaseCommand):
             type=str,
             help='Date to update metrics for (YYYY-MM-DD format)',
         )
+        parser.add_argument(
+            '--reconcile',
+            action='store_true',
+            help='Recompute the day from scratch and report drift from the incremental updates',
+        )
+        parser.add_argument(
+            '--start',
+            type=str,
+            help='First date of a range to backfill (YYYY-MM-DD format)',
+        )
+        parser.add_argument(
+            '--end',
+            type=str,
+            help='Last date of a range to backfill (YYYY-MM-DD format, defaults to today)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Worker processes to spread a range backfill over',
+        )
+        parser.add_argument(
+            '--chunk-days',
+            type=int,
+            default=90,
+            help='Days computed per chunk during a range backfill',
+        )
 
     def handle(self, *args, **options):
+        if options['start']:
+            return self.backfill(options)
+
         date_str = options.get('date')
         
         if date_str:
-            from datetime import datetime
             target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
         else:
-            target_date = timezone.now().date()
+            target_date = hotel_today()
         
+        if options['reconcile']:
+            self.stdout.write(f'Reconciling daily metrics for {target_date}...')
+            drift = reconcile_daily_metrics(target_date)
+            if not drift:
+                self.stdout.write(self.style.SUCCESS('No drift: incremental metrics match the full recompute'))
+            for field, (stored, recomputed) in drift.items():
+                self.stdout.write(self.style.WARNING(f'{field}: stored {stored}, recomputed {recomputed}'))
+            return
+
         self.stdout.write(f'Updating daily metrics for {target_date}...')
         
         metrics = update_daily_metrics(target_date)
@@ -35,3 +75,42 @@ class Command(BaseCommand):
                 f'Check-outs: {metrics.check_outs}'
             )
         )
+
+    def backfill(self, options):
+        try:
+            start_date = datetime.strptime(options['start'], '%Y-%m-%d').date()
+            end_date = (
+                datetime.strptime(options['end'], '%Y-%m-%d').date()
+                if options['end'] else hotel_today()
+            )
+        except ValueError:
+            raise CommandError('Dates must be in YYYY-MM-DD format.')
+        if start_date > end_date:
+            raise CommandError('--start must not be after --end.')
+
+        self.stdout.write(
+            f"Backfilling daily metrics from {start_date} to {end_date} "
+            f"with {options['workers']} worker(s)..."
+        )
+        started = time.perf_counter()
+
+        def progress(days_done, total_days):
+            self.stdout.write(
+                f'  {days_done}/{total_days} days ({days_done / total_days * 100:.0f}%) '
+                f'in {time.perf_counter() - started:.1f}s'
+            )
+
+        days = backfill_daily_metrics(
+            start_date,
+            end_date,
+            workers=options['workers'],
+            chunk_days=options['chunk_days'],
+            progress=progress,
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Backfilled {days} days in {elapsed:.2f}s '
+                f'({days / elapsed if elapsed else days:.0f} days/s)'
+            )
+        )
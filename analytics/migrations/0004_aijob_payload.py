@@ -0,0 +1,63 @@
+import hashlib
+import json
+import zlib
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def move_snapshots_to_payloads(apps, schema_editor):
+    # Historical models have no ReportPayload.store, so mirror it here
+    AIJob = apps.get_model('analytics', 'AIJob')
+    ReportPayload = apps.get_model('analytics', 'ReportPayload')
+    compress = getattr(settings, 'AI_REPORT_COMPRESS', True)
+    for job in AIJob.objects.only('id', 'snapshot').iterator(chunk_size=200):
+        encoded = json.dumps(job.snapshot, sort_keys=True, default=str).encode()
+        digest = hashlib.sha256(encoded).hexdigest()
+        ReportPayload.objects.get_or_create(
+            digest=digest,
+            defaults={
+                'content': zlib.compress(encoded) if compress else encoded,
+                'compressed': compress,
+                'size': len(encoded),
+            },
+        )
+        AIJob.objects.filter(pk=job.pk).update(payload_id=digest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_report_payloads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aijob',
+            name='payload',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='jobs', to='analytics.reportpayload'),
+        ),
+        migrations.RunPython(move_snapshots_to_payloads, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='aijob',
+            name='payload',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='jobs', to='analytics.reportpayload'),
+        ),
+        migrations.RemoveIndex(
+            model_name='aijob',
+            name='analytics_a_report__383710_idx',
+        ),
+        migrations.RemoveField(
+            model_name='aijob',
+            name='snapshot',
+        ),
+        migrations.RemoveField(
+            model_name='aijob',
+            name='snapshot_hash',
+        ),
+        migrations.AddIndex(
+            model_name='aijob',
+            index=models.Index(fields=['report_type', 'payload'], name='analytics_a_report__c154a6_idx'),
+        ),
+    ]
@@ -1,7 +1,47 @@
 from django.db import models
+import hashlib
 import uuid
 import json
+import zlib
 from django.db.models import Sum
+
+class ReportPayload(models.Model):
+    """
+    Analytics data behind AIReports, stored once per distinct payload and
+    shared by every report generated from it. Optionally zlib-compressed.
+    """
+    digest = models.CharField(max_length=64, primary_key=True)
+    content = models.BinaryField()
+    compressed = models.BooleanField(default=False)
+    size = models.IntegerField()  # Uncompressed bytes
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @staticmethod
+    def fingerprint(data):
+        """(canonical JSON bytes, SHA-256 digest) of `data`; the digest is both the payload key and a report's snapshot_hash."""
+        encoded = json.dumps(data, sort_keys=True, default=str).encode()
+        return encoded, hashlib.sha256(encoded).hexdigest()
+
+    @classmethod
+    def store(cls, data, compress=True):
+        encoded, digest = cls.fingerprint(data)
+        payload, created = cls.objects.get_or_create(
+            digest=digest,
+            defaults={
+                'content': zlib.compress(encoded) if compress else encoded,
+                'compressed': compress,
+                'size': len(encoded),
+            },
+        )
+        return payload
+
+    def load(self):
+        content = bytes(self.content)
+        return json.loads(zlib.decompress(content) if self.compressed else content)
+
+    def __str__(self):
+        return f"Payload {self.digest[:12]} ({self.size} bytes)"
+
 class AIReport(models.Model):
     REPORT_TYPE_CHOICES = [
         ('occupancy', 'Occupancy Analysis'),
@@ -15,11 +55,15 @@ class AIReport(models.Model):
     report_type = models.CharField(max_length=50, choices=REPORT_TYPE_CHOICES)
     title = models.CharField(max_length=255)
     summary = models.TextField()
-    data = models.JSONField()  
+    # Inline copy of the analytics data; empty when it lives in `payload`
+    data = models.JSONField(null=True, blank=True)
+    payload = models.ForeignKey(ReportPayload, on_delete=models.PROTECT, null=True, blank=True, related_name='reports')
     insights = models.JSONField()  
     recommendations = models.JSONField() 
     created_at = models.DateTimeField(auto_now_add=True)
     generated_by = models.CharField(max_length=100, default='AI Analytics Engine')
+    # Fingerprint of the analytics data the report was generated from
+    snapshot_hash = models.CharField(max_length=64, blank=True, db_index=True)
     
     class Meta:
         ordering = ['-created_at']
@@ -27,6 +71,43 @@ class AIReport(models.Model):
     def __str__(self):
         return f"{self.get_report_type_display()} - {self.created_at.date()}"
 
+    def get_data(self):
+        if self.payload_id:
+            return self.payload.load()
+        return self.data
+
+class AIJob(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    report_type = models.CharField(max_length=50, choices=AIReport.REPORT_TYPE_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # The analytics data to build from; its digest is the snapshot hash
+    payload = models.ForeignKey(ReportPayload, on_delete=models.PROTECT, related_name='jobs')
+    report = models.ForeignKey(AIReport, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    reused_report = models.BooleanField(default=False)
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey('core.CustomUser', on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['report_type', 'payload']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_report_type_display()} job - {self.get_status_display()}"
+
 class DailyMetrics(models.Model):
     date = models.DateField(unique=True, db_index=True)
     total_rooms = models.IntegerField()
@@ -0,0 +1,350 @@
+from datetime import timedelta
+
+import numpy as np
+from .models import DailyMetrics
+
+# One row per alert. `metric` is a path into the analytics snapshot (or a
+# DERIVED_METRICS name) compared against `threshold` with `op`; within a
+# `group` only the first matching rule fires. Messages are formatted with
+# the value of `display` (default: the metric itself) as {value}.
+RULES = [
+    {
+        'key': 'low_occupancy',
+        'group': 'occupancy',
+        'metric': 'occupancy.rate',
+        'op': 'lt',
+        'threshold': 50,
+        'type': 'warning',
+        'title': 'Low Occupancy Alert',
+        'message': 'Current occupancy is {value}%. Consider launching promotional campaigns, offering discounts, or partnering with travel agencies to boost bookings.',
+        'action': 'Launch Promotion',
+        'priority': 'high',
+    },
+    {
+        'key': 'high_demand',
+        'group': 'occupancy',
+        'metric': 'occupancy.rate',
+        'op': 'gt',
+        'threshold': 85,
+        'type': 'success',
+        'title': 'High Demand Period',
+        'message': 'Occupancy rate is {value}%. This is an excellent time to implement dynamic pricing and increase rates. Consider upselling premium room types.',
+        'action': 'Adjust Pricing',
+        'priority': 'medium',
+    },
+    {
+        'key': 'optimal_occupancy',
+        'group': 'occupancy',
+        'metric': 'occupancy.rate',
+        'op': 'between',
+        'threshold': (60, 75),
+        'type': 'info',
+        'title': 'Optimal Occupancy Range',
+        'message': 'Occupancy at {value}% is healthy. Focus on maintaining service quality and guest satisfaction to encourage repeat bookings.',
+        'priority': 'low',
+    },
+    {
+        'key': 'low_upcoming_bookings',
+        'group': 'upcoming',
+        'metric': 'reservations.upcoming_7days',
+        'op': 'lt',
+        'threshold': 5,
+        'type': 'warning',
+        'title': 'Low Upcoming Bookings',
+        'message': 'Only {value} check-ins scheduled for the next week. Review marketing channels and consider flash sales or last-minute deals.',
+        'action': 'Review Marketing',
+        'priority': 'high',
+    },
+    {
+        'key': 'busy_week',
+        'group': 'upcoming',
+        'metric': 'reservations.upcoming_7days',
+        'op': 'gt',
+        'threshold': 20,
+        'type': 'info',
+        'title': 'Busy Week Ahead',
+        'message': '{value} check-ins in the next 7 days. Ensure adequate staffing and prepare rooms in advance.',
+        'action': 'Schedule Staff',
+        'priority': 'medium',
+    },
+    {
+        'key': 'high_cancellations',
+        'metric': 'reservations.cancellation_rate',
+        'op': 'gt',
+        'threshold': 15,
+        'type': 'warning',
+        'title': 'High Cancellation Rate',
+        'message': 'Cancellation rate is {value}%. Review cancellation policies, implement stricter deposit requirements, or offer flexible rebooking options.',
+        'action': 'Review Policy',
+        'priority': 'medium',
+    },
+    {
+        'key': 'pending_payments',
+        'metric': 'payments.pending',
+        'op': 'gt',
+        'threshold': 5,
+        'type': 'warning',
+        'title': 'Payment Collection Required',
+        'message': '{value} payments are pending. Implement automated payment reminders and follow-up procedures to improve cash flow.',
+        'action': 'Send Reminders',
+        'priority': 'high',
+    },
+    {
+        'key': 'payment_failures',
+        'metric': 'payments.failed_recent',
+        'op': 'gt',
+        'threshold': 3,
+        'type': 'warning',
+        'title': 'Payment Failures',
+        'message': '{value} failed payments in the last week. Review payment gateway settings and contact affected guests to resolve issues.',
+        'action': 'Contact Guests',
+        'priority': 'high',
+    },
+    {
+        'key': 'revenue_trending_up',
+        'metric': 'revenue.trend',
+        'op': 'gt',
+        'threshold': 1.2,
+        'display': 'revenue.weekly',
+        'type': 'success',
+        'title': 'Revenue Trending Up',
+        'message': 'Recent weekly revenue (₦{value:,.0f}) shows improvement. Maintain current strategies and consider expanding successful promotions.',
+        'priority': 'low',
+    },
+    {
+        'key': 'housekeeping_backlog',
+        'group': 'housekeeping',
+        'metric': 'housekeeping.overdue',
+        'op': 'gt',
+        'threshold': 5,
+        'type': 'warning',
+        'title': 'Housekeeping Backlog',
+        'message': '{value} overdue housekeeping tasks. Consider reallocating staff or hiring temporary help to clear the backlog and maintain room availability.',
+        'action': 'Review Staffing',
+        'priority': 'medium',
+    },
+    {
+        'key': 'housekeeping_volume',
+        'group': 'housekeeping',
+        'metric': 'housekeeping.pending',
+        'op': 'gt',
+        'threshold': 15,
+        'type': 'info',
+        'title': 'High Housekeeping Volume',
+        'message': '{value} pending tasks. Monitor workload and consider preventive scheduling to avoid delays.',
+        'priority': 'low',
+    },
+    {
+        'key': 'vip_arrivals',
+        'metric': 'guests.vip_upcoming',
+        'op': 'gt',
+        'threshold': 0,
+        'type': 'info',
+        'title': 'VIP Guest Preparation',
+        'message': '{value} VIP guest(s) arriving soon. Ensure premium amenities, welcome packages, and room upgrades are prepared. Assign experienced staff.',
+        'action': 'Prepare VIP Welcome',
+        'priority': 'medium',
+    },
+    {
+        'key': 'guest_loyalty',
+        'metric': 'guests.repeat_guests',
+        'op': 'gt',
+        'threshold': 10,
+        'type': 'success',
+        'title': 'Strong Guest Loyalty',
+        'message': '{value} repeat guests this month. Consider implementing a formal loyalty program with rewards to maintain this positive trend.',
+        'action': 'Create Loyalty Program',
+        'priority': 'low',
+    },
+    {
+        'key': 'outstanding_balance',
+        'metric': 'revenue.outstanding_balance',
+        'op': 'gt',
+        'threshold': 50000,
+        'type': 'warning',
+        'title': 'High Outstanding Balance',
+        'message': '₦{value:,.0f} in outstanding balances. Implement stricter payment policies and follow-up procedures to improve collections.',
+        'action': 'Review Collections',
+        'priority': 'high',
+    },
+    {
+        'key': 'rooms_in_maintenance',
+        'metric': 'occupancy.maintenance',
+        'op': 'gt',
+        'threshold': 3,
+        'type': 'warning',
+        'title': 'Multiple Rooms Under Maintenance',
+        'message': '{value} rooms currently under maintenance. Expedite repairs to maximize revenue potential, especially during high-demand periods.',
+        'action': 'Expedite Repairs',
+        'priority': 'medium',
+    },
+]
+
+COMPARATORS = {
+    'lt': np.less,
+    'lte': np.less_equal,
+    'gt': np.greater,
+    'gte': np.greater_equal,
+    'between': lambda values, bounds: (values >= bounds[0]) & (values <= bounds[1]),
+}
+
+RECOMMENDATION_FIELDS = ['type', 'title', 'message', 'action', 'priority']
+
+
+def _revenue_trend(metrics):
+    """Average daily revenue of the last week relative to the last month."""
+    weekly = metrics['revenue.weekly']
+    monthly = metrics['revenue.monthly']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = (weekly / 7) / (monthly / 30)
+    return np.where((weekly > 0) & (monthly > 0), ratio, 0.0)
+
+# Metrics computed from others, over scalars and whole histories alike
+DERIVED_METRICS = {
+    'revenue.trend': (['revenue.weekly', 'revenue.monthly'], _revenue_trend),
+}
+
+
+def with_thresholds(overrides, rules=None):
+    """Copy of the rule table with thresholds replaced by rule key."""
+    rules = RULES if rules is None else rules
+    unknown = set(overrides) - {rule['key'] for rule in rules}
+    if unknown:
+        raise KeyError(f'Unknown rule(s): {", ".join(sorted(unknown))}')
+    return [
+        {**rule, 'threshold': overrides[rule['key']]} if rule['key'] in overrides else rule
+        for rule in rules
+    ]
+
+def add_derived_metrics(metrics):
+    metrics = dict(metrics)
+    for name, (inputs, compute) in DERIVED_METRICS.items():
+        if name not in metrics and all(path in metrics for path in inputs):
+            metrics[name] = compute(metrics)
+    return metrics
+
+def evaluate_rules(metrics, rules=None):
+    """
+    Evaluate the rule table against `metrics`, a mapping of metric path to
+    a NumPy array (one entry per snapshot; all arrays the same length).
+    Returns [(rule, fired)] with a boolean array per rule, in table order.
+    Rules whose metric is missing are left out; NaN never fires.
+    """
+    metrics = add_derived_metrics(metrics)
+    taken = {}
+    results = []
+    for rule in RULES if rules is None else rules:
+        values = metrics.get(rule['metric'])
+        if values is None:
+            continue
+        fired = COMPARATORS[rule['op']](values, rule['threshold'])
+        group = rule.get('group')
+        if group:
+            if group in taken:
+                fired = fired & ~taken[group]
+                taken[group] = taken[group] | fired
+            else:
+                taken[group] = fired
+        results.append((rule, fired))
+    return results
+
+def snapshot_metrics(analytics_data):
+    """Flatten an analytics snapshot into {'section.figure': value}."""
+    return {
+        f'{section}.{name}': value
+        for section, figures in analytics_data.items() if isinstance(figures, dict)
+        for name, value in figures.items()
+    }
+
+def recommend(analytics_data, rules=None):
+    """Recommendations for a single analytics snapshot."""
+    values = snapshot_metrics(analytics_data)
+    metrics = {path: np.array([value], dtype=float) for path, value in values.items()}
+    recommendations = []
+    for rule, fired in evaluate_rules(metrics, rules):
+        if not fired[0]:
+            continue
+        recommendation = {field: rule[field] for field in RECOMMENDATION_FIELDS if field in rule}
+        recommendation['message'] = rule['message'].format(value=values.get(rule.get('display', rule['metric'])))
+        recommendations.append(recommendation)
+    return recommendations
+
+
+def _trailing_sum(values, window):
+    """Sum of each day and the `window - 1` before it; NaN without enough history."""
+    sums = np.full(len(values), np.nan)
+    if len(values) >= window:
+        cumulative = np.concatenate(([0.0], np.cumsum(values)))
+        sums[window - 1:] = cumulative[window:] - cumulative[:-window]
+    return sums
+
+def _leading_sum(values, window):
+    """Sum of each day and the `window - 1` after it; NaN past the end of the data."""
+    return _trailing_sum(values[::-1], window)[::-1]
+
+def history_metrics(start_date, end_date):
+    """
+    Snapshot metrics reconstructed for every day in [start_date, end_date]
+    from DailyMetrics, using the same look-back and look-ahead windows as
+    get_hotel_analytics_data. Returns (dates, metrics). Figures the daily
+    table does not record (payments, housekeeping, guests) are absent, so
+    rules on them are not back-tested.
+    """
+    # Windows include the day itself, as the snapshot's `>= today - n` filters do
+    month, week, ahead = 31, 8, 8
+    rows = list(
+        DailyMetrics.objects.filter(
+            date__range=(start_date - timedelta(days=month - 1), end_date + timedelta(days=ahead - 1))
+        ).order_by('date').values_list(
+            'date', 'occupancy_rate', 'occupied_rooms', 'total_rooms',
+            'total_revenue', 'check_ins', 'cancellations',
+        )
+    )
+    if not rows:
+        return [], {}
+
+    # Lay the rows onto a gap-free calendar; missing days stay NaN
+    first = rows[0][0]
+    days = (rows[-1][0] - first).days + 1
+    table = np.full((days, 6), np.nan)
+    for date, *values in rows:
+        table[(date - first).days] = [float(value) for value in values]
+    occupancy_rate, occupied, total, revenue, check_ins, cancellations = table.T
+
+    cancellations_month = _trailing_sum(cancellations, month)
+    bookings_month = cancellations_month + _trailing_sum(check_ins, month)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cancellation_rate = np.where(bookings_month > 0, cancellations_month / bookings_month * 100, 0.0)
+    cancellation_rate[np.isnan(bookings_month)] = np.nan
+
+    metrics = {
+        'occupancy.rate': occupancy_rate,
+        'occupancy.occupied': occupied,
+        'occupancy.total': total,
+        'reservations.upcoming_7days': _leading_sum(check_ins, ahead),
+        'reservations.cancellation_rate': cancellation_rate,
+        'revenue.weekly': _trailing_sum(revenue, week),
+        'revenue.monthly': _trailing_sum(revenue, month),
+    }
+
+    offset = max((start_date - first).days, 0)
+    stop = (end_date - first).days + 1
+    dates = [first + timedelta(days=i) for i in range(offset, min(stop, days))]
+    return dates, {path: values[offset:stop] for path, values in metrics.items()}
+
+def backtest_rules(start_date, end_date, rules=None):
+    """
+    Which alerts would have fired on each day in [start_date, end_date].
+    Returns {'dates': [...], 'fired': {rule key: bool array}, 'skipped':
+    [rule keys with no history]} from a single vectorized evaluation.
+    """
+    rules = RULES if rules is None else rules
+    dates, metrics = history_metrics(start_date, end_date)
+    if not dates:
+        return {'dates': [], 'fired': {}, 'skipped': [rule['key'] for rule in rules]}
+    fired = {rule['key']: mask for rule, mask in evaluate_rules(metrics, rules)}
+    return {
+        'dates': dates,
+        'fired': fired,
+        'skipped': [rule['key'] for rule in rules if rule['key'] not in fired],
+    }
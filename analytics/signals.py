@@ -0,0 +1,28 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from billing.models import Folio, Payment
+from guests.models import Guest
+from reservations.models import Reservation
+from rooms.models import Room
+from .cache import invalidate_snapshots
+from .models import DailyMetrics
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=Folio)
+@receiver(post_save, sender=Reservation)
+@receiver(post_save, sender=Room)
+@receiver(post_save, sender=Guest)
+@receiver(post_save, sender=DailyMetrics)
+@receiver(post_delete, sender=Payment)
+@receiver(post_delete, sender=Folio)
+@receiver(post_delete, sender=Reservation)
+@receiver(post_delete, sender=Room)
+@receiver(post_delete, sender=Guest)
+@receiver(post_delete, sender=DailyMetrics)
+def expire_analytics_snapshots(sender, **kwargs):
+    # Wait for the commit so a snapshot rebuilt in between sees the whole
+    # change, including the DailyMetrics deltas applied in the same transaction
+    label = sender._meta.label
+    transaction.on_commit(lambda: invalidate_snapshots(label))
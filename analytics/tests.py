@@ -1,3 +1,493 @@
-from django.test import TestCase
+import json
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from core.models import CustomUser
+from core.utils import hotel_today
+from billing.models import Folio, Payment
+from guests.models import Guest
+from reservations.models import Reservation, RoomNight
+from rooms.models import HousekeepingTask, Room, RoomType
+from .ai_backends import iter_json_objects
+from .forecast import build_forecast, pickup_curve, save_forecast_report, seasonal_forecast, smoothed_level
+from .cache import cached_snapshot, snapshot_stats
+from .jobs import FALLBACK_SOURCE, claim_next_job, enqueue_recommendations, enqueue_report, run_job, snapshot_hash
+from .llm import circuit_breaker, llm_stats, reset_llm_state
+from .models import AIJob, AIReport, DailyMetrics, ReportPayload
+from .rules import backtest_rules, recommend, with_thresholds
+from .utils import (
+    apply_metrics_delta, backfill_daily_metrics, compact_ai_reports, compute_daily_metrics_range, get_ai_recommendations, get_fallback_recommendations,
+    get_hotel_analytics_data, prune_ai_reports, reconcile_daily_metrics, reconstruct_occupancy, save_ai_report,
+)
+
+
+class HotelAnalyticsDataTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.localdate()
+        single = RoomType.objects.create(name='single', base_price=100, max_occupancy=1)
+        double = RoomType.objects.create(name='double', base_price=150, max_occupancy=2)
+        rooms = [
+            Room.objects.create(room_number='101', floor=1, room_type=single, price_per_night=100, status='occupied'),
+            Room.objects.create(room_number='102', floor=1, room_type=single, price_per_night=100, status='maintenance'),
+            Room.objects.create(room_number='201', floor=2, room_type=double, price_per_night=150),
+            Room.objects.create(room_number='202', floor=2, room_type=double, price_per_night=150),
+        ]
+        vip = Guest.objects.create(first_name='Ada', last_name='Obi', email='ada@example.com', phone='1', vip=True)
+        guest = Guest.objects.create(first_name='Tunde', last_name='Bello', email='tunde@example.com', phone='2')
+
+        def reserve(guest, room, arrival, status='confirmed'):
+            return Reservation.objects.create(
+                guest=guest, room=room, status=status,
+                check_in_date=today + timedelta(days=arrival),
+                check_out_date=today + timedelta(days=arrival + 2),
+                number_of_guests=1, total_price=room.price_per_night * 2,
+            )
+
+        stay = reserve(guest, rooms[0], -1, status='checked_in')
+        reserve(vip, rooms[2], 3)
+        reserve(vip, rooms[3], 10)
+        reserve(guest, rooms[2], 20, status='cancelled')
+
+        settled = Folio.objects.create(
+            reservation=stay, guest=guest, status='settled',
+            room_charges=200, total_amount=200, amount_paid=200, balance=0,
+        )
+        Payment.objects.create(folio=settled, amount=200, payment_method='cash', status='completed', transaction_ref='T1')
+        Payment.objects.create(folio=settled, amount=50, payment_method='card', status='pending', transaction_ref='T2')
+        Payment.objects.create(folio=settled, amount=75, payment_method='card', status='failed', transaction_ref='T3')
+
+        HousekeepingTask.objects.create(room=rooms[1], task_type='maintenance', description='Fix AC', due_date=timezone.now())
+        HousekeepingTask.objects.create(
+            room=rooms[0], task_type='cleaning', description='Turn down', status='in_progress', due_date=timezone.now()
+        )
+
+    def test_snapshot_figures(self):
+        data = get_hotel_analytics_data()
+        self.assertEqual(data['occupancy'], {'rate': 25.0, 'occupied': 1, 'total': 4, 'maintenance': 1})
+        self.assertEqual(data['reservations'], {
+            'total_monthly': 4, 'confirmed': 2, 'upcoming_7days': 1, 'cancellation_rate': 25.0,
+        })
+        self.assertEqual(data['revenue'], {
+            'monthly': 200.0, 'weekly': 200.0, 'average_daily_rate': 200.0, 'outstanding_balance': 0.0,
+        })
+        self.assertEqual(data['payments'], {'pending': 1, 'failed_recent': 1})
+        self.assertEqual(data['housekeeping'], {'pending': 2, 'overdue': 0})
+        self.assertEqual(data['guests'], {'vip_upcoming': 2, 'repeat_guests': 2})
+        self.assertEqual(data['room_types'], [
+            {'room__room_type__name': 'double', 'count': 2},
+            {'room__room_type__name': 'single', 'count': 1},
+        ])
+
+    def test_snapshot_query_count(self):
+        # One aggregate each for rooms, reservations, payments, folios and
+        # housekeeping, plus the repeat-guest and room-type breakdowns.
+        with self.assertNumQueries(7):
+            get_hotel_analytics_data()
+
+
+class DailyMetricsTests(TestCase):
+    def stays(self):
+        """Four rooms over the last six days: an early departure, an overstay, a cancellation and a payment."""
+        today = hotel_today()
+        day = [today - timedelta(days=5 - i) for i in range(6)]
+        room_type = RoomType.objects.create(name='single', base_price=100, max_occupancy=2)
+        rooms = [
+            Room.objects.create(room_number=f'10{i}', floor=1, room_type=room_type, price_per_night=100)
+            for i in range(4)
+        ]
+        guest = Guest.objects.create(first_name='Ada', last_name='Obi', email='ada@example.com', phone='1')
+
+        def reserve(room, check_in, check_out, status, **fields):
+            return Reservation.objects.create(
+                guest=guest, room=room, status=status, check_in_date=check_in, check_out_date=check_out,
+                number_of_guests=2, total_price=100, **fields,
+            )
+
+        reserve(rooms[0], day[0], day[3], 'checked_out', checked_in_on=day[0], checked_out_on=day[2])
+        overstay = reserve(rooms[1], day[1], day[2], 'checked_in', checked_in_on=day[1], number_of_children=1)
+        reserve(rooms[2], day[2], day[4], 'confirmed')
+        reserve(rooms[3], day[3], day[5], 'cancelled', cancelled_on=day[1])
+        folio = Folio.objects.create(reservation=overstay, guest=guest, room_charges=100, total_amount=100, balance=100)
+        Payment.objects.create(
+            folio=folio, amount=100, payment_method='cash', status='completed', transaction_ref='T1', business_date=day[1],
+        )
+        return day
+
+    def test_occupancy_is_swept_from_stay_intervals(self):
+        day = self.stays()
+        # The early departure leaves after two nights; the overstay is still in house today
+        self.assertEqual(reconstruct_occupancy(day[0], day[5]), ([1, 2, 1, 1, 1, 1], [2, 5, 3, 3, 3, 3]))
+        self.assertEqual(reconstruct_occupancy(day[2], day[3]), ([1, 1], [3, 3]))
+
+    def test_range_is_computed_from_a_fixed_number_of_queries(self):
+        day = self.stays()
+        with self.assertNumQueries(6):
+            metrics = compute_daily_metrics_range(day[0] - timedelta(days=365), day[5])
+        by_date = {row['date']: row for row in metrics}
+        self.assertEqual(len(metrics), 371)
+        self.assertEqual(
+            {field: by_date[day[1]][field] for field in ['occupied_rooms', 'occupancy_rate', 'total_revenue', 'check_ins', 'cancellations']},
+            {'occupied_rooms': 2, 'occupancy_rate': 50.0, 'total_revenue': 100, 'check_ins': 1, 'cancellations': 1},
+        )
+        self.assertEqual(by_date[day[2]]['check_outs'], 1)
+
+    def test_backfill_chunks_match_one_pass(self):
+        day = self.stays()
+        self.assertEqual(backfill_daily_metrics(day[0], day[5], chunk_days=4), 6)
+        stored = list(DailyMetrics.objects.order_by('date').values('date', 'occupied_rooms', 'guest_count', 'check_ins', 'check_outs'))
+        expected = [
+            {field: row[field] for field in ['date', 'occupied_rooms', 'guest_count', 'check_ins', 'check_outs']}
+            for row in compute_daily_metrics_range(day[0], day[5])
+        ]
+        self.assertEqual(stored, expected)
+
+    def test_deltas_and_recompute_share_the_hotel_business_date(self):
+        # 23:30 UTC is already 00:30 the next day in Lagos
+        moment = datetime(2026, 3, 1, 23, 30, tzinfo=dt_timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=moment):
+            apply_metrics_delta(check_ins=1)
+            apply_metrics_delta(check_ins=1)
+            self.assertEqual(reconcile_daily_metrics(), {'check_ins': (1, 0)})
+        self.assertEqual(list(DailyMetrics.objects.values_list('date', flat=True)), [date(2026, 3, 2)])
+
+
+class SnapshotCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.builds = 0
+
+    def build(self):
+        self.builds += 1
+        return {'builds': self.builds}
+
+    def test_snapshot_is_built_once_until_a_model_changes(self):
+        today = timezone.localdate()
+        self.assertEqual(cached_snapshot('guest_insights', (today,), self.build), {'builds': 1})
+        self.assertEqual(cached_snapshot('guest_insights', (today,), self.build), {'builds': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Guest.objects.create(first_name='Ada', last_name='Obi', email='ada@example.com', phone='1')
+        self.assertEqual(cached_snapshot('guest_insights', (today,), self.build), {'builds': 2})
+        self.assertEqual(snapshot_stats()['guest_insights'], {'hits': 1, 'misses': 2, 'hit_rate': 33.3})
+
+    def test_window_is_part_of_the_key(self):
+        today = timezone.localdate()
+        cached_snapshot('performance_report', (today - timedelta(days=30), today), self.build)
+        cached_snapshot('performance_report', (today - timedelta(days=29), today), self.build)
+        self.assertEqual(self.builds, 2)
+
+    def test_dashboard_served_from_cache(self):
+        user = CustomUser.objects.create_user(username='manager', password='pw', role='manager')
+        self.client.force_login(user)
+        for _ in range(3):
+            self.assertEqual(self.client.get(reverse('analytics_dashboard')).status_code, 200)
+        response = self.client.get(reverse('snapshot_cache_stats'))
+        self.assertEqual(response.json()['snapshots']['analytics_dashboard'], {'hits': 2, 'misses': 1, 'hit_rate': 66.7})
+
+
+class AIJobTests(TestCase):
+    recommendations = [{'title': 'Raise weekend rates', 'message': '...', 'priority': 'high', 'type': 'info'}]
+
+    def run_queue(self):
+        while (job := claim_next_job()) is not None:
+            run_job(job)
+
+    @mock.patch('analytics.jobs.request_ai_recommendations')
+    def test_unchanged_snapshot_reuses_report(self, request_ai):
+        request_ai.return_value = self.recommendations
+        job, report = enqueue_recommendations()
+        self.assertIsNone(report)
+        self.assertEqual(enqueue_recommendations(), (job, None))
+
+        self.run_queue()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.report.recommendations, self.recommendations)
+
+        self.assertEqual(enqueue_recommendations(), (None, job.report))
+        self.assertEqual(request_ai.call_count, 1)
+
+    @mock.patch('analytics.jobs.request_ai_recommendations')
+    def test_job_and_report_share_one_payload(self, request_ai):
+        request_ai.return_value = self.recommendations
+        job, _ = enqueue_recommendations()
+        self.assertEqual(job.payload_id, snapshot_hash(job.payload.load()))
+
+        self.run_queue()
+        job.refresh_from_db()
+        self.assertEqual(job.report.payload_id, job.payload_id)
+        self.assertEqual(job.report.snapshot_hash, job.payload_id)
+        self.assertEqual(ReportPayload.objects.count(), 1)
+
+    @mock.patch('analytics.jobs.request_ai_recommendations', return_value=None)
+    def test_fallback_report_is_not_reused(self, request_ai):
+        enqueue_recommendations()
+        self.run_queue()
+        job = AIJob.objects.get()
+        self.assertEqual(job.report.generated_by, FALLBACK_SOURCE)
+
+        job, report = enqueue_recommendations()
+        self.assertIsNotNone(job)
+        self.assertIsNone(report)
+
+    @mock.patch('analytics.jobs.request_ai_recommendations')
+    def test_view_serves_latest_report_without_calling_llm(self, request_ai):
+        user = CustomUser.objects.create_user(username='manager', password='pw', role='manager')
+        self.client.force_login(user)
+        response = self.client.get(reverse('ai_recommendations'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, reverse('ai_recommendations_stream'))
+        self.assertFalse(AIJob.objects.exists())
+        request_ai.assert_not_called()
+
+
+@mock.patch('analytics.llm.requests.post')
+class LLMClientTests(TestCase):
+    reply = '[{"title": "Raise weekend rates", "message": "Demand is high.", "priority": "high", "type": "info", "action": "Review rates"}]'
+
+    def setUp(self):
+        reset_llm_state()
+        self.analytics_data = get_hotel_analytics_data()
+
+    def ok_response(self):
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'choices': [{'message': {'content': self.reply}}]}
+        return response
+
+    def test_identical_prompt_is_served_from_cache(self, post):
+        post.return_value = self.ok_response()
+        first = get_ai_recommendations(self.analytics_data)
+        second = get_ai_recommendations(self.analytics_data)
+        self.assertEqual(first, second)
+        self.assertEqual(first[0]['title'], 'Raise weekend rates')
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(llm_stats()['cache_hits'], 1)
+
+    def test_breaker_opens_after_consecutive_failures(self, post):
+        post.side_effect = ConnectionError('upstream down')
+        fallback = get_fallback_recommendations(self.analytics_data)
+        for _ in range(circuit_breaker.failure_threshold + 2):
+            self.assertEqual(get_ai_recommendations(self.analytics_data), fallback)
+
+        stats = llm_stats()
+        self.assertEqual(post.call_count, circuit_breaker.failure_threshold)
+        self.assertEqual(stats['short_circuited'], 2)
+        self.assertEqual(stats['breaker_trips'], 1)
+        self.assertEqual(stats['breaker_state'], 'open')
+
+    def test_breaker_closes_after_successful_trial(self, post):
+        post.side_effect = ConnectionError('upstream down')
+        for _ in range(circuit_breaker.failure_threshold):
+            get_ai_recommendations(self.analytics_data)
+        self.assertEqual(circuit_breaker.state, 'open')
+
+        post.side_effect = None
+        post.return_value = self.ok_response()
+        with mock.patch.object(circuit_breaker, 'cooldown', 0):
+            self.assertEqual(get_ai_recommendations(self.analytics_data)[0]['title'], 'Raise weekend rates')
+        self.assertEqual(circuit_breaker.state, 'closed')
+
+
+class AIBackendTests(TestCase):
+    def test_objects_are_yielded_as_soon_as_they_close(self):
+        chunks = ['Here you go:\n```json\n[{"title": "A", "message": "brace } in', ' text"}', ', {"title": "B"', ', "message": "x"}]\n```']
+        stream = iter_json_objects(iter(chunks))
+        self.assertEqual(next(stream), {'title': 'A', 'message': 'brace } in text'})
+        self.assertEqual(list(stream), [{'title': 'B', 'message': 'x'}])
+
+    @override_settings(AI_BACKEND='rules')
+    def test_stream_view_sends_recommendations_then_reuses_report(self):
+        user = CustomUser.objects.create_user(username='manager', password='pw', role='manager')
+        self.client.force_login(user)
+        expected = get_fallback_recommendations(get_hotel_analytics_data())
+        self.assertTrue(expected)
+
+        response = self.client.get(reverse('ai_recommendations_stream'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(body.count('event: recommendation'), len(expected))
+        self.assertIn('"reused": false', body)
+        report = AIReport.objects.get()
+        self.assertEqual(report.generated_by, 'Rules engine')
+        self.assertEqual(report.recommendations, expected)
+
+        body = b''.join(self.client.get(reverse('ai_recommendations_stream')).streaming_content).decode()
+        self.assertIn('"reused": true', body)
+        self.assertEqual(AIReport.objects.count(), 1)
+
+    @override_settings(AI_BACKEND='local')
+    @mock.patch('analytics.llm.requests.post')
+    def test_interrupted_stream_is_neither_cached_nor_saved(self, post):
+        reset_llm_state()
+        def lines():
+            delta = '[{"title": "Partial", "message": "Cut off"}, {"title": "Nev'
+            yield 'data: ' + json.dumps({'choices': [{'delta': {'content': delta}}]})
+            raise ConnectionError('connection reset')
+        response = mock.MagicMock(status_code=200)
+        response.iter_lines.return_value = lines()
+        post.return_value.__enter__.return_value = response
+        user = CustomUser.objects.create_user(username='manager', password='pw', role='manager')
+        self.client.force_login(user)
+        fallback = get_fallback_recommendations(get_hotel_analytics_data())
+
+        body = b''.join(self.client.get(reverse('ai_recommendations_stream')).streaming_content).decode()
+        self.assertLess(body.index('"Partial"'), body.index('event: interrupted'))
+        self.assertEqual(body.count('event: recommendation'), 1 + len(fallback))
+        self.assertIn(f'"generated_by": "{FALLBACK_SOURCE}"', body)
+        self.assertIn('"report_id": null', body)
+        self.assertFalse(AIReport.objects.exists())
+        self.assertEqual(llm_stats()['cached_responses'], 0)
+        self.assertEqual(llm_stats()['upstream_failures'], 1)
+
+
+class RuleEngineTests(TestCase):
+    def seed_history(self, days):
+        start = timezone.localdate() - timedelta(days=days - 1)
+        DailyMetrics.objects.bulk_create([
+            DailyMetrics(
+                date=start + timedelta(days=i),
+                total_rooms=10, occupied_rooms=i % 10, available_rooms=10 - i % 10,
+                occupancy_rate=(i % 10) * 10, total_revenue=1000 * (1 + i // 30),
+                guest_count=i % 10, check_ins=i % 3, check_outs=0, cancellations=1 if i % 5 == 0 else 0,
+            )
+            for i in range(days)
+        ])
+        return start
+
+    def test_threshold_override_changes_snapshot_result(self):
+        data = get_hotel_analytics_data()
+        data['occupancy']['rate'] = 45
+        titles = [rec['title'] for rec in recommend(data)]
+        self.assertIn('Low Occupancy Alert', titles)
+        titles = [rec['title'] for rec in recommend(data, with_thresholds({'low_occupancy': 40}))]
+        self.assertNotIn('Low Occupancy Alert', titles)
+
+    def test_backtest_matches_rules_day_by_day(self):
+        start = self.seed_history(120)
+        end = start + timedelta(days=99)
+        result = backtest_rules(start + timedelta(days=40), end)
+
+        self.assertEqual(len(result['dates']), 60)
+        self.assertIn('pending_payments', result['skipped'])
+        low = result['fired']['low_occupancy']
+        expected = [DailyMetrics.objects.get(date=date).occupancy_rate < 50 for date in result['dates']]
+        self.assertEqual(low.tolist(), expected)
+        # Optimal and low occupancy share a group, so never fire together
+        self.assertFalse((low & result['fired']['optimal_occupancy']).any())
+        self.assertTrue(result['fired']['revenue_trending_up'].any())
+
+    def test_backtest_needs_history_for_windows(self):
+        start = self.seed_history(10)
+        result = backtest_rules(start, start + timedelta(days=9))
+        self.assertFalse(result['fired']['high_cancellations'].any())
+        self.assertFalse(result['fired']['low_upcoming_bookings'][-1])
+
+
+class ForecastTests(TestCase):
+    def test_smoothed_level_matches_recursive_smoothing(self):
+        values = np.array([4.0, 7.0, 5.0, 9.0, 6.0])
+        level = values[0]
+        for value in values[1:]:
+            level = 0.3 * value + 0.7 * level
+        self.assertAlmostEqual(smoothed_level(values, 0.3), level)
+
+    def test_pickup_curve_is_share_booked_at_least_lead_days_ahead(self):
+        curve = pickup_curve([0, 1, 1, 3, 10], max_lead=4)
+        self.assertEqual(curve.tolist(), [1.0, 0.8, 0.4, 0.4, 0.2])
+
+    def test_weekly_pattern_is_forecast(self):
+        pattern = np.array([10, 10, 10, 10, 20, 20, 10], dtype=float)
+        history = np.tile(pattern, 20)
+        forecast = seasonal_forecast(history, first_weekday=0, horizon=14)
+        np.testing.assert_allclose(forecast, np.tile(pattern, 2))
+
+    def test_forecast_report_counts_rooms_on_the_books(self):
+        today = timezone.localdate()
+        room_type = RoomType.objects.create(name='single', base_price=100, max_occupancy=1)
+        rooms = [
+            Room.objects.create(room_number=str(100 + i), floor=1, room_type=room_type, price_per_night=100)
+            for i in range(4)
+        ]
+        DailyMetrics.objects.bulk_create([
+            DailyMetrics(
+                date=today - timedelta(days=i), total_rooms=4, occupied_rooms=1, available_rooms=3,
+                occupancy_rate=25, total_revenue=100, guest_count=1, check_ins=0, check_outs=0, cancellations=0,
+            )
+            for i in range(1, 57)
+        ])
+        guest = Guest.objects.create(first_name='Ada', last_name='Obi', email='ada@example.com', phone='1')
+        reservation = Reservation.objects.create(
+            guest=guest, room=rooms[0], status='confirmed',
+            check_in_date=today + timedelta(days=2), check_out_date=today + timedelta(days=4),
+            number_of_guests=1, total_price=200,
+        )
+        for room in rooms:
+            RoomNight.objects.create(room=room, reservation=reservation, date=today + timedelta(days=2))
+
+        forecast = build_forecast()
+        self.assertEqual(len(forecast['dates']), 90)
+        self.assertEqual(forecast['occupied'][2], 4)
+        self.assertTrue((forecast['occupied'] <= 4).all())
+
+        report = save_forecast_report(forecast)
+        self.assertEqual(report.report_type, 'revenue')
+        self.assertEqual(report.get_data()['horizons']['30']['on_the_books'], 4)
+        self.assertEqual(len(report.get_data()['daily']), 90)
+
+
+class ReportStorageTests(TestCase):
+    data = {'occupancy': {'rate': 42.5}, 'room_types': [{'name': 'single', 'count': 3}]}
+
+    def save(self, data=None):
+        return save_ai_report('recommendations', 'Report', 'Summary', data or self.data, {}, [])
+
+    def test_identical_payloads_are_stored_once(self):
+        first, second = self.save(), self.save()
+        self.assertIsNone(first.data)
+        self.assertEqual(first.payload_id, second.payload_id)
+        self.assertEqual(ReportPayload.objects.count(), 1)
+        self.assertTrue(first.payload.compressed)
+        self.assertEqual(AIReport.objects.get(pk=second.pk).get_data(), self.data)
+
+    @override_settings(AI_REPORT_STORAGE='inline')
+    def test_inline_reports_are_compacted(self):
+        report = self.save()
+        self.assertEqual(report.data, self.data)
+        self.assertEqual(compact_ai_reports(), 1)
+        report.refresh_from_db()
+        self.assertIsNone(report.data)
+        self.assertEqual(report.get_data(), self.data)
+
+    def test_prune_keeps_latest_and_drops_orphan_payloads(self):
+        old = self.save({'old': True})
+        latest = self.save()
+        AIReport.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=200))
+        AIReport.objects.filter(pk=latest.pk).update(created_at=timezone.now() - timedelta(days=150))
+
+        counts = prune_ai_reports(timezone.now() - timedelta(days=90))
+        self.assertEqual(counts, {'reports': 1, 'jobs': 0, 'payloads': 1})
+        self.assertEqual(list(AIReport.objects.values_list('pk', flat=True)), [latest.pk])
+        self.assertEqual(list(ReportPayload.objects.values_list('digest', flat=True)), [latest.payload_id])
+
+    def test_prune_keeps_payloads_of_queued_jobs(self):
+        job, _ = enqueue_report('recommendations', {'queued': True})
+        counts = prune_ai_reports(timezone.now())
+        self.assertEqual(counts['payloads'], 0)
+        self.assertEqual(list(ReportPayload.objects.values_list('digest', flat=True)), [job.payload_id])
+
+    def test_history_pages_without_loading_payloads(self):
+        for _ in range(25):
+            self.save()
+        user = CustomUser.objects.create_user(username='manager', password='pw', role='manager')
+        self.client.force_login(user)
+        response = self.client.get(reverse('ai_report_history'), {'page': 2})
+        page = response.context['page']
+        self.assertEqual(len(page.object_list), 5)
+        self.assertEqual(page.object_list[0].get_deferred_fields(), {'data', 'insights', 'recommendations'})
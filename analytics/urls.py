@@ -10,7 +10,10 @@ urlpatterns = [
     path('recommendations/', views.ai_recommendations, name='ai_recommendations'),
     path('reports/performance/', views.performance_report, name='performance_report'),
     path('recommendations/', views.ai_recommendations, name='ai_recommendations'),
+    path('recommendations/stream/', views.ai_recommendations_stream, name='ai_recommendations_stream'),
+    path('recommendations/jobs/<uuid:job_id>/', views.ai_job_status, name='ai_job_status'),
     path('reports/', views.ai_report_history, name='ai_report_history'),
     path('reports/<uuid:report_id>/', views.ai_report_detail, name='ai_report_detail'),
+    path('cache/stats/', views.snapshot_cache_stats, name='snapshot_cache_stats'),
 ]
 
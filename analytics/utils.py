@@ -1,99 +1,85 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from django.conf import settings
-from django.utils import timezone
-from django.db.models import Sum, Avg, Count
+from django.db import connections, transaction
+from core.utils import hotel_today
+from django.db.models import Sum, Avg, Count, F, Q, Case, When, Value, FloatField
+from django.db.models.functions import Length, Round
 from datetime import timedelta
 from rooms.models import Room, HousekeepingTask
 from reservations.models import Reservation
 from billing.models import Payment, Folio
-from .models import DailyMetrics, AIReport
-import json,ast,re,requests
+from .cache import invalidate_snapshots
+from .models import AIJob, AIReport, DailyMetrics, ReportPayload
+from .rules import recommend
+import json,ast,re
 def get_hotel_analytics_data():
-    today = timezone.now().date()
+    """
+    Snapshot of hotel performance for the AI recommendations, built from
+    one conditional aggregate per table (plus the two grouped reservation
+    breakdowns) instead of a query per figure.
+    """
+    today = hotel_today()
     last_30_days = today - timedelta(days=30)
     last_7_days = today - timedelta(days=7)
 
-    total_rooms = Room.objects.count()
-    occupied_rooms = Room.objects.filter(status='occupied').count()
-    maintenance_rooms = Room.objects.filter(status='maintenance').count()
+    rooms = Room.objects.aggregate(
+        total=Count('id'),
+        occupied=Count('id', filter=Q(status='occupied')),
+        maintenance=Count('id', filter=Q(status='maintenance')),
+    )
+    total_rooms = rooms['total']
+    occupied_rooms = rooms['occupied']
+    maintenance_rooms = rooms['maintenance']
     occupancy_rate = (occupied_rooms / total_rooms * 100) if total_rooms > 0 else 0
-    
-    total_reservations = Reservation.objects.filter(
-        created_at__date__gte=last_30_days
-    ).count()
-    
-    confirmed_reservations = Reservation.objects.filter(
-        status='confirmed',
-        check_in_date__gte=today
-    ).count()
-    
-    upcoming_checkins = Reservation.objects.filter(
-        status='confirmed',
-        check_in_date__lte=today + timedelta(days=7),
-        check_in_date__gte=today
-    ).count()
-    
-    cancellation_rate = Reservation.objects.filter(
-        created_at__date__gte=last_30_days,
-        status='cancelled'
-    ).count()
+
+    upcoming = Q(status='confirmed', check_in_date__gte=today)
+    reservations = Reservation.objects.aggregate(
+        total_monthly=Count('id', filter=Q(business_date__gte=last_30_days)),
+        cancelled_monthly=Count('id', filter=Q(business_date__gte=last_30_days, status='cancelled')),
+        confirmed=Count('id', filter=upcoming),
+        upcoming_7days=Count('id', filter=upcoming & Q(check_in_date__lte=today + timedelta(days=7))),
+        vip_upcoming=Count('id', filter=upcoming & Q(check_in_date__lte=today + timedelta(days=14), guest__vip=True)),
+    )
+    total_reservations = reservations['total_monthly']
+    confirmed_reservations = reservations['confirmed']
+    upcoming_checkins = reservations['upcoming_7days']
+    cancellation_rate = reservations['cancelled_monthly']
     cancellation_percentage = (cancellation_rate / total_reservations * 100) if total_reservations > 0 else 0
-    
-    monthly_revenue = Payment.objects.filter(
-        status='completed',
-        created_at__date__gte=last_30_days
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    weekly_revenue = Payment.objects.filter(
-        status='completed',
-        created_at__date__gte=last_7_days
-    ).aggregate(total=Sum('amount'))['total'] or 0
-
-    completed_folios = Folio.objects.filter(
-        status='settled',
-        created_at__date__gte=last_30_days
+    vip_upcoming = reservations['vip_upcoming']
+
+    payments = Payment.objects.aggregate(
+        monthly_revenue=Sum('amount', filter=Q(status='completed', business_date__gte=last_30_days)),
+        weekly_revenue=Sum('amount', filter=Q(status='completed', business_date__gte=last_7_days)),
+        pending=Count('id', filter=Q(status='pending')),
+        failed_recent=Count('id', filter=Q(status='failed', business_date__gte=last_7_days)),
     )
-    
-    if completed_folios.exists():
-        avg_daily_rate = completed_folios.aggregate(
-            avg=Avg('total_amount')
-        )['avg'] or 0
-    else:
-        avg_daily_rate = 0
-    
-    pending_payments = Payment.objects.filter(status='pending').count()
-    failed_payments = Payment.objects.filter(
-        status='failed',
-        created_at__date__gte=last_7_days
-    ).count()
-
-    outstanding_balance = Folio.objects.filter(
-        status__in=['open', 'partial']
-    ).aggregate(total=Sum('balance'))['total'] or 0
-
-    pending_tasks = HousekeepingTask.objects.filter(
-        status__in=['pending', 'in_progress']
-    ).count()
-    
-    overdue_tasks = HousekeepingTask.objects.filter(
-        status='pending',
-        created_at__date__lt=today - timedelta(days=1)
-    ).count()
-
-    vip_upcoming = Reservation.objects.filter(
-        guest__vip=True,
-        status='confirmed',
-        check_in_date__lte=today + timedelta(days=14),
-        check_in_date__gte=today
-    ).count()
-    
+    monthly_revenue = payments['monthly_revenue'] or 0
+    weekly_revenue = payments['weekly_revenue'] or 0
+    pending_payments = payments['pending']
+    failed_payments = payments['failed_recent']
+
+    folios = Folio.objects.aggregate(
+        avg_daily_rate=Avg('total_amount', filter=Q(status='settled', business_date__gte=last_30_days)),
+        outstanding_balance=Sum('balance', filter=Q(status__in=['open', 'partial'])),
+    )
+    avg_daily_rate = folios['avg_daily_rate'] or 0
+    outstanding_balance = folios['outstanding_balance'] or 0
+
+    tasks = HousekeepingTask.objects.aggregate(
+        pending=Count('id', filter=Q(status__in=['pending', 'in_progress'])),
+        overdue=Count('id', filter=Q(status='pending', created_at__date__lt=today - timedelta(days=1))),
+    )
+    pending_tasks = tasks['pending']
+    overdue_tasks = tasks['overdue']
+
     repeat_guests = Reservation.objects.filter(
-        created_at__date__gte=last_30_days
+        business_date__gte=last_30_days
     ).values('guest').annotate(
         visit_count=Count('id')
     ).filter(visit_count__gt=1).count()
 
     room_type_bookings = Reservation.objects.filter(
-        created_at__date__gte=last_30_days,
+        business_date__gte=last_30_days,
         status__in=['confirmed', 'checked_in', 'checked_out']
     ).values('room__room_type__name').annotate(
         count=Count('id')
@@ -132,79 +118,54 @@ def get_hotel_analytics_data():
         },
         'room_types': list(room_type_bookings)
     }
-def get_ai_recommendations(analytics_data):
-    try:
-        API_URL = "https://router.huggingface.co/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {settings.HUGGINGFACE_API_TOKEN}",
-        }
-
-        prompt = f"""
-        You are a hotel management expert. Analyze this data and provide 5-7 actionable recommendations.
-
-        HOTEL PERFORMANCE DATA:
-        - Occupancy: {analytics_data['occupancy']['rate']}% ({analytics_data['occupancy']['occupied']}/{analytics_data['occupancy']['total']} rooms)
-        - Maintenance Rooms: {analytics_data['occupancy']['maintenance']}
-        - Monthly Reservations: {analytics_data['reservations']['total_monthly']}
-        - Confirmed Reservations: {analytics_data['reservations']['confirmed']}
-        - Upcoming Check-ins (7 days): {analytics_data['reservations']['upcoming_7days']}
-        - Cancellation Rate: {analytics_data['reservations']['cancellation_rate']}%
-        - Monthly Revenue: ₦{analytics_data['revenue']['monthly']:,.0f}
-        - Weekly Revenue: ₦{analytics_data['revenue']['weekly']:,.0f}
-        - Average Daily Rate: ₦{analytics_data['revenue']['average_daily_rate']:,.0f}
-        - Pending Payments: {analytics_data['payments']['pending']}
-        - Failed Payments: {analytics_data['payments']['failed_recent']}
-        - Outstanding Balance: ₦{analytics_data['revenue']['outstanding_balance']:,.0f}
-        - Pending Housekeeping: {analytics_data['housekeeping']['pending']}
-        - Overdue Tasks: {analytics_data['housekeeping']['overdue']}
-        - VIP Guests Coming: {analytics_data['guests']['vip_upcoming']}
-        - Repeat Guests: {analytics_data['guests']['repeat_guests']}
-
-        Provide recommendations as a JSON array with this exact format:
-        [
-        {{
-            "title": "recommendation title",
-            "message": "detailed 2-3 sentence explanation",
-            "priority": "high",
-            "type": "warning",
-            "action": "Action Button Text"
-        }}
-        ]
-
-        Focus on: revenue optimization, operational efficiency, guest experience, risk mitigation, and cost management.
-        Return ONLY the JSON array, no other text.
-        """
-
-        payload = {
-            "model": "meta-llama/Llama-3.2-3B-Instruct:novita",
-            "messages": [
-                {"role": "user", "content": prompt}
-            ],
-            "max_tokens": 1200,
-            "temperature": 0.7,
-            "top_p": 0.95
-        }
-
-        response = requests.post(API_URL, headers=headers, json=payload, timeout=30)
-
-        if response.status_code == 200:
-            result = response.json()
-            generated_text = result["choices"][0]["message"]["content"]
-            recommendations = parse_recommendations_from_text(generated_text)
-
-            if recommendations and len(recommendations) > 0:
-                return recommendations
-            else:
-                print("AI response parsing failed, using fallback recommendations")
-                return get_fallback_recommendations(analytics_data)
+def build_recommendations_prompt(analytics_data):
+    return f"""
+    You are a hotel management expert. Analyze this data and provide 5-7 actionable recommendations.
 
-        else:
-            print(f"Hugging Face API Error: {response.status_code} - {response.text}")
-            return get_fallback_recommendations(analytics_data)
+    HOTEL PERFORMANCE DATA:
+    - Occupancy: {analytics_data['occupancy']['rate']}% ({analytics_data['occupancy']['occupied']}/{analytics_data['occupancy']['total']} rooms)
+    - Maintenance Rooms: {analytics_data['occupancy']['maintenance']}
+    - Monthly Reservations: {analytics_data['reservations']['total_monthly']}
+    - Confirmed Reservations: {analytics_data['reservations']['confirmed']}
+    - Upcoming Check-ins (7 days): {analytics_data['reservations']['upcoming_7days']}
+    - Cancellation Rate: {analytics_data['reservations']['cancellation_rate']}%
+    - Monthly Revenue: ₦{analytics_data['revenue']['monthly']:,.0f}
+    - Weekly Revenue: ₦{analytics_data['revenue']['weekly']:,.0f}
+    - Average Daily Rate: ₦{analytics_data['revenue']['average_daily_rate']:,.0f}
+    - Pending Payments: {analytics_data['payments']['pending']}
+    - Failed Payments: {analytics_data['payments']['failed_recent']}
+    - Outstanding Balance: ₦{analytics_data['revenue']['outstanding_balance']:,.0f}
+    - Pending Housekeeping: {analytics_data['housekeeping']['pending']}
+    - Overdue Tasks: {analytics_data['housekeeping']['overdue']}
+    - VIP Guests Coming: {analytics_data['guests']['vip_upcoming']}
+    - Repeat Guests: {analytics_data['guests']['repeat_guests']}
+
+    Provide recommendations as a JSON array with this exact format:
+    [
+    {{
+        "title": "recommendation title",
+        "message": "detailed 2-3 sentence explanation",
+        "priority": "high",
+        "type": "warning",
+        "action": "Action Button Text"
+    }}
+    ]
+
+    Focus on: revenue optimization, operational efficiency, guest experience, risk mitigation, and cost management.
+    Return ONLY the JSON array, no other text.
+    """
 
+def request_ai_recommendations(analytics_data):
+    """Recommendations from the configured AI backend, or None when it fails"""
+    from .ai_backends import get_ai_backend
+    try:
+        return get_ai_backend().recommendations(analytics_data)
     except Exception as e:
-        print(f"Hugging Face API Error: {str(e)}")
-        return get_fallback_recommendations(analytics_data)   
+        print(f"AI backend error: {str(e)}")
+        return None
+
+def get_ai_recommendations(analytics_data):
+    return request_ai_recommendations(analytics_data) or get_fallback_recommendations(analytics_data)
 def parse_recommendations_from_text(text):
     if not text:
         return None
@@ -250,191 +211,310 @@ def parse_recommendations_from_text(text):
                 continue
     return None
 def get_fallback_recommendations(analytics_data):
-    recommendations = []
-    occupancy_rate = analytics_data['occupancy']['rate']
-    if occupancy_rate < 50:
-        recommendations.append({
-            'type': 'warning',
-            'title': 'Low Occupancy Alert',
-            'message': f'Current occupancy is {occupancy_rate}%. Consider launching promotional campaigns, offering discounts, or partnering with travel agencies to boost bookings.',
-            'action': 'Launch Promotion',
-            'priority': 'high'
-        })
-    elif occupancy_rate > 85:
-        recommendations.append({
-            'type': 'success',
-            'title': 'High Demand Period',
-            'message': f'Occupancy rate is {occupancy_rate}%. This is an excellent time to implement dynamic pricing and increase rates. Consider upselling premium room types.',
-            'action': 'Adjust Pricing',
-            'priority': 'medium'
-        })
-    elif 60 <= occupancy_rate <= 75:
-        recommendations.append({
-            'type': 'info',
-            'title': 'Optimal Occupancy Range',
-            'message': f'Occupancy at {occupancy_rate}% is healthy. Focus on maintaining service quality and guest satisfaction to encourage repeat bookings.',
-            'priority': 'low'
-        })
-    if analytics_data['reservations']['upcoming_7days'] < 5:
-        recommendations.append({
-            'type': 'warning',
-            'title': 'Low Upcoming Bookings',
-            'message': f'Only {analytics_data["reservations"]["upcoming_7days"]} check-ins scheduled for the next week. Review marketing channels and consider flash sales or last-minute deals.',
-            'action': 'Review Marketing',
-            'priority': 'high'
-        })
-    elif analytics_data['reservations']['upcoming_7days'] > 20:
-        recommendations.append({
-            'type': 'info',
-            'title': 'Busy Week Ahead',
-            'message': f'{analytics_data["reservations"]["upcoming_7days"]} check-ins in the next 7 days. Ensure adequate staffing and prepare rooms in advance.',
-            'action': 'Schedule Staff',
-            'priority': 'medium'
-        })
+    return recommend(analytics_data)
 
-    if analytics_data['reservations']['cancellation_rate'] > 15:
-        recommendations.append({
-            'type': 'warning',
-            'title': 'High Cancellation Rate',
-            'message': f'Cancellation rate is {analytics_data["reservations"]["cancellation_rate"]}%. Review cancellation policies, implement stricter deposit requirements, or offer flexible rebooking options.',
-            'action': 'Review Policy',
-            'priority': 'medium'
-        })
-    if analytics_data['payments']['pending'] > 5:
-        recommendations.append({
-            'type': 'warning',
-            'title': 'Payment Collection Required',
-            'message': f'{analytics_data["payments"]["pending"]} payments are pending. Implement automated payment reminders and follow-up procedures to improve cash flow.',
-            'action': 'Send Reminders',
-            'priority': 'high'
-        })
-    
-    if analytics_data['payments']['failed_recent'] > 3:
-        recommendations.append({
-            'type': 'warning',
-            'title': 'Payment Failures',
-            'message': f'{analytics_data["payments"]["failed_recent"]} failed payments in the last week. Review payment gateway settings and contact affected guests to resolve issues.',
-            'action': 'Contact Guests',
-            'priority': 'high'
-        })
-    if analytics_data['revenue']['weekly'] > 0 and analytics_data['revenue']['monthly'] > 0:
-        weekly_avg = analytics_data['revenue']['weekly'] / 7
-        monthly_avg = analytics_data['revenue']['monthly'] / 30
-        if weekly_avg > monthly_avg * 1.2:
-            recommendations.append({
-                'type': 'success',
-                'title': 'Revenue Trending Up',
-                'message': f'Recent weekly revenue (₦{analytics_data["revenue"]["weekly"]:,.0f}) shows improvement. Maintain current strategies and consider expanding successful promotions.',
-                'priority': 'low'
-            })
-    if analytics_data['housekeeping']['overdue'] > 5:
-        recommendations.append({
-            'type': 'warning',
-            'title': 'Housekeeping Backlog',
-            'message': f'{analytics_data["housekeeping"]["overdue"]} overdue housekeeping tasks. Consider reallocating staff or hiring temporary help to clear the backlog and maintain room availability.',
-            'action': 'Review Staffing',
-            'priority': 'medium'
-        })
-    elif analytics_data['housekeeping']['pending'] > 15:
-        recommendations.append({
-            'type': 'info',
-            'title': 'High Housekeeping Volume',
-            'message': f'{analytics_data["housekeeping"]["pending"]} pending tasks. Monitor workload and consider preventive scheduling to avoid delays.',
-            'priority': 'low'
-        })
-    if analytics_data['guests']['vip_upcoming'] > 0:
-        recommendations.append({
-            'type': 'info',
-            'title': 'VIP Guest Preparation',
-            'message': f'{analytics_data["guests"]["vip_upcoming"]} VIP guest(s) arriving soon. Ensure premium amenities, welcome packages, and room upgrades are prepared. Assign experienced staff.',
-            'action': 'Prepare VIP Welcome',
-            'priority': 'medium'
-        })
-    if analytics_data['guests']['repeat_guests'] > 10:
-        recommendations.append({
-            'type': 'success',
-            'title': 'Strong Guest Loyalty',
-            'message': f'{analytics_data["guests"]["repeat_guests"]} repeat guests this month. Consider implementing a formal loyalty program with rewards to maintain this positive trend.',
-            'action': 'Create Loyalty Program',
-            'priority': 'low'
-        })
-    if analytics_data['revenue']['outstanding_balance'] > 50000:
-        recommendations.append({
-            'type': 'warning',
-            'title': 'High Outstanding Balance',
-            'message': f'₦{analytics_data["revenue"]["outstanding_balance"]:,.0f} in outstanding balances. Implement stricter payment policies and follow-up procedures to improve collections.',
-            'action': 'Review Collections',
-            'priority': 'high'
-        })
-    if analytics_data['occupancy']['maintenance'] > 3:
-        recommendations.append({
-            'type': 'warning',
-            'title': 'Multiple Rooms Under Maintenance',
-            'message': f'{analytics_data["occupancy"]["maintenance"]} rooms currently under maintenance. Expedite repairs to maximize revenue potential, especially during high-demand periods.',
-            'action': 'Expedite Repairs',
-            'priority': 'medium'
-        })
-    
-    return recommendations
-def update_daily_metrics(target_date=None):
-    if target_date is None:
-        target_date = timezone.now().date()
+DAILY_METRIC_FIELDS = [
+    'total_rooms', 'occupied_rooms', 'available_rooms', 'occupancy_rate',
+    'total_revenue', 'guest_count', 'check_ins', 'check_outs', 'cancellations',
+]
 
-    total_rooms = Room.objects.count()
-    occupied_rooms = Room.objects.filter(status='occupied').count()
-    available_rooms = Room.objects.filter(status='available').count()
-    occupancy_rate = (occupied_rooms / total_rooms * 100) if total_rooms > 0 else 0
+def compute_daily_metrics(target_date):
+    metrics = compute_daily_metrics_range(target_date, target_date)[0]
+    del metrics['date']
+    return metrics
 
-    daily_revenue = Payment.objects.filter(
-        status='completed',
-        created_at__date=target_date
-    ).aggregate(total=Sum('amount'))['total'] or 0
+def update_daily_metrics(target_date=None):
+    if target_date is None:
+        target_date = hotel_today()
 
-    check_ins = Reservation.objects.filter(
-        checked_in_at__date=target_date
-    ).count()
-    
-    # Get check-outs for the day
-    check_outs = Reservation.objects.filter(
-        checked_out_at__date=target_date
-    ).count()
-    
-    # Get cancellations for the day
-    cancellations = Reservation.objects.filter(
-        status='cancelled',
-        updated_at__date=target_date
-    ).count()
-    
-    # Get guest count (currently checked in)
-    guest_count = Reservation.objects.filter(
-        status='checked_in',
-        checked_in_at__date__lte=target_date
-    ).count()
-    
     # Update or create the daily metrics
     metrics, created = DailyMetrics.objects.update_or_create(
         date=target_date,
-        defaults={
-            'total_rooms': total_rooms,
-            'occupied_rooms': occupied_rooms,
-            'available_rooms': available_rooms,
-            'occupancy_rate': round(occupancy_rate, 2),
-            'total_revenue': daily_revenue,
-            'guest_count': guest_count,
-            'check_ins': check_ins,
-            'check_outs': check_outs,
-            'cancellations': cancellations,
-        }
+        defaults=compute_daily_metrics(target_date)
     )
     
     return metrics
-def save_ai_report(report_type, title, summary, data, insights, recommendations):
+
+def _counts_by_day(queryset, field):
+    return dict(
+        queryset.order_by()
+        .values(field)
+        .annotate(count=Count('id'))
+        .values_list(field, 'count')
+    )
+
+def reconstruct_occupancy(start_date, end_date):
+    """
+    Rooms occupied and guests in house on each night of [start_date, end_date],
+    rebuilt from reservation stay intervals rather than live room status.
+    A stay occupies every night from its actual (or planned) arrival up to
+    its actual (or planned) departure; guests still in house past their
+    planned departure keep occupying the room until today. Each stay adds
+    +1/-1 events at the ends of its interval and one sweep over the days
+    turns them into running totals.
+    """
+    total_days = (end_date - start_date).days + 1
+    today = hotel_today()
+    room_events = [0] * (total_days + 1)
+    guest_events = [0] * (total_days + 1)
+
+    stays = Reservation.objects.filter(
+        status__in=['checked_in', 'checked_out'],
+        check_in_date__lte=end_date,
+    ).exclude(
+        status='checked_out',
+        check_out_date__lt=start_date,
+        checked_out_on__lt=start_date,
+    ).values_list(
+        'status', 'check_in_date', 'check_out_date', 'checked_in_on', 'checked_out_on',
+        'number_of_guests', 'number_of_children',
+    )
+
+    for status, check_in, check_out, checked_in_on, checked_out_on, adults, children in stays.iterator(chunk_size=2000):
+        arrival = checked_in_on or check_in
+        if status == 'checked_out':
+            departure = checked_out_on or check_out
+        else:
+            departure = max(check_out, today + timedelta(days=1))
+        first = max((arrival - start_date).days, 0)
+        last = min((departure - start_date).days, total_days)
+        if first >= last:
+            continue
+        guests = adults + (children or 0)
+        room_events[first] += 1
+        room_events[last] -= 1
+        guest_events[first] += guests
+        guest_events[last] -= guests
+
+    occupied_rooms, guest_count = [], []
+    rooms_in_house = guests_in_house = 0
+    for i in range(total_days):
+        rooms_in_house += room_events[i]
+        guests_in_house += guest_events[i]
+        occupied_rooms.append(rooms_in_house)
+        guest_count.append(guests_in_house)
+    return occupied_rooms, guest_count
+
+def compute_daily_metrics_range(start_date, end_date):
+    """
+    Metrics for every day in [start_date, end_date] from a handful of
+    GROUP BY queries and one pass over the stays, instead of one round of
+    queries per day.
+    """
+    days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+
+    total_rooms = Room.objects.count()
+    occupied_rooms, guest_count = reconstruct_occupancy(start_date, end_date)
+
+    revenue = dict(
+        Payment.objects.filter(
+            status='completed',
+            business_date__range=(start_date, end_date)
+        ).order_by()
+        .values('business_date')
+        .annotate(total=Sum('amount'))
+        .values_list('business_date', 'total')
+    )
+    check_ins = _counts_by_day(
+        Reservation.objects.filter(checked_in_on__range=(start_date, end_date)),
+        'checked_in_on'
+    )
+    check_outs = _counts_by_day(
+        Reservation.objects.filter(checked_out_on__range=(start_date, end_date)),
+        'checked_out_on'
+    )
+    cancellations = _counts_by_day(
+        Reservation.objects.filter(status='cancelled', cancelled_on__range=(start_date, end_date)),
+        'cancelled_on'
+    )
+
+    metrics = []
+    for i, day in enumerate(days):
+        occupied = min(occupied_rooms[i], total_rooms)
+        metrics.append({
+            'date': day,
+            'total_rooms': total_rooms,
+            'occupied_rooms': occupied,
+            'available_rooms': total_rooms - occupied,
+            'occupancy_rate': round(occupied / total_rooms * 100, 2) if total_rooms > 0 else 0,
+            'total_revenue': revenue.get(day) or 0,
+            'guest_count': guest_count[i],
+            'check_ins': check_ins.get(day, 0),
+            'check_outs': check_outs.get(day, 0),
+            'cancellations': cancellations.get(day, 0),
+        })
+    return metrics
+
+def save_daily_metrics_range(start_date, end_date):
+    metrics = compute_daily_metrics_range(start_date, end_date)
+    DailyMetrics.objects.bulk_create(
+        [DailyMetrics(**values) for values in metrics],
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['date'],
+        update_fields=DAILY_METRIC_FIELDS + ['updated_at'],
+    )
+    invalidate_snapshots('analytics.DailyMetrics')
+    return len(metrics)
+
+def _close_worker_connections():
+    connections.close_all()
+
+def backfill_daily_metrics(start_date, end_date, workers=1, chunk_days=90, progress=None):
+    """
+    Recompute and upsert DailyMetrics for [start_date, end_date] in chunks
+    of `chunk_days`, optionally spread over a process pool. `progress` is
+    called with (days_done, total_days) after each chunk.
+    """
+    chunks = []
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_date)
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = chunk_end + timedelta(days=1)
+
+    total_days = (end_date - start_date).days + 1
+    days_done = 0
+    if workers <= 1 or len(chunks) == 1:
+        for chunk_start, chunk_end in chunks:
+            days_done += save_daily_metrics_range(chunk_start, chunk_end)
+            if progress:
+                progress(days_done, total_days)
+        return days_done
+
+    # Forked workers must not share the parent's database connection.
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_close_worker_connections) as pool:
+        futures = [pool.submit(save_daily_metrics_range, *chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            days_done += future.result()
+            if progress:
+                progress(days_done, total_days)
+    return days_done
+
+def occupancy_delta(rooms):
+    """DailyMetrics deltas for `rooms` rooms becoming occupied (negative when vacated)."""
+    return {'occupied_rooms': rooms, 'available_rooms': -rooms}
+
+def apply_metrics_delta(target_date=None, **deltas):
+    """
+    Add deltas (check_ins=1, total_revenue=amount, ...) to a day's
+    DailyMetrics row with a single UPDATE using F() expressions, so it joins
+    the caller's transaction and never races with other front-desk actions.
+    The first action of the day seeds the row with a full recompute instead.
+    """
+    if target_date is None:
+        target_date = hotel_today()
+    deltas = {field: value for field, value in deltas.items() if value}
+    if not deltas:
+        return 0
+
+    updates = {field: F(field) + value for field, value in deltas.items()}
+    if 'occupied_rooms' in deltas:
+        updates['occupancy_rate'] = Case(
+            When(total_rooms__gt=0, then=Round(
+                (F('occupied_rooms') + deltas['occupied_rooms']) * 100.0 / F('total_rooms'), 2
+            )),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+
+    updated = DailyMetrics.objects.filter(date=target_date).update(**updates)
+    if not updated:
+        update_daily_metrics(target_date)
+    return updated
+
+def reconcile_daily_metrics(target_date=None):
+    """
+    Recompute a day's metrics from scratch, store them and return the drift
+    between what the incremental updates had accumulated and the recompute,
+    as {field: (stored, recomputed)} for every field that differed.
+    """
+    if target_date is None:
+        target_date = hotel_today()
+
+    computed = compute_daily_metrics(target_date)
+    stored = DailyMetrics.objects.filter(date=target_date).values(*DAILY_METRIC_FIELDS).first()
+    drift = {}
+    if stored is not None:
+        for field in DAILY_METRIC_FIELDS:
+            if round(float(stored[field]), 2) != round(float(computed[field]), 2):
+                drift[field] = (stored[field], computed[field])
+
+    DailyMetrics.objects.update_or_create(date=target_date, defaults=computed)
+    return drift
+def save_ai_report(report_type, title, summary, data, insights, recommendations,
+                   generated_by='AI Analytics Engine', snapshot_hash=''):
+    payload = None
+    if getattr(settings, 'AI_REPORT_STORAGE', 'shared') == 'shared':
+        payload = ReportPayload.store(data, compress=getattr(settings, 'AI_REPORT_COMPRESS', True))
+        data = None
     report = AIReport.objects.create(
         report_type=report_type,
         title=title,
         summary=summary,
         data=data,
+        payload=payload,
         insights=insights,
-        recommendations=recommendations
+        recommendations=recommendations,
+        generated_by=generated_by,
+        snapshot_hash=snapshot_hash,
+    )
+    return report
+
+def compact_ai_reports(compress=True, batch_size=200):
+    """Move inline report data into shared payloads. Returns the number of reports moved."""
+    moved = 0
+    while True:
+        reports = list(AIReport.objects.filter(payload__isnull=True, data__isnull=False).only('id', 'data')[:batch_size])
+        if not reports:
+            return moved
+        for report in reports:
+            payload = ReportPayload.store(report.data, compress=compress)
+            AIReport.objects.filter(pk=report.pk).update(payload=payload, data=None)
+        moved += len(reports)
+
+def prune_ai_reports(cutoff, keep_latest=1, dry_run=False):
+    """
+    Delete reports created before `cutoff` (always keeping the newest
+    `keep_latest` of each type), finished jobs older than that, and the
+    shared payloads no remaining report or job points to. Returns the counts.
+    """
+    keep = []
+    for report_type, _ in AIReport.REPORT_TYPE_CHOICES:
+        keep += AIReport.objects.filter(report_type=report_type).values_list('id', flat=True)[:keep_latest]
+    reports = AIReport.objects.filter(created_at__lt=cutoff).exclude(id__in=keep)
+    jobs = AIJob.objects.filter(status__in=['done', 'failed'], finished_at__lt=cutoff)
+    remaining = AIReport.objects.exclude(id__in=reports.values('id')).filter(payload__isnull=False)
+    payloads = (
+        ReportPayload.objects.exclude(digest__in=remaining.values('payload'))
+        .exclude(digest__in=AIJob.objects.exclude(id__in=jobs.values('id')).values('payload'))
     )
-    return report
\ No newline at end of file
+
+    counts = {'reports': reports.count(), 'jobs': jobs.count(), 'payloads': payloads.count()}
+    if not dry_run:
+        with transaction.atomic():
+            jobs.delete()
+            reports.delete()
+            ReportPayload.objects.exclude(
+                digest__in=AIReport.objects.filter(payload__isnull=False).values('payload')
+            ).exclude(digest__in=AIJob.objects.values('payload')).delete()
+    return counts
+
+def ai_report_storage_stats():
+    reports = AIReport.objects.aggregate(
+        total=Count('id'),
+        inline=Count('id', filter=Q(data__isnull=False)),
+    )
+    payloads = ReportPayload.objects.aggregate(
+        total=Count('digest'),
+        raw_bytes=Sum('size'),
+        stored_bytes=Sum(Length('content')),
+    )
+    return {
+        'reports': reports['total'],
+        'inline_reports': reports['inline'],
+        'payloads': payloads['total'],
+        'payload_raw_bytes': payloads['raw_bytes'] or 0,
+        'payload_stored_bytes': payloads['stored_bytes'] or 0,
+    }
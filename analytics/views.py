@@ -1,7 +1,10 @@
 # analytics/views.py
-from django.shortcuts import get_object_or_404, render
+import json
+from django.shortcuts import get_object_or_404, redirect, render
+from django.contrib import messages
+from django.core.paginator import Paginator
+from django.http import JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
-from django.utils import timezone
 from django.db.models import Count, Sum, Avg
 from datetime import timedelta
 from core.decorators import role_required
@@ -9,26 +12,30 @@ from reservations.models import Reservation
 from rooms.models import Room
 from billing.models import Payment, Folio
 from guests.models import Guest
-from .models import AIReport, DailyMetrics
-from .utils import get_hotel_analytics_data, get_ai_recommendations,save_ai_report
+from .llm import llm_stats
+from .ai_backends import get_ai_backend
+from .jobs import (
+    ACTIVE_JOB_STATUSES, FALLBACK_SOURCE, enqueue_recommendations,
+    find_reusable_report, save_recommendations_report, snapshot_hash,
+)
+from .models import AIJob, AIReport, DailyMetrics
+from core.utils import SERIES_PERIODS, hotel_today, time_series
+from .cache import cached_snapshot, snapshot_stats, snapshot_ttl
+from .utils import get_hotel_analytics_data, get_fallback_recommendations
 
-@login_required(login_url='login')
-@role_required(['admin', 'manager', 'accounting'])
-def analytics_dashboard(request):
-    today = timezone.now().date()
-    last_30_days = today - timedelta(days=30)
+def _dashboard_snapshot(today, last_30_days):
     total_guests = Guest.objects.count()
     total_rooms = Room.objects.count()
     occupied_rooms = Room.objects.filter(status='occupied').count()
     occupancy_rate = (occupied_rooms / total_rooms * 100) if total_rooms > 0 else 0
     total_revenue = Payment.objects.filter(
         status='completed',
-        created_at__date__gte=last_30_days
+        business_date__gte=last_30_days
     ).aggregate(total=Sum('amount'))['total'] or 0
     
     avg_revenue = total_revenue / 30 if total_revenue > 0 else 0
     total_reservations = Reservation.objects.filter(
-        created_at__date__gte=last_30_days
+        business_date__gte=last_30_days
     ).count()
     
     confirmed_reservations = Reservation.objects.filter(
@@ -49,8 +56,7 @@ def analytics_dashboard(request):
         total_revenue=Sum('total_revenue')
     )
     
-    context = {
-        'title': 'Analytics Dashboard',
+    return {
         'total_guests': total_guests,
         'total_rooms': total_rooms,
         'occupied_rooms': occupied_rooms,
@@ -63,17 +69,25 @@ def analytics_dashboard(request):
         'vip_guests': vip_guests,
         'daily_metrics': daily_metrics,
     }
+
+@login_required(login_url='login')
+@role_required(['admin', 'manager', 'accounting'])
+def analytics_dashboard(request):
+    today = hotel_today()
+    last_30_days = today - timedelta(days=30)
+    context = {
+        'title': 'Analytics Dashboard',
+        **cached_snapshot('analytics_dashboard', (last_30_days, today), lambda: _dashboard_snapshot(today, last_30_days)),
+    }
     return render(request, 'analytics/dashboard.html', context)
 
 @login_required(login_url='login')
 @role_required(['admin', 'manager', 'accounting'])
 def occupancy_analytics(request):
-    today = timezone.now().date()
-    last_90_days = today - timedelta(days=90)
+    today = hotel_today()
+    days, period = _series_params(request)
 
-    daily_data = DailyMetrics.objects.filter(
-        date__gte=last_90_days
-    ).order_by('date').values('date', 'occupancy_rate', 'guest_count', 'total_revenue')
+    daily_data = _metrics_series(today - timedelta(days=days), today, period)
  
     current_period = DailyMetrics.objects.filter(
         date__gte=today - timedelta(days=30),
@@ -99,38 +113,55 @@ def occupancy_analytics(request):
     print("Current period Occupancy Average", current_period)
     context = {
         'title': 'Occupancy Analytics',
-        'daily_data': list(daily_data),
+        'daily_data': daily_data,
+        'period': period,
+        'days': days,
         'current_period': current_period,
         'previous_period': previous_period,
         'occupancy_trend': round(occupancy_trend, 2),
     }
     return render(request, 'analytics/occupancy.html', context)
 
-@login_required(login_url='login')
-@role_required(['admin', 'manager', 'accounting'])
-def revenue_analytics(request):
-    """Revenue analysis and forecasting"""
-    today = timezone.now().date()
-    last_90_days = today - timedelta(days=90)
-    
+def _series_params(request):
+    """Chart range (?days=, default 90) and bucket size (?period=day|week|month)"""
+    try:
+        days = min(max(int(request.GET.get('days', 90)), 1), 1095)
+    except ValueError:
+        days = 90
+    period = request.GET.get('period', 'day')
+    if period not in SERIES_PERIODS:
+        period = 'day'
+    return days, period
+
+def _metrics_series(start_date, end_date, period):
+    return time_series(
+        DailyMetrics.objects.all(), 'date', start_date, end_date, period,
+        occupancy_rate=Avg('occupancy_rate'),
+        guest_count=Avg('guest_count'),
+        total_revenue=Sum('total_revenue'),
+    )
+
+def _revenue_snapshot(today, last_90_days, period='day'):
     # Revenue by payment method
     revenue_by_method = Payment.objects.filter(
         status='completed',
-        created_at__date__gte=last_90_days
+        business_date__gte=last_90_days
     ).values('payment_method').annotate(
         total=Sum('amount'),
         count=Count('id')
     ).order_by('-total')
     
-    # Daily revenue trend
-    daily_revenue = DailyMetrics.objects.filter(
-        date__gte=last_90_days
-    ).order_by('date').values('date', 'total_revenue')
+    # Revenue trend, from payments and from the daily metrics
+    daily_revenue = time_series(
+        Payment.objects.filter(status='completed'), 'business_date',
+        last_90_days, today, period, total_revenue=Sum('amount')
+    )
+    daily_data = _metrics_series(last_90_days, today, period)
     
     # Calculate revenue metrics
     total_revenue = Payment.objects.filter(
         status='completed',
-        created_at__date__gte=last_90_days
+        business_date__gte=last_90_days
     ).aggregate(total=Sum('amount'))['total'] or 0
     
     avg_daily_revenue = DailyMetrics.objects.filter(
@@ -140,13 +171,13 @@ def revenue_analytics(request):
     # Growth rate (last 30 vs previous 30)
     last_30_revenue = Payment.objects.filter(
         status='completed',
-        created_at__date__gte=today - timedelta(days=30)
+        business_date__gte=today - timedelta(days=30)
     ).aggregate(total=Sum('amount'))['total'] or 0
     
     prev_30_revenue = Payment.objects.filter(
         status='completed',
-        created_at__date__gte=today - timedelta(days=60),
-        created_at__date__lt=today - timedelta(days=30)
+        business_date__gte=today - timedelta(days=60),
+        business_date__lt=today - timedelta(days=30)
     ).aggregate(total=Sum('amount'))['total'] or 0
     
     growth_rate = (
@@ -154,29 +185,43 @@ def revenue_analytics(request):
         if prev_30_revenue > 0 else 0
     )
     
-    context = {
-        'title': 'Revenue Analytics',
+    return {
         'revenue_by_method': list(revenue_by_method),
-        'daily_revenue': list(daily_revenue),
+        'daily_revenue': daily_revenue,
+        'daily_data': daily_data,
         'total_revenue': round(total_revenue, 2),
         'avg_daily_revenue': round(avg_daily_revenue, 2),
         'growth_rate': round(growth_rate, 2),
         'last_30_revenue': round(last_30_revenue, 2),
     }
-    return render(request, 'analytics/revenue.html', context)
 
 @login_required(login_url='login')
 @role_required(['admin', 'manager', 'accounting'])
-def guest_insights(request):
-    today = timezone.now().date()
+def revenue_analytics(request):
+    """Revenue analysis and forecasting"""
+    today = hotel_today()
+    days, period = _series_params(request)
+    last_90_days = today - timedelta(days=days)
+    context = {
+        'title': 'Revenue Analytics',
+        'period': period,
+        'days': days,
+        **cached_snapshot(
+            'revenue_analytics', (last_90_days, today, period),
+            lambda: _revenue_snapshot(today, last_90_days, period)
+        ),
+    }
+    return render(request, 'analytics/revenue.html', context)
+
+def _guest_snapshot(today):
     total_guests = Guest.objects.count()
     new_guests = Guest.objects.filter(
-        created_at__date__gte=today - timedelta(days=30)
+        business_date__gte=today - timedelta(days=30)
     ).count()
     
     repeat_guests = Guest.objects.filter(total_stays__gt=1).count()
     vip_guests = Guest.objects.filter(vip=True).count()
-    top_spenders = Guest.objects.order_by('-total_spent')[:10]
+    top_spenders = list(Guest.objects.order_by('-total_spent')[:10])
 
     gender_dist = Guest.objects.exclude(gender='').values('gender').annotate(
         count=Count('id')
@@ -187,8 +232,7 @@ def guest_insights(request):
         count=Count('id')
     ).order_by('-count')[:10]
     
-    context = {
-        'title': 'Guest Insights',
+    return {
         'total_guests': total_guests,
         'new_guests': new_guests,
         'repeat_guests': repeat_guests,
@@ -197,6 +241,15 @@ def guest_insights(request):
         'gender_dist': list(gender_dist),
         'top_nationalities': list(top_nationalities),
     }
+
+@login_required(login_url='login')
+@role_required(['admin', 'manager', 'accounting'])
+def guest_insights(request):
+    today = hotel_today()
+    context = {
+        'title': 'Guest Insights',
+        **cached_snapshot('guest_insights', (today,), lambda: _guest_snapshot(today)),
+    }
     return render(request, 'analytics/guest_insights.html', context)
 '''
 @login_required(login_url='login')
@@ -217,42 +270,111 @@ def ai_recommendations(request):
 @role_required(['admin', 'manager'])
 def ai_recommendations(request):
     """
-    Main view for AI-powered recommendations using Hugging Face
-    Now saves reports to database
+    Serve the latest recommendations report straight from the database.
+    The page regenerates through ai_recommendations_stream; without
+    JavaScript, POSTing queues a background job (see analytics.jobs and the
+    run_ai_jobs command).
     """
-    # Get analytics data
-    analytics_data = get_hotel_analytics_data()
-    
-    # Get AI recommendations
-    recommendations = get_ai_recommendations(analytics_data)
-    
-    # Save the AI report to database
-    report = save_ai_report(
-        report_type='recommendations',
-        title=f'Smart Recommendations - {timezone.now().date()}',
-        summary=f'Generated {len(recommendations)} actionable recommendations based on current hotel performance',
-        data=analytics_data,  # Store the raw analytics data
-        insights=[],  # Could add more detailed insights here
-        recommendations=recommendations  # Store the recommendations
-    )
-    
+    if request.method == 'POST':
+        job, report = enqueue_recommendations(request.user)
+        if report is not None:
+            messages.info(request, 'Hotel performance has not changed since the last report, so these recommendations are still current.')
+        else:
+            messages.success(request, 'New recommendations are being generated. This page will update when they are ready.')
+        return redirect('ai_recommendations')
+
+    # With no report yet the page streams one from ai_recommendations_stream
+    report = AIReport.objects.filter(report_type='recommendations').first()
+    job = AIJob.objects.filter(report_type='recommendations', status__in=ACTIVE_JOB_STATUSES).first()
+
     context = {
         'title': 'AI Recommendations',
-        'recommendations': recommendations,
-        'analytics_data': analytics_data,
-        'report_id': report.id,  # Pass report ID to template
+        'recommendations': report.recommendations if report else [],
+        'report': report,
+        'report_id': report.id if report else None,
+        'job': job,
     }
     
     return render(request, 'analytics/recommendations.html', context)
 
+@login_required(login_url='login')
+@role_required(['admin', 'manager'])
+def ai_recommendations_stream(request):
+    """
+    Server-sent events: a `recommendation` event for each recommendation as
+    soon as the AI backend produces it, then `done` with the saved report.
+    An unchanged analytics snapshot replays the existing report instead.
+    If the backend fails mid-reply, an `interrupted` event tells the page
+    to discard what it has, the rule-based recommendations follow and no
+    report is saved, so the next request tries the backend again.
+    """
+    analytics_data = get_hotel_analytics_data()
+    digest = snapshot_hash(analytics_data)
+
+    def event(name, payload):
+        return f"event: {name}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+    def events():
+        # Flush headers so the browser opens the stream straight away
+        yield ': stream opened\n\n'
+        report = find_reusable_report('recommendations', digest)
+        if report is not None:
+            for recommendation in report.recommendations:
+                yield event('recommendation', recommendation)
+            yield event('done', {'report_id': report.id, 'generated_by': report.generated_by, 'reused': True})
+            return
+
+        backend = get_ai_backend()
+        generated_by = backend.label
+        recommendations = []
+        interrupted = False
+        try:
+            for recommendation in backend.stream_recommendations(analytics_data):
+                recommendations.append(recommendation)
+                yield event('recommendation', recommendation)
+        except Exception as e:
+            print(f"AI backend error: {str(e)}")
+            interrupted = True
+            yield event('interrupted', {'message': 'The AI backend stopped mid-reply; showing rule-based recommendations instead.'})
+        if interrupted or not recommendations:
+            generated_by = FALLBACK_SOURCE
+            recommendations = get_fallback_recommendations(analytics_data)
+            for recommendation in recommendations:
+                yield event('recommendation', recommendation)
+
+        if interrupted:
+            yield event('done', {'report_id': None, 'generated_by': generated_by, 'reused': False})
+            return
+        report = save_recommendations_report(analytics_data, digest, recommendations, generated_by)
+        yield event('done', {'report_id': report.id, 'generated_by': generated_by, 'reused': False})
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@login_required(login_url='login')
+@role_required(['admin', 'manager'])
+def ai_job_status(request, job_id):
+    job = get_object_or_404(AIJob, id=job_id)
+    return JsonResponse({
+        'id': str(job.id),
+        'status': job.status,
+        'report_id': str(job.report_id) if job.report_id else None,
+        'error': job.error,
+    })
+
 @login_required(login_url='login')
 @role_required(['admin', 'manager'])
 def ai_report_history(request):
-    reports = AIReport.objects.all()[:20]  # Last 20 reports
-    
+    # The list only shows titles, so leave the JSON columns in the database
+    reports = AIReport.objects.defer('data', 'insights', 'recommendations')
+    page = Paginator(reports, 20).get_page(request.GET.get('page'))
+
     context = {
         'title': 'AI Report History',
-        'reports': reports,
+        'reports': page,
+        'page': page,
     }
     return render(request, 'analytics/report_history.html', context)
 
@@ -268,36 +390,30 @@ def ai_report_detail(request, report_id):
     }
     return render(request, 'analytics/report_detail.html', context)
 
-@login_required(login_url='login')
-@role_required(['admin', 'manager'])
-def performance_report(request):
-    today = timezone.now().date()
-    last_30_days = today - timedelta(days=30)
-
+def _performance_snapshot(today, last_30_days):
     revenue_30 = Payment.objects.filter(
         status='completed',
-        created_at__date__gte=last_30_days
+        business_date__gte=last_30_days
     ).aggregate(total=Sum('amount'))['total'] or 0
 
     reservations_30 = Reservation.objects.filter(
-        created_at__date__gte=last_30_days
+        business_date__gte=last_30_days
     ).count()
     
     completed_30 = Reservation.objects.filter(
         status='checked_out',
-        checked_out_at__date__gte=last_30_days
+        checked_out_on__gte=last_30_days
     ).count()
 
     new_guests_30 = Guest.objects.filter(
-        created_at__date__gte=last_30_days
+        business_date__gte=last_30_days
     ).count()
 
     avg_occupancy = DailyMetrics.objects.filter(
         date__gte=last_30_days
     ).aggregate(avg=Avg('occupancy_rate'))['avg'] or 0
     
-    context = {
-        'title': 'Performance Report',
+    return {
         'period': 'Last 30 Days',
         'revenue_30': round(revenue_30, 2),
         'reservations_30': reservations_30,
@@ -305,4 +421,24 @@ def performance_report(request):
         'new_guests_30': new_guests_30,
         'avg_occupancy': round(avg_occupancy, 2),
     }
-    return render(request, 'analytics/performance_report.html', context)
\ No newline at end of file
+
+@login_required(login_url='login')
+@role_required(['admin', 'manager'])
+def performance_report(request):
+    today = hotel_today()
+    last_30_days = today - timedelta(days=30)
+    context = {
+        'title': 'Performance Report',
+        **cached_snapshot('performance_report', (last_30_days, today), lambda: _performance_snapshot(today, last_30_days)),
+    }
+    return render(request, 'analytics/performance_report.html', context)
+
+@login_required(login_url='login')
+@role_required(['admin', 'manager'])
+def snapshot_cache_stats(request):
+    """Hit/miss counters for the cached analytics snapshots and this process's LLM calls"""
+    return JsonResponse({
+        'ttl': snapshot_ttl(),
+        'snapshots': snapshot_stats(),
+        'llm': llm_stats(),
+    })
@@ -0,0 +1,81 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+from .models import Folio, FolioLineItem, PaymentAllocation
+
+ALLOCATED_FIELDS = ['amount_paid', 'status']
+
+
+def item_status(item):
+    if item.amount_paid >= item.total:
+        return 'paid'
+    return 'partial' if item.amount_paid > 0 else 'unpaid'
+
+def plan_allocation(items, amount):
+    """
+    FIFO split of `amount` over line items (oldest first), in memory.
+    Returns [(item, share)]; the last item touched may be paid in part.
+    """
+    plan = []
+    remaining = Decimal(amount)
+    for item in items:
+        if remaining <= 0:
+            break
+        due = item.total - item.amount_paid
+        if due <= 0:
+            continue
+        share = min(due, remaining)
+        plan.append((item, share))
+        remaining -= share
+    return plan
+
+def allocate_payment(payment):
+    """
+    Spread a payment over the folio's outstanding line items, oldest
+    first, with one SELECT, one bulk UPDATE and one bulk INSERT however
+    many lines the folio has. Returns the payment's active allocations; a
+    payment that was already allocated is left alone.
+    """
+    with transaction.atomic():
+        Folio.objects.select_for_update().only('id').get(pk=payment.folio_id)
+        existing = list(payment.allocations.filter(reversed_at__isnull=True))
+        if existing:
+            return existing
+
+        items = list(
+            FolioLineItem.objects.filter(folio_id=payment.folio_id)
+            .exclude(status='paid')
+            .order_by('created_at', 'id')
+            .only('id', 'total', 'amount_paid', 'status')
+        )
+        plan = plan_allocation(items, payment.amount)
+        for item, share in plan:
+            item.amount_paid += share
+            item.status = item_status(item)
+        FolioLineItem.objects.bulk_update([item for item, _ in plan], ALLOCATED_FIELDS, batch_size=500)
+        return PaymentAllocation.objects.bulk_create(
+            [PaymentAllocation(payment=payment, line_item=item, amount=share) for item, share in plan],
+            batch_size=500,
+        )
+
+def reverse_allocation(payment):
+    """
+    Undo a payment's allocations (e.g. for a refund): the amounts come off
+    their line items in one bulk UPDATE and the allocations are marked
+    reversed. Returns how many allocations were reversed.
+    """
+    with transaction.atomic():
+        Folio.objects.select_for_update().only('id').get(pk=payment.folio_id)
+        allocations = list(payment.allocations.filter(reversed_at__isnull=True).values_list('line_item_id', 'amount'))
+        if not allocations:
+            return 0
+
+        items = FolioLineItem.objects.only('id', 'total', 'amount_paid', 'status').in_bulk([item_id for item_id, _ in allocations])
+        for item_id, amount in allocations:
+            item = items[item_id]
+            item.amount_paid -= amount
+            item.status = item_status(item)
+        FolioLineItem.objects.bulk_update(items.values(), ALLOCATED_FIELDS, batch_size=500)
+        payment.allocations.filter(reversed_at__isnull=True).update(reversed_at=timezone.now())
+    return len(allocations)
@@ -0,0 +1,214 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DecimalField, F, Q, Sum, Value, When
+from django.utils import timezone
+from .models import Folio, FolioEntry, Payment, PaymentDailyTotal
+
+TOTAL_FIELDS = ['total_amount', 'amount_paid', 'balance']
+
+
+def folio_status():
+    """Status expression derived from a folio row's own totals."""
+    return Case(
+        When(balance__lte=0, then=Value('settled')),
+        When(amount_paid__gt=0, then=Value('partial')),
+        default=Value('open'),
+    )
+
+def post_entry(folio, kind, amount, description='', line_item=None, payment=None, user=None):
+    """
+    Append a ledger entry and move the folio totals by it in the same
+    transaction. The folio row is locked first and the totals change
+    through F() expressions, so concurrent postings never overwrite each
+    other. Returns the entry, or None when `payment` was already posted.
+    """
+    amount = Decimal(amount)
+    with transaction.atomic():
+        Folio.objects.select_for_update().only('id').get(pk=folio.pk)
+        if payment is not None and FolioEntry.objects.filter(payment=payment).exists():
+            return None
+        entry = FolioEntry.objects.create(
+            folio_id=folio.pk,
+            kind=kind,
+            amount=amount,
+            description=description,
+            line_item=line_item,
+            payment=payment,
+            created_by=user,
+        )
+        if kind == 'payment':
+            changes = {'amount_paid': F('amount_paid') - amount}
+        else:
+            changes = {'total_amount': F('total_amount') + amount}
+        folios = Folio.objects.filter(pk=folio.pk)
+        folios.update(balance=F('balance') + amount, updated_at=timezone.now(), **changes)
+        folios.update(status=folio_status())
+        if payment is not None:
+            add_payment_total(payment)
+    folio.refresh_from_db(fields=TOTAL_FIELDS + ['status', 'updated_at'])
+    return entry
+
+def post_charge(folio, amount, description, line_item=None, user=None):
+    return post_entry(folio, 'charge', amount, description, line_item=line_item, user=user)
+
+def post_adjustment(folio, amount, description, user=None):
+    """Correct a folio: positive amounts add to what the guest owes, negative ones credit it."""
+    return post_entry(folio, 'adjustment', amount, description, user=user)
+
+def post_payment(payment, user=None):
+    """Credit a completed payment to its folio, once."""
+    return post_entry(
+        payment.folio,
+        'payment',
+        -payment.amount,
+        f"{payment.get_payment_method_display()} payment {payment.transaction_ref}",
+        payment=payment,
+        user=user,
+    )
+
+def folio_amounts(amounts):
+    """CASE expression mapping each folio id in `amounts` to its amount, for one UPDATE across many folios."""
+    return Case(
+        *[When(pk=folio_id, then=Value(amount)) for folio_id, amount in amounts.items()],
+        default=Value(Decimal('0')),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+def post_charges(line_items, user=None, category=''):
+    """
+    Post many saved line items, across any number of folios, as charges
+    of one `category`: one bulk INSERT of ledger entries and one UPDATE of
+    the folios' totals, instead of post_charge's round trips per item.
+    Returns the entries.
+    """
+    amounts = defaultdict(Decimal)
+    for item in line_items:
+        amounts[item.folio_id] += item.total
+    if not amounts:
+        return []
+    with transaction.atomic():
+        list(Folio.objects.select_for_update().filter(pk__in=amounts).values_list('id', flat=True))
+        entries = FolioEntry.objects.bulk_create([
+            FolioEntry(
+                folio_id=item.folio_id,
+                kind='charge',
+                category=category,
+                amount=item.total,
+                description=item.description,
+                line_item=item,
+                created_by=user,
+            )
+            for item in line_items
+        ])
+        amount = folio_amounts(amounts)
+        folios = Folio.objects.filter(pk__in=amounts)
+        folios.update(
+            total_amount=F('total_amount') + amount,
+            balance=F('balance') + amount,
+            updated_at=timezone.now(),
+        )
+        folios.update(status=folio_status())
+    return entries
+
+def add_payment_total(payment):
+    """Count a credited payment in its day's PaymentDailyTotal row, creating the row on the first payment."""
+    day = {'business_date': payment.business_date, 'payment_method': payment.payment_method}
+    changes = {'count': F('count') + 1, 'amount': F('amount') + payment.amount}
+    if PaymentDailyTotal.objects.filter(**day).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            PaymentDailyTotal.objects.create(count=1, amount=payment.amount, **day)
+    except IntegrityError:
+        # Another posting created the row first
+        PaymentDailyTotal.objects.filter(**day).update(**changes)
+
+def payment_daily_totals(start_date=None, end_date=None):
+    """{(business_date, method): (count, amount)} recomputed from completed payments."""
+    payments = Payment.objects.filter(status='completed')
+    if start_date:
+        payments = payments.filter(business_date__gte=start_date)
+    if end_date:
+        payments = payments.filter(business_date__lte=end_date)
+    rows = payments.order_by().values('business_date', 'payment_method').annotate(count=Count('id'), amount=Sum('amount'))
+    return {(row['business_date'], row['payment_method']): (row['count'], row['amount']) for row in rows}
+
+def verify_payment_totals(start_date=None, end_date=None, fix=False):
+    """
+    Compare PaymentDailyTotal with a recompute from the payments table.
+    Returns {(business_date, method): (stored, recomputed)} for the rows
+    that differ; with fix=True the rollup is rewritten for those days.
+    """
+    expected = payment_daily_totals(start_date, end_date)
+    rollup = PaymentDailyTotal.objects.all()
+    if start_date:
+        rollup = rollup.filter(business_date__gte=start_date)
+    if end_date:
+        rollup = rollup.filter(business_date__lte=end_date)
+    stored = {
+        (row.business_date, row.payment_method): (row.count, row.amount)
+        for row in rollup
+    }
+    empty = (0, Decimal('0'))
+    drift = {
+        key: (stored.get(key, empty), expected.get(key, empty))
+        for key in stored.keys() | expected.keys()
+        if stored.get(key, empty) != expected.get(key, empty)
+    }
+
+    if fix and drift:
+        with transaction.atomic():
+            for (day, method), (_, (count, amount)) in drift.items():
+                PaymentDailyTotal.objects.update_or_create(
+                    business_date=day, payment_method=method,
+                    defaults={'count': count, 'amount': amount},
+                )
+    return drift
+
+def ledger_totals(folios=None):
+    """{folio id: {'total_amount', 'amount_paid', 'balance'}} summed from the ledger."""
+    entries = FolioEntry.objects.all()
+    if folios is not None:
+        entries = entries.filter(folio__in=folios)
+    rows = entries.order_by().values('folio').annotate(
+        charged=Sum('amount', filter=~Q(kind='payment')),
+        paid=Sum('amount', filter=Q(kind='payment')),
+    )
+    totals = {}
+    for row in rows:
+        charged = row['charged'] or Decimal('0')
+        paid = -(row['paid'] or Decimal('0'))
+        totals[row['folio']] = {'total_amount': charged, 'amount_paid': paid, 'balance': charged - paid}
+    return totals
+
+def verify_folio_totals(folios=None, fix=False):
+    """
+    Compare every folio's stored totals with a recompute from its ledger.
+    Returns {folio id: {field: (stored, ledger)}} for the folios that
+    drifted; with fix=True their totals and status are rewritten from
+    the ledger.
+    """
+    folios = Folio.objects.all() if folios is None else folios
+    totals = ledger_totals(folios)
+    empty = {field: Decimal('0') for field in TOTAL_FIELDS}
+    drift = {}
+    for row in folios.values('id', *TOTAL_FIELDS).iterator(chunk_size=2000):
+        expected = totals.get(row['id'], empty)
+        fields = {
+            field: (row[field], expected[field])
+            for field in TOTAL_FIELDS if row[field] != expected[field]
+        }
+        if fields:
+            drift[row['id']] = fields
+
+    if fix:
+        for folio_id in drift:
+            with transaction.atomic():
+                Folio.objects.select_for_update().only('id').get(pk=folio_id)
+                # Re-read under the lock in case a posting landed since the scan
+                expected = ledger_totals([folio_id]).get(folio_id, empty)
+                Folio.objects.filter(pk=folio_id).update(**expected)
+                Folio.objects.filter(pk=folio_id).update(status=folio_status())
+    return drift
@@ -0,0 +1,107 @@
+import random
+import threading
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from billing.models import Folio, Payment, PaystackTransaction
+from billing.reconcile import reconcile_pending
+from guests.models import Guest
+from reservations.models import Reservation
+from rooms.models import Room, RoomType
+from .run_paystack_standin import StandInServer
+
+SECRET_KEY = 'sk_test_benchmark'
+
+
+class Command(BaseCommand):
+    help = 'Reconcile stale Paystack transactions against a stand-in with injected latency, sequentially and concurrently'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transactions', type=int, default=1000, help='Stale pending transactions to reconcile')
+        parser.add_argument('--latency', type=float, default=0.2, help='Seconds the stand-in takes per verification')
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--sample', type=int, default=20, help='Transactions verified one at a time for the sequential baseline')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark folio and payments')
+
+    def handle(self, *args, **options):
+        server = StandInServer(('127.0.0.1', 0), secret_key=SECRET_KEY, latency=options['latency'])
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        client_options = {'base_url': server.base_url, 'secret_key': SECRET_KEY, 'backoff': 0}
+        try:
+            with transaction.atomic():
+                self.seed(server, options['transactions'])
+
+                sample = options['sample']
+                self.stdout.write(f"Verifying {sample} transactions one at a time ({options['latency']}s latency each)...")
+                baseline = self.run(sample, concurrency=1, dry_run=True, **client_options)
+                per_verification = baseline['verify_seconds'] / max(baseline['checked'], 1)
+
+                self.stdout.write(f"Reconciling {options['transactions']} transactions with {options['concurrency']} in flight...")
+                stats = self.run(None, concurrency=options['concurrency'], **client_options)
+                self.stdout.write(
+                    f"  succeeded {stats['succeeded']}, failed {stats['failed']}, expired {stats['expired']}, "
+                    f"pending {stats['pending']}, errors {stats['errors']}"
+                )
+                sequential = per_verification * stats['checked']
+                self.stdout.write(self.style.SUCCESS(
+                    f"Concurrent: {stats['elapsed']:.2f}s total, {stats['verify_seconds']:.2f}s verifying "
+                    f"({stats['checked'] / stats['verify_seconds']:.0f}/s)\n"
+                    f"Sequential estimate: {sequential:.1f}s ({sequential / stats['elapsed']:.0f}x slower)"
+                ))
+                if not options['keep']:
+                    transaction.set_rollback(True)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def run(self, limit, **options):
+        # Verify only the first `limit` stale transactions by hiding the rest behind a recent created_at
+        if limit is None:
+            return reconcile_pending(**options)
+        with transaction.atomic():
+            later = PaystackTransaction.objects.filter(status='pending').order_by('created_at').values_list('pk', flat=True)[limit:]
+            PaystackTransaction.objects.filter(pk__in=list(later)).update(created_at=timezone.now())
+            stats = reconcile_pending(**options)
+            transaction.set_rollback(True)
+        return stats
+
+    def seed(self, server, count):
+        room_type = RoomType.objects.create(name='single', base_price=100, max_occupancy=1, description='Reconciliation benchmark')
+        room = Room.objects.create(room_number='BENCH-PAY', floor=0, room_type=room_type, price_per_night=100)
+        guest = Guest.objects.create(first_name='Benchmark', last_name='Guest', email='benchmark@example.com', phone='0')
+        today = timezone.localdate()
+        reservation = Reservation.objects.create(
+            guest=guest, room=room, check_in_date=today, check_out_date=today + timedelta(days=1),
+            number_of_guests=1, total_price=Decimal('100') * count,
+        )
+        folio = Folio.objects.create(
+            reservation=reservation, guest=guest, room_charges=100,
+            total_amount=reservation.total_price, balance=reservation.total_price,
+        )
+        payments = Payment.objects.bulk_create([
+            Payment(folio=folio, amount=Decimal('100'), payment_method='paystack', transaction_ref=f'BENCH-{i:06d}')
+            for i in range(count)
+        ])
+        PaystackTransaction.objects.bulk_create([
+            PaystackTransaction(
+                payment=payment, authorization_url=f'{server.base_url}/checkout/{payment.transaction_ref}',
+                access_code=payment.transaction_ref, paystack_reference=payment.transaction_ref, amount=payment.amount,
+            )
+            for payment in payments
+        ])
+        # Started two days ago; the guests paid, declined or closed the browser in roughly 80/10/10 proportions
+        PaystackTransaction.objects.filter(payment__folio=folio).update(created_at=timezone.now() - timedelta(days=2))
+        for i, payment in enumerate(payments):
+            server.transactions[payment.transaction_ref] = {
+                'id': i + 1,
+                'reference': payment.transaction_ref,
+                'amount': 10000,
+                'currency': 'NGN',
+                'status': random.choices(['success', 'failed', 'abandoned'], weights=[8, 1, 1])[0],
+                'paid_at': timezone.now().isoformat(),
+                'callback_url': None,
+                'customer': {'email': guest.email},
+            }
@@ -0,0 +1,46 @@
+import time
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from billing.night_audit import current_business_date, run_night_audit
+from core.utils import hotel_today
+
+
+class Command(BaseCommand):
+    help = 'Close the business day: post room charges and taxes to in-house folios, flag no-shows and snapshot daily metrics'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            type=str,
+            help='Business date to close (YYYY-MM-DD format, defaults to the day after the last audit; may not be before it)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            audit_date = (
+                datetime.strptime(options['date'], '%Y-%m-%d').date()
+                if options['date'] else current_business_date()
+            )
+        except ValueError:
+            raise CommandError('Dates must be in YYYY-MM-DD format.')
+        if audit_date > hotel_today():
+            raise CommandError(f'{audit_date} has not started yet; the business date is already up to date.')
+
+        self.stdout.write(f'Running night audit for {audit_date}...')
+        started = time.perf_counter()
+        try:
+            audit = run_night_audit(audit_date)
+        except ValueError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Closed {audit_date} in {elapsed:.2f}s\n'
+                f'Folios charged: {audit.rooms_charged}\n'
+                f'Room charges: ₦{audit.room_revenue}\n'
+                f'Taxes: ₦{audit.taxes}\n'
+                f'No-shows: {audit.no_shows}\n'
+                f'Business date is now {current_business_date()}'
+            )
+        )
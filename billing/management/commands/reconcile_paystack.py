@@ -0,0 +1,42 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from billing.reconcile import reconcile_pending, stale_transactions
+
+
+class Command(BaseCommand):
+    help = 'Verify stale pending Paystack transactions against Paystack and settle their payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=30, help='Minutes a transaction must have been pending')
+        parser.add_argument('--expire-hours', type=int, default=24, help='Fail transactions Paystack still reports as abandoned after this many hours')
+        parser.add_argument('--concurrency', type=int, default=20, help='Verifications in flight at once')
+        parser.add_argument('--batch-size', type=int, default=100, help='Results applied per database transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Verify and report without changing anything')
+
+    def handle(self, *args, **options):
+        older_than = timedelta(minutes=options['older_than'])
+        self.stdout.write(
+            f"Reconciling {stale_transactions(older_than).count()} pending Paystack transaction(s) "
+            f"with {options['concurrency']} concurrent verifications..."
+        )
+        stats = reconcile_pending(
+            older_than=older_than,
+            expire_after=timedelta(hours=options['expire_hours']),
+            concurrency=options['concurrency'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+        )
+        rate = stats['checked'] / stats['verify_seconds'] if stats['verify_seconds'] else 0
+        self.stdout.write(
+            f"Succeeded: {stats['succeeded']}\n"
+            f"Failed: {stats['failed']}\n"
+            f"Expired: {stats['expired']}\n"
+            f"Still pending: {stats['pending']}\n"
+            f"Errors: {stats['errors']}"
+        )
+        if stats['errors']:
+            self.stdout.write(self.style.WARNING(f"{stats['errors']} verification(s) failed; they will be retried on the next run"))
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Checked' if options['dry_run'] else 'Reconciled'} {stats['checked']} transaction(s) in {stats['elapsed']:.2f}s "
+            f"({rate:.0f} verifications/s)"
+        ))
@@ -0,0 +1,194 @@
+import hashlib
+import hmac
+import json
+import random
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Serve a Paystack API stand-in (initialize, verify, hosted checkout and signed webhooks) for local testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8766)
+        parser.add_argument('--secret-key', help='Secret key clients must send and webhooks are signed with (defaults to PAYSTACK_SECRET_KEY)')
+        parser.add_argument('--webhook-url', help='Where to POST charge.success events, e.g. http://127.0.0.1:8000/billing/paystack/webhook/')
+        parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every API response')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of API requests answered with a 503')
+
+    def handle(self, *args, **options):
+        server = StandInServer(
+            (options['host'], options['port']),
+            secret_key=options['secret_key'] or settings.PAYSTACK_SECRET_KEY or 'sk_test_standin',
+            webhook_url=options['webhook_url'],
+            latency=options['latency'],
+            failure_rate=options['failure_rate'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Paystack stand-in listening on {server.base_url} (set PAYSTACK_BASE_URL to use it)"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        self.stdout.write('Paystack stand-in stopped')
+
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    Keeps initialized transactions in memory. Opening a transaction's
+    authorization_url (append ?outcome=failed to decline it) settles it,
+    sends the signed webhook and redirects to its callback_url, like the
+    hosted checkout does.
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, secret_key, webhook_url=None, latency=0.0, failure_rate=0.0):
+        super().__init__(address, StandInHandler)
+        self.secret_key = secret_key
+        self.webhook_url = webhook_url
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.lock = threading.Lock()
+        self.transactions = {}
+        self.webhooks_sent = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def settle(self, reference, status):
+        with self.lock:
+            txn = self.transactions[reference]
+            if txn['status'] == 'abandoned':
+                txn['status'] = status
+                txn['paid_at'] = timezone.now().isoformat() if status == 'success' else None
+            return dict(txn)
+
+    def send_webhook(self, txn):
+        if not self.webhook_url or txn['status'] != 'success':
+            return
+        body = json.dumps({'event': 'charge.success', 'data': txn}).encode()
+        signature = hmac.new(self.secret_key.encode(), body, hashlib.sha512).hexdigest()
+        request = Request(self.webhook_url, data=body, method='POST', headers={
+            'Content-Type': 'application/json',
+            'X-Paystack-Signature': signature,
+        })
+        try:
+            with urlopen(request, timeout=10):
+                pass
+            with self.lock:
+                self.webhooks_sent += 1
+        except OSError as e:
+            print(f"Paystack stand-in webhook error: {str(e)}")
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if not self.api_call():
+            return
+        if urlparse(self.path).path.rstrip('/') != '/transaction/initialize':
+            self.send_json(404, {'status': False, 'message': 'Not found'})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            amount = int(payload['amount'])
+        except (ValueError, KeyError, TypeError):
+            self.send_json(400, {'status': False, 'message': 'email and amount are required'})
+            return
+
+        reference = payload.get('reference') or secrets.token_hex(8)
+        access_code = secrets.token_hex(8)
+        with self.server.lock:
+            if reference in self.server.transactions:
+                self.send_json(400, {'status': False, 'message': 'Duplicate Transaction Reference'})
+                return
+            self.server.transactions[reference] = {
+                'id': len(self.server.transactions) + 1,
+                'reference': reference,
+                'access_code': access_code,
+                'amount': amount,
+                'currency': 'NGN',
+                'status': 'abandoned',
+                'paid_at': None,
+                'created_at': timezone.now().isoformat(),
+                'callback_url': payload.get('callback_url'),
+                'customer': {'email': payload.get('email')},
+            }
+        self.send_json(200, {
+            'status': True,
+            'message': 'Authorization URL created',
+            'data': {
+                'authorization_url': f'{self.server.base_url}/checkout/{reference}',
+                'access_code': access_code,
+                'reference': reference,
+            },
+        })
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = url.path.strip('/').split('/')
+        if len(parts) == 2 and parts[0] == 'checkout':
+            self.checkout(parts[1], parse_qs(url.query).get('outcome', ['success'])[0])
+            return
+        if not self.api_call():
+            return
+        if len(parts) == 3 and parts[:2] == ['transaction', 'verify']:
+            with self.server.lock:
+                txn = self.server.transactions.get(parts[2])
+                txn = dict(txn) if txn else None
+            if txn is None:
+                self.send_json(400, {'status': False, 'message': 'Transaction reference not found'})
+            else:
+                self.send_json(200, {'status': True, 'message': 'Verification successful', 'data': txn})
+            return
+        self.send_json(404, {'status': False, 'message': 'Not found'})
+
+    def checkout(self, reference, outcome):
+        if reference not in self.server.transactions:
+            self.send_json(404, {'status': False, 'message': 'Transaction reference not found'})
+            return
+        txn = self.server.settle(reference, 'success' if outcome == 'success' else 'failed')
+        self.server.send_webhook(txn)
+        if txn['callback_url']:
+            self.send_response(302)
+            self.send_header('Location', f"{txn['callback_url']}?{urlencode({'trxref': reference, 'reference': reference})}")
+            self.end_headers()
+        else:
+            self.send_json(200, {'status': True, 'message': f"Transaction {txn['status']}", 'data': txn})
+
+    def api_call(self):
+        """Apply latency, failures and the secret-key check; False when the request was already answered."""
+        time.sleep(self.server.latency)
+        if random.random() < self.server.failure_rate:
+            self.send_json(503, {'status': False, 'message': 'Stand-in failure'})
+            return False
+        if self.headers.get('Authorization') != f'Bearer {self.server.secret_key}':
+            self.send_json(401, {'status': False, 'message': 'Invalid key'})
+            return False
+        return True
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from billing.ledger import verify_folio_totals
+from billing.models import Folio
+
+
+class Command(BaseCommand):
+    help = 'Recompute folio totals from the ledger and report (or fix) any that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--folio', type=str, help='Only check this folio (UUID)')
+        parser.add_argument('--fix', action='store_true', help='Rewrite drifted totals from the ledger')
+
+    def handle(self, *args, **options):
+        folios = Folio.objects.all()
+        if options['folio']:
+            folios = folios.filter(pk=options['folio'])
+
+        self.stdout.write(f'Verifying {folios.count()} folio(s) against the ledger...')
+        drift = verify_folio_totals(folios, fix=options['fix'])
+        for folio_id, fields in drift.items():
+            details = ', '.join(f'{field} stored {stored}, ledger {ledger}' for field, (stored, ledger) in fields.items())
+            self.stdout.write(self.style.WARNING(f'{folio_id}: {details}'))
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('No drift: every folio matches its ledger'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Rewrote the totals of {len(drift)} folio(s) from the ledger'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{len(drift)} folio(s) drifted; run with --fix to rewrite them'))
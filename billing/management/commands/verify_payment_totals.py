@@ -0,0 +1,35 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from billing.ledger import verify_payment_totals
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-day payment rollup from the payments table and report (or fix) any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=str, help='First business date to check (YYYY-MM-DD format)')
+        parser.add_argument('--end', type=str, help='Last business date to check (YYYY-MM-DD format)')
+        parser.add_argument('--fix', action='store_true', help='Rewrite drifted days from the payments table')
+
+    def handle(self, *args, **options):
+        try:
+            start_date, end_date = [
+                datetime.strptime(options[name], '%Y-%m-%d').date() if options[name] else None
+                for name in ['start', 'end']
+            ]
+        except ValueError:
+            raise CommandError('Dates must be in YYYY-MM-DD format.')
+
+        self.stdout.write('Verifying payment daily totals against the payments table...')
+        drift = verify_payment_totals(start_date, end_date, fix=options['fix'])
+        for (day, method), ((stored_count, stored_amount), (count, amount)) in sorted(drift.items()):
+            self.stdout.write(self.style.WARNING(
+                f'{day} {method}: stored {stored_count} payments ₦{stored_amount}, recomputed {count} payments ₦{amount}'
+            ))
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('No drift: the rollup matches the payments table'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Rewrote {len(drift)} rollup row(s)'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{len(drift)} rollup row(s) drifted; run with --fix to rewrite them'))
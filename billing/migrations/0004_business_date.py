@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:47
+
+import core.utils
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('billing', '0003_foliolineitem_status'),
+        ('guests', '0002_guest_business_date'),
+        ('reservations', '0006_groupbooking'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='folio',
+            name='business_date',
+            field=models.DateField(default=core.utils.hotel_today),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='business_date',
+            field=models.DateField(default=core.utils.hotel_today),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='payment_method',
+            field=models.CharField(choices=[('cash', 'Cash'), ('card', 'Card'), ('bank_transfer', 'Bank Transfer'), ('paystack', 'Paystack'), ('cheque', 'Cheque')], max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='folio',
+            index=models.Index(fields=['business_date', 'status'], name='billing_fol_busines_062caf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['business_date', 'status'], name='billing_pay_busines_d728a3_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db import migrations
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def hotel_timezone(apps):
+    Hotel = apps.get_model('core', 'Hotel')
+    name = Hotel.objects.values_list('timezone', flat=True).first()
+    try:
+        return ZoneInfo(name) if name else timezone.get_default_timezone()
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.get_default_timezone()
+
+
+def populate_business_dates(apps, schema_editor):
+    tz = hotel_timezone(apps)
+    for model_name in ['Folio', 'Payment']:
+        model = apps.get_model('billing', model_name)
+        model.objects.update(business_date=TruncDate('created_at', tzinfo=tz))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('billing', '0004_business_date'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_business_dates, migrations.RunPython.noop),
+    ]
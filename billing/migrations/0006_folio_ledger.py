@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:04
+
+import core.utils
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0005_populate_business_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FolioEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('charge', 'Charge'), ('payment', 'Payment'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('business_date', models.DateField(default=core.utils.hotel_today)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('folio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='billing.folio')),
+                ('line_item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='entries', to='billing.foliolineitem')),
+                ('payment', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entry', to='billing.payment')),
+            ],
+            options={
+                'verbose_name_plural': 'folio entries',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['folio', 'kind'], name='billing_fol_folio_i_d81b1f_idx')],
+            },
+        ),
+    ]
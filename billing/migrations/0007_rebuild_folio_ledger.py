@@ -0,0 +1,65 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Q, Sum
+
+
+def rebuild_folio_ledger(apps, schema_editor):
+    """
+    Open a ledger for every existing folio from the records behind it (the
+    stay, line items, service charges, taxes, discount and completed
+    payments) and reset the stored totals to match, since the old
+    incremental updates let them drift.
+    """
+    Folio = apps.get_model('billing', 'Folio')
+    FolioEntry = apps.get_model('billing', 'FolioEntry')
+    FolioLineItem = apps.get_model('billing', 'FolioLineItem')
+    Payment = apps.get_model('billing', 'Payment')
+
+    for folio in Folio.objects.select_related('reservation').iterator(chunk_size=500):
+        day = folio.business_date
+        entries = [FolioEntry(folio=folio, kind='charge', amount=folio.reservation.total_price, description='Room charges', business_date=day)]
+        for item in FolioLineItem.objects.filter(folio=folio).order_by('created_at'):
+            entries.append(FolioEntry(folio=folio, kind='charge', amount=item.total, description=item.description, line_item=item, business_date=day))
+        if folio.service_charges:
+            entries.append(FolioEntry(folio=folio, kind='charge', amount=folio.service_charges, description='Service charges', business_date=day))
+        if folio.taxes:
+            entries.append(FolioEntry(folio=folio, kind='charge', amount=folio.taxes, description='Taxes', business_date=day))
+        if folio.discount:
+            entries.append(FolioEntry(folio=folio, kind='adjustment', amount=-folio.discount, description='Discount', business_date=day))
+        for payment in Payment.objects.filter(folio=folio, status='completed').order_by('created_at'):
+            entries.append(FolioEntry(
+                folio=folio, kind='payment', amount=-payment.amount,
+                description=f'{payment.payment_method} payment {payment.transaction_ref}',
+                payment=payment, business_date=payment.business_date,
+            ))
+        FolioEntry.objects.bulk_create(entries)
+
+        totals = FolioEntry.objects.filter(folio=folio).aggregate(
+            charged=Sum('amount', filter=~Q(kind='payment')),
+            paid=Sum('amount', filter=Q(kind='payment')),
+        )
+        charged = totals['charged'] or Decimal('0')
+        paid = -(totals['paid'] or Decimal('0'))
+        balance = charged - paid
+        Folio.objects.filter(pk=folio.pk).update(
+            total_amount=charged,
+            amount_paid=paid,
+            balance=balance,
+            status='settled' if balance <= 0 else 'partial' if paid > 0 else 'open',
+        )
+
+
+def clear_folio_ledger(apps, schema_editor):
+    apps.get_model('billing', 'FolioEntry').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0006_folio_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_folio_ledger, clear_folio_ledger),
+    ]
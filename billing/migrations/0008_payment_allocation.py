@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_paid_items(apps, schema_editor):
+    # Items the old loop marked paid were always paid in full
+    FolioLineItem = apps.get_model('billing', 'FolioLineItem')
+    FolioLineItem.objects.filter(status='paid').update(amount_paid=F('total'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0007_rebuild_folio_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentAllocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('reversed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='foliolineitem',
+            name='amount_paid',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AlterField(
+            model_name='foliolineitem',
+            name='status',
+            field=models.CharField(choices=[('unpaid', 'Unpaid'), ('partial', 'Partially Paid'), ('paid', 'Paid')], default='unpaid', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='foliolineitem',
+            index=models.Index(fields=['folio', 'status', 'created_at'], name='billing_fol_folio_i_a34046_idx'),
+        ),
+        migrations.AddField(
+            model_name='paymentallocation',
+            name='line_item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='billing.foliolineitem'),
+        ),
+        migrations.AddField(
+            model_name='paymentallocation',
+            name='payment',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='billing.payment'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentallocation',
+            index=models.Index(fields=['payment', 'reversed_at'], name='billing_pay_payment_57b569_idx'),
+        ),
+        migrations.RunPython(mark_paid_items, migrations.RunPython.noop),
+    ]
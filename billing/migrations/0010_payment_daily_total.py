@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:18
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_payment_daily_totals(apps, schema_editor):
+    Payment = apps.get_model('billing', 'Payment')
+    PaymentDailyTotal = apps.get_model('billing', 'PaymentDailyTotal')
+    rows = (
+        Payment.objects.filter(status='completed').order_by()
+        .values('business_date', 'payment_method')
+        .annotate(count=Count('id'), amount=Sum('amount'))
+    )
+    PaymentDailyTotal.objects.bulk_create(
+        [PaymentDailyTotal(**row) for row in rows.iterator(chunk_size=2000)],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0009_night_audit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentDailyTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('business_date', models.DateField()),
+                ('payment_method', models.CharField(choices=[('cash', 'Cash'), ('card', 'Card'), ('bank_transfer', 'Bank Transfer'), ('paystack', 'Paystack'), ('cheque', 'Cheque')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'ordering': ['-business_date', 'payment_method'],
+                'constraints': [models.UniqueConstraint(fields=('business_date', 'payment_method'), name='unique_payment_daily_total')],
+            },
+        ),
+        migrations.RunPython(populate_payment_daily_totals, migrations.RunPython.noop),
+    ]
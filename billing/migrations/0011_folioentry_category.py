@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:36
+
+from django.db import migrations, models
+
+
+def categorise_entries(apps, schema_editor):
+    # Entries posted before the field existed can only be told apart by the
+    # descriptions the night audit and folio opening gave them
+    FolioEntry = apps.get_model('billing', 'FolioEntry')
+    audit_charges = FolioEntry.objects.filter(kind='charge', line_item__night_audit__isnull=False)
+    audit_charges.filter(description__startswith='Room tax').update(category='tax')
+    audit_charges.filter(description__startswith='Room charge').update(category='room')
+    FolioEntry.objects.filter(kind='charge', line_item__isnull=True, description='Room charges').update(category='room')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0010_payment_daily_total'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='folioentry',
+            name='category',
+            field=models.CharField(blank=True, choices=[('', 'Other'), ('room', 'Room'), ('tax', 'Tax')], default='', max_length=20),
+        ),
+        migrations.RunPython(categorise_entries, migrations.RunPython.noop),
+    ]
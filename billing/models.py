@@ -1,7 +1,7 @@
 from django.db import models
 from django.core.validators import MinValueValidator
 import uuid
-from billing.utils import update_folio_totals
+from core.utils import hotel_today
 class Folio(models.Model):
     STATUS_CHOICES = [
         ('open', 'Open'),
@@ -22,11 +22,14 @@ class Folio(models.Model):
     balance = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    def update_totals(self):
-        update_folio_totals(self)
+    # Hotel-local date of created_at, stored so date filters can use an index
+    business_date = models.DateField(default=hotel_today)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['business_date', 'status']),
+        ]
     
     def __str__(self):
         return f"Folio for {self.guest.first_name} - {self.status}"
@@ -34,6 +37,7 @@ class Folio(models.Model):
 class FolioLineItem(models.Model):
     STATUS_CHOICES = [
         ('unpaid', 'Unpaid'),
+        ('partial', 'Partially Paid'),
         ('paid', 'Paid'),
     ]
     folio = models.ForeignKey(Folio, on_delete=models.CASCADE, related_name='line_items')
@@ -41,8 +45,17 @@ class FolioLineItem(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.IntegerField(default=1)
     total = models.DecimalField(max_digits=10, decimal_places=2)
-    status = models.CharField(max_length=20,choices=[('unpaid', 'Unpaid'), ('paid', 'Paid')], default='unpaid')
+    # Share of `total` covered by payment allocations (see billing.allocation)
+    amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='unpaid')
+    # Set on the room and tax charges posted by a night audit
+    night_audit = models.ForeignKey('NightAudit', on_delete=models.PROTECT, null=True, blank=True, related_name='line_items')
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['folio', 'status', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.description} - {self.total}"
@@ -71,13 +84,119 @@ class Payment(models.Model):
     notes = models.TextField(blank=True)
     recorded_by = models.ForeignKey('core.CustomUser', on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    business_date = models.DateField(default=hotel_today)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['business_date', 'status']),
+        ]
     
     def __str__(self):
         return f"₦{self.amount} - {self.get_payment_method_display()}"
 
+class FolioEntry(models.Model):
+    """
+    Append-only ledger of everything that moves a folio's totals. Amounts
+    are signed: charges and adjustments raise the balance, payments lower
+    it. Folio.total_amount, amount_paid and balance are running sums of
+    these rows (see billing.ledger).
+    """
+    KIND_CHOICES = [
+        ('charge', 'Charge'),
+        ('payment', 'Payment'),
+        ('adjustment', 'Adjustment'),
+    ]
+    # What a charge is for; the night audit sums its taxes by this, never by description
+    CATEGORY_CHOICES = [
+        ('', 'Other'),
+        ('room', 'Room'),
+        ('tax', 'Tax'),
+    ]
+
+    folio = models.ForeignKey(Folio, on_delete=models.CASCADE, related_name='entries')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, blank=True, default='')
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    description = models.CharField(max_length=255, blank=True)
+    line_item = models.ForeignKey(FolioLineItem, on_delete=models.SET_NULL, null=True, blank=True, related_name='entries')
+    # One entry per payment, so posting the same payment twice is a no-op
+    payment = models.OneToOneField(Payment, on_delete=models.SET_NULL, null=True, blank=True, related_name='ledger_entry')
+    created_by = models.ForeignKey('core.CustomUser', on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    business_date = models.DateField(default=hotel_today)
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name_plural = 'folio entries'
+        indexes = [
+            models.Index(fields=['folio', 'kind']),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Folio ledger entries cannot be changed; post an adjustment instead.')
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} ₦{self.amount} - {self.description}"
+
+class PaymentAllocation(models.Model):
+    """How much of a payment went to each line item; reversed as a unit when the payment is refunded."""
+    payment = models.ForeignKey(Payment, on_delete=models.CASCADE, related_name='allocations')
+    line_item = models.ForeignKey(FolioLineItem, on_delete=models.CASCADE, related_name='allocations')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+    reversed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['payment', 'reversed_at']),
+        ]
+
+    def __str__(self):
+        return f"₦{self.amount} of {self.payment.transaction_ref} to {self.line_item.description}"
+
+class PaymentDailyTotal(models.Model):
+    """
+    Completed payments rolled up per business day and method, so
+    breakdowns read a few rows per day instead of every payment. Bumped
+    when a payment is credited to its folio (billing.ledger.post_payment).
+    """
+    business_date = models.DateField()
+    payment_method = models.CharField(max_length=20, choices=Payment.PAYMENT_METHOD_CHOICES)
+    count = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-business_date', 'payment_method']
+        constraints = [
+            models.UniqueConstraint(fields=['business_date', 'payment_method'], name='unique_payment_daily_total'),
+        ]
+
+    def __str__(self):
+        return f"{self.business_date} {self.get_payment_method_display()}: {self.count} payments, ₦{self.amount}"
+
+class NightAudit(models.Model):
+    """
+    One row per closed business day. The next day to audit is the one
+    after the latest completed audit (see billing.night_audit).
+    """
+    business_date = models.DateField(unique=True)
+    rooms_charged = models.IntegerField(default=0)
+    room_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    taxes = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    no_shows = models.IntegerField(default=0)
+    run_by = models.ForeignKey('core.CustomUser', on_delete=models.SET_NULL, null=True, blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-business_date']
+
+    def __str__(self):
+        return f"Night audit {self.business_date}"
+
 class PaystackTransaction(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
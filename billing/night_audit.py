@@ -0,0 +1,135 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from analytics.cache import invalidate_snapshots
+from analytics.utils import update_daily_metrics
+from core.utils import hotel_today
+from reservations.models import Reservation, RoomNight
+from reservations.utils import sync_availability_engine
+from rooms.models import Room
+from .ledger import folio_amounts, post_charges
+from .models import Folio, FolioLineItem, NightAudit
+
+CENT = Decimal('0.01')
+
+
+def last_closed_date():
+    """Business date of the latest completed night audit, or None before the first."""
+    return NightAudit.objects.filter(completed_at__isnull=False).values_list('business_date', flat=True).first()
+
+def current_business_date():
+    """The day the next night audit closes: the one after the last audit, or today before the first."""
+    last = last_closed_date()
+    return last + timedelta(days=1) if last else hotel_today()
+
+def room_tax_rate():
+    return Decimal(str(settings.ROOM_TAX_RATE))
+
+def nightly_charges(stays, audit_date, tax_rate):
+    """
+    (room charges, taxes): line items for one night of every in-house
+    stay. Nights inside the booked stay were billed when the folio was
+    opened, so they only take tax; nights past the booked check-out
+    (overstays) take the room rate as well.
+    """
+    charges, taxes = [], []
+    for folio_id, rate, check_in, check_out in stays:
+        if not rate:
+            continue
+        if not check_in <= audit_date < check_out:
+            charges.append(FolioLineItem(
+                folio_id=folio_id,
+                description=f'Room charge - {audit_date:%b %d, %Y}',
+                amount=rate,
+                quantity=1,
+                total=rate,
+            ))
+        tax = (rate * tax_rate).quantize(CENT)
+        if tax:
+            taxes.append(FolioLineItem(
+                folio_id=folio_id,
+                description=f'Room tax ({tax_rate * 100:g}%) - {audit_date:%b %d, %Y}',
+                amount=tax,
+                quantity=1,
+                total=tax,
+            ))
+    return charges, taxes
+
+def expire_snapshots(*labels):
+    # Bulk UPDATEs send no post_save, so retire the analytics snapshots they
+    # touch by hand, once the audit has committed
+    def expire():
+        for label in labels:
+            invalidate_snapshots(label)
+    transaction.on_commit(expire)
+
+def mark_no_shows(audit_date):
+    """
+    Confirmed reservations due to arrive by `audit_date` that never
+    checked in become no-shows and give back their room nights.
+    Returns how many were marked.
+    """
+    no_shows = list(
+        Reservation.objects.filter(status='confirmed', check_in_date__lte=audit_date)
+        .values_list('id', 'room_id', 'check_in_date', 'check_out_date')
+    )
+    if not no_shows:
+        return 0
+    ids = [reservation_id for reservation_id, *_ in no_shows]
+    Reservation.objects.filter(pk__in=ids).update(status='no_show', updated_at=timezone.now())
+    RoomNight.objects.filter(reservation_id__in=ids).delete()
+    Room.objects.filter(pk__in={room_id for _, room_id, *_ in no_shows}, status='reserved').update(status='available')
+    for _, room_id, check_in, check_out in no_shows:
+        sync_availability_engine('release', room_id, check_in, check_out)
+    expire_snapshots('reservations.Reservation', 'rooms.Room')
+    return len(no_shows)
+
+def run_night_audit(audit_date=None, user=None):
+    """
+    Close a business day: post the night's room charges and taxes to every
+    in-house folio, flag no-shows and snapshot the day's DailyMetrics, all
+    in one transaction. The number of queries does not grow with the
+    number of rooms. Raises ValueError if the day was already audited or
+    comes before the last closed business day.
+    """
+    audit_date = audit_date or current_business_date()
+    with transaction.atomic():
+        if NightAudit.objects.filter(business_date=audit_date).exists():
+            raise ValueError(f'{audit_date} has already been audited.')
+        last = last_closed_date()
+        if last and audit_date < last:
+            raise ValueError(f'{audit_date} is before the last closed business day ({last}).')
+        audit = NightAudit.objects.create(business_date=audit_date, run_by=user)
+
+        stays = (
+            Reservation.objects.filter(status='checked_in', folio__isnull=False)
+            .filter(Q(checked_in_on__lte=audit_date) | Q(checked_in_on__isnull=True, check_in_date__lte=audit_date))
+            .values_list('folio__id', 'folio__room_charges', 'check_in_date', 'check_out_date')
+        )
+        charges, tax_items = nightly_charges(stays, audit_date, room_tax_rate())
+        for item in charges + tax_items:
+            item.night_audit = audit
+        items = FolioLineItem.objects.bulk_create(charges + tax_items)
+        post_charges(items[:len(charges)], user=user, category='room')
+        tax_entries = post_charges(items[len(charges):], user=user, category='tax')
+
+        taxes = {}
+        for entry in tax_entries:
+            taxes[entry.folio_id] = taxes.get(entry.folio_id, Decimal('0')) + entry.amount
+        if taxes:
+            Folio.objects.filter(pk__in=taxes).update(taxes=F('taxes') + folio_amounts(taxes))
+        if items:
+            expire_snapshots('billing.Folio')
+
+        audit.rooms_charged = len({item.folio_id for item in items})
+        audit.taxes = sum(taxes.values(), Decimal('0'))
+        audit.room_revenue = sum((item.total for item in items), Decimal('0')) - audit.taxes
+        audit.no_shows = mark_no_shows(audit_date)
+        update_daily_metrics(audit_date)
+        audit.completed_at = timezone.now()
+        audit.save()
+    return audit
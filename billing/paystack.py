@@ -0,0 +1,229 @@
+import asyncio
+import hashlib
+import hmac
+import threading
+import time
+from datetime import datetime
+
+import httpx
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from analytics.utils import apply_metrics_delta
+from .allocation import allocate_payment
+from .ledger import post_payment
+from .models import PaystackTransaction
+
+# Worth another attempt: rate limiting and upstream errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Safe to repeat whatever happened to the first attempt
+IDEMPOTENT_METHODS = {'GET', 'HEAD'}
+# Raised before the request reached Paystack, so even a POST can be sent again
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# Paystack transaction statuses that settle a payment one way or the other
+FINAL_STATUSES = {'success', 'failed', 'reversed'}
+
+
+class PaystackError(Exception):
+    """A failed Paystack call; `status_code` is None when Paystack was never reached."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class BasePaystackClient:
+    """
+    Settings, headers and retry policy shared by the sync and async
+    clients. GETs that fail to connect, time out or get a retryable status
+    are tried again `retries` times, waiting backoff * 2**attempt seconds
+    between tries. A POST is only retried when it never left (connection
+    refused or no pooled connection in time): Paystack may already have
+    accepted one that timed out or errored, and initializing the same
+    reference twice is refused as a duplicate.
+    """
+
+    def __init__(self, secret_key=None, base_url=None, timeout=None, retries=None, backoff=None, max_connections=None):
+        self.secret_key = secret_key if secret_key is not None else settings.PAYSTACK_SECRET_KEY
+        self.base_url = (base_url or getattr(settings, 'PAYSTACK_BASE_URL', 'https://api.paystack.co')).rstrip('/')
+        self.timeout = timeout or getattr(settings, 'PAYSTACK_TIMEOUT', 10)
+        self.retries = retries if retries is not None else getattr(settings, 'PAYSTACK_RETRIES', 2)
+        self.backoff = backoff if backoff is not None else getattr(settings, 'PAYSTACK_RETRY_BACKOFF', 0.5)
+        self.max_connections = max_connections or getattr(settings, 'PAYSTACK_MAX_CONNECTIONS', 20)
+
+    def client_options(self):
+        return {
+            'base_url': self.base_url,
+            'headers': {'Authorization': f'Bearer {self.secret_key}'},
+            'timeout': self.timeout,
+            'limits': httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+        }
+
+    def delay(self, attempt):
+        return self.backoff * 2 ** attempt
+
+    def should_retry(self, method, attempt, response=None, error=None):
+        if attempt >= self.retries:
+            return False
+        if method.upper() not in IDEMPOTENT_METHODS:
+            return isinstance(error, UNSENT_ERRORS)
+        return error is not None or response.status_code in RETRY_STATUSES
+
+    def parse(self, response):
+        try:
+            data = response.json()
+        except ValueError:
+            raise PaystackError(f'{response.status_code} - invalid response from Paystack', response.status_code)
+        if response.status_code >= 400 or not data.get('status'):
+            raise PaystackError(f"{response.status_code} - {data.get('message', 'request failed')}", response.status_code)
+        return data['data']
+
+    @staticmethod
+    def initialize_payload(email, amount, reference, callback_url):
+        return {
+            'email': email,
+            'amount': int(amount * 100),
+            'reference': reference,
+            'callback_url': callback_url,
+        }
+
+
+class PaystackClient(BasePaystackClient):
+    """Blocking client over one pooled httpx.Client, shared by every thread in the process."""
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.client = httpx.Client(**self.client_options())
+
+    def request(self, method, path, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                response = self.client.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                if not self.should_retry(method, attempt, error=e):
+                    raise PaystackError(str(e))
+            else:
+                if not self.should_retry(method, attempt, response=response):
+                    return self.parse(response)
+            time.sleep(self.delay(attempt))
+            attempt += 1
+
+    def initialize_transaction(self, email, amount, reference, callback_url):
+        return self.request('POST', '/transaction/initialize', json=self.initialize_payload(email, amount, reference, callback_url))
+
+    def verify_transaction(self, reference):
+        return self.request('GET', f'/transaction/verify/{reference}')
+
+    def close(self):
+        self.client.close()
+
+
+class AsyncPaystackClient(BasePaystackClient):
+    """
+    Non-blocking client for running many Paystack calls at once. Use as
+    `async with AsyncPaystackClient() as paystack:`; the connection pool
+    lives for the block.
+    """
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.client = None
+
+    async def __aenter__(self):
+        self.client = httpx.AsyncClient(**self.client_options())
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.client.aclose()
+        self.client = None
+
+    async def request(self, method, path, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                response = await self.client.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                if not self.should_retry(method, attempt, error=e):
+                    raise PaystackError(str(e))
+            else:
+                if not self.should_retry(method, attempt, response=response):
+                    return self.parse(response)
+            await asyncio.sleep(self.delay(attempt))
+            attempt += 1
+
+    async def initialize_transaction(self, email, amount, reference, callback_url):
+        return await self.request('POST', '/transaction/initialize', json=self.initialize_payload(email, amount, reference, callback_url))
+
+    async def verify_transaction(self, reference):
+        return await self.request('GET', f'/transaction/verify/{reference}')
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_paystack_client():
+    """The process-wide PaystackClient, built on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = PaystackClient()
+        return _client
+
+def reset_paystack_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+
+
+def valid_signature(body, signature, secret_key=None):
+    """Whether `signature` is the HMAC-SHA512 of the raw webhook body under the secret key."""
+    secret_key = secret_key if secret_key is not None else settings.PAYSTACK_SECRET_KEY
+    if not signature or not secret_key:
+        return False
+    expected = hmac.new(secret_key.encode(), body, hashlib.sha512).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+def paid_at(data):
+    try:
+        return datetime.fromisoformat(data['paid_at'].replace('Z', '+00:00'))
+    except (KeyError, AttributeError, TypeError, ValueError):
+        return timezone.now()
+
+def confirm_transaction(reference, data):
+    """
+    Apply a Paystack transaction result (from verify or a charge.success
+    webhook) to its payment. Safe to call any number of times, from the
+    callback and the webhook at once: the transaction row is locked and
+    a payment already marked successful is never credited again.
+    Returns (PaystackTransaction, whether this call changed it).
+    """
+    with transaction.atomic():
+        txn = PaystackTransaction.objects.select_for_update().select_related('payment__folio').get(paystack_reference=reference)
+        if txn.status != 'pending':
+            return txn, False
+
+        payment = txn.payment
+        status = data.get('status')
+        if status not in FINAL_STATUSES:
+            # Abandoned or still in progress at Paystack: nothing to record yet
+            return txn, False
+        if status != 'success' or int(data.get('amount') or 0) != int(txn.amount * 100):
+            txn.status = 'failed'
+            txn.save()
+            payment.status = 'failed'
+            payment.save()
+            return txn, True
+
+        txn.status = 'success'
+        txn.paid_at = paid_at(data)
+        txn.save()
+        payment.status = 'completed'
+        payment.save()
+        post_payment(payment)
+        allocate_payment(payment)
+        # Revenue belongs to the day the payment was taken, as in the recompute and PaymentDailyTotal
+        apply_metrics_delta(target_date=payment.business_date, total_revenue=payment.amount)
+    return txn, True
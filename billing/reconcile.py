@@ -0,0 +1,90 @@
+import asyncio
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from .models import Payment, PaystackTransaction
+from .paystack import AsyncPaystackClient, PaystackError, confirm_transaction
+
+
+async def verify_references(references, concurrency=20, **client_options):
+    """
+    Verify many Paystack references at once over one connection pool,
+    with at most `concurrency` requests in flight. Returns
+    {reference: transaction data, or the PaystackError it raised}.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with AsyncPaystackClient(max_connections=concurrency, **client_options) as paystack:
+        async def verify(reference):
+            async with semaphore:
+                try:
+                    return reference, await paystack.verify_transaction(reference)
+                except PaystackError as e:
+                    return reference, e
+
+        return dict(await asyncio.gather(*(verify(reference) for reference in references)))
+
+def stale_transactions(older_than=timedelta(minutes=30)):
+    """Paystack transactions still pending `older_than` after they were started."""
+    return PaystackTransaction.objects.filter(status='pending', created_at__lt=timezone.now() - older_than)
+
+def reconcile_pending(older_than=timedelta(minutes=30), expire_after=timedelta(hours=24), concurrency=20, batch_size=100, dry_run=False, **client_options):
+    """
+    Verify every stale pending transaction against Paystack concurrently,
+    then apply the results `batch_size` at a time, one database
+    transaction per batch. A reference that errors (Paystack refuses it,
+    or applying its result raises) is logged and counted without holding
+    up the rest of its batch. Transactions Paystack still reports as
+    abandoned, or keeps answering with an error, after `expire_after` are
+    failed; references Paystack could not be reached for are left for the
+    next run. Returns counts and timings.
+    """
+    stale = list(stale_transactions(older_than).values_list('paystack_reference', 'created_at'))
+    stats = {'checked': len(stale), 'succeeded': 0, 'failed': 0, 'pending': 0, 'expired': 0, 'errors': 0}
+
+    started = time.perf_counter()
+    results = asyncio.run(verify_references([reference for reference, _ in stale], concurrency, **client_options)) if stale else {}
+    stats['verify_seconds'] = time.perf_counter() - started
+
+    expire_before = timezone.now() - expire_after
+    expired = []
+    for i in range(0, len(stale), batch_size):
+        with transaction.atomic():
+            for reference, created_at in stale[i:i + batch_size]:
+                data = results[reference]
+                if isinstance(data, PaystackError):
+                    print(f"Paystack reconcile error for {reference}: {str(data)}")
+                    stats['errors'] += 1
+                    if data.status_code is not None and created_at < expire_before:
+                        expired.append(reference)
+                    continue
+                if dry_run:
+                    txn_status = {'success': 'success', 'failed': 'failed', 'reversed': 'failed'}.get(data.get('status'), 'pending')
+                else:
+                    try:
+                        txn_status = confirm_transaction(reference, data)[0].status
+                    except Exception as e:
+                        # confirm_transaction's own atomic block rolled back; the batch carries on
+                        print(f"Paystack reconcile error for {reference}: {str(e)}")
+                        stats['errors'] += 1
+                        if created_at < expire_before:
+                            expired.append(reference)
+                        continue
+                if txn_status == 'pending' and created_at < expire_before:
+                    expired.append(reference)
+                elif txn_status == 'success':
+                    stats['succeeded'] += 1
+                else:
+                    stats[txn_status] += 1
+
+    stats['expired'] = len(expired)
+    if expired and not dry_run:
+        with transaction.atomic():
+            for i in range(0, len(expired), batch_size):
+                chunk = expired[i:i + batch_size]
+                Payment.objects.filter(paystack_transaction__paystack_reference__in=chunk, status='pending').update(status='failed')
+                PaystackTransaction.objects.filter(paystack_reference__in=chunk, status='pending').update(status='failed')
+    stats['elapsed'] = time.perf_counter() - started
+    return stats
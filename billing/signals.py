@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .models import Folio, FolioEntry
+
+
+@receiver(post_save, sender=Folio)
+def open_folio_ledger(sender, instance, created, raw=False, **kwargs):
+    # A new folio is created with its room charges already in the totals; record them as its first entry
+    if created and not raw and instance.total_amount:
+        FolioEntry.objects.create(
+            folio=instance,
+            kind='charge',
+            category='room',
+            amount=instance.total_amount,
+            description='Room charges',
+        )
@@ -1,3 +1,555 @@
-from django.test import TestCase
+import asyncio
+import csv
+import hashlib
+import hmac
+import json
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import httpx
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from analytics.cache import cached_snapshot
+from analytics.models import DailyMetrics
+from analytics.utils import reconcile_daily_metrics, update_daily_metrics
+from core.models import CustomUser
+from core.utils import hotel_today
+from guests.models import Guest
+from reservations.models import Reservation, RoomNight
+from rooms.models import Room, RoomType
+from .allocation import allocate_payment, reverse_allocation
+from .ledger import post_adjustment, post_charge, post_payment, verify_folio_totals, verify_payment_totals
+from .management.commands.run_paystack_standin import StandInServer
+from .models import Folio, FolioEntry, FolioLineItem, NightAudit, Payment, PaymentDailyTotal, PaystackTransaction
+from .night_audit import current_business_date, run_night_audit
+from .paystack import (
+    AsyncPaystackClient, PaystackClient, PaystackError, confirm_transaction, get_paystack_client, reset_paystack_client,
+)
+from .reconcile import reconcile_pending
+from .views import _billing_dashboard_snapshot
+
+
+def make_folio(total=Decimal('1000.00')):
+    room_type = RoomType.objects.create(name='single', base_price=total, max_occupancy=1)
+    room = Room.objects.create(room_number='101', floor=1, room_type=room_type, price_per_night=total)
+    guest = Guest.objects.create(first_name='Ada', last_name='Obi', email='ada@example.com', phone='1')
+    today = timezone.localdate()
+    reservation = Reservation.objects.create(
+        guest=guest, room=room, status='confirmed',
+        check_in_date=today, check_out_date=today + timedelta(days=1),
+        number_of_guests=1, total_price=total,
+    )
+    return Folio.objects.create(
+        reservation=reservation, guest=guest,
+        room_charges=total, total_amount=total, balance=total,
+    )
+
+def make_payment(folio, amount, ref):
+    return Payment.objects.create(
+        folio=folio, amount=amount, payment_method='cash',
+        status='completed', transaction_ref=ref,
+    )
+
+
+class FolioLedgerTests(TestCase):
+    def test_postings_keep_totals_in_step_with_ledger(self):
+        folio = make_folio()
+        self.assertEqual(folio.entries.get().amount, Decimal('1000.00'))
+
+        post_charge(folio, Decimal('250.00'), 'Room service')
+        post_adjustment(folio, Decimal('-50.00'), 'Goodwill credit')
+        self.assertEqual((folio.total_amount, folio.balance, folio.status), (Decimal('1200.00'), Decimal('1200.00'), 'open'))
+
+        post_payment(make_payment(folio, Decimal('700.00'), 'PMS-1'))
+        self.assertEqual((folio.amount_paid, folio.balance, folio.status), (Decimal('700.00'), Decimal('500.00'), 'partial'))
+
+        post_payment(make_payment(folio, Decimal('500.00'), 'PMS-2'))
+        self.assertEqual((folio.balance, folio.status), (Decimal('0.00'), 'settled'))
+        self.assertEqual(verify_folio_totals(), {})
+
+    def test_payment_is_posted_once(self):
+        folio = make_folio()
+        payment = make_payment(folio, Decimal('400.00'), 'PMS-1')
+        self.assertIsNotNone(post_payment(payment))
+        self.assertIsNone(post_payment(payment))
+        self.assertEqual(folio.amount_paid, Decimal('400.00'))
+        self.assertEqual(folio.entries.filter(kind='payment').count(), 1)
+
+    def test_entries_are_append_only(self):
+        entry = make_folio().entries.get()
+        entry.amount = 1
+        with self.assertRaises(ValueError):
+            entry.save()
+
+    def test_verifier_reports_and_fixes_drift(self):
+        folio = make_folio()
+        post_charge(folio, Decimal('100.00'), 'Laundry')
+        Folio.objects.filter(pk=folio.pk).update(balance=Decimal('5.00'))
+
+        drift = verify_folio_totals(fix=True)
+        self.assertEqual(drift, {folio.pk: {'balance': (Decimal('5.00'), Decimal('1100.00'))}})
+        folio.refresh_from_db()
+        self.assertEqual(folio.balance, Decimal('1100.00'))
+        self.assertEqual(verify_folio_totals(), {})
+
+
+    def test_record_payment_view_posts_to_ledger(self):
+        folio = make_folio()
+        user = CustomUser.objects.create_user(username='cashier', password='pw', role='accounting')
+        self.client.force_login(user)
+        response = self.client.post(reverse('record_payment', args=[folio.pk]), {'amount': '1000.00', 'payment_method': 'cash'})
+        self.assertRedirects(response, reverse('folio_detail', args=[folio.pk]), fetch_redirect_response=False)
+        folio.refresh_from_db()
+        self.assertEqual((folio.amount_paid, folio.balance, folio.status), (Decimal('1000.00'), Decimal('0.00'), 'settled'))
+        self.assertEqual(folio.entries.get(kind='payment').created_by, user)
+
+
+class PaymentAllocationTests(TestCase):
+    def add_items(self, folio, totals):
+        return [
+            FolioLineItem.objects.create(folio=folio, description=f'Charge {i}', amount=total, quantity=1, total=total)
+            for i, total in enumerate(totals)
+        ]
+
+    def test_fifo_allocation_with_partial_last_item(self):
+        folio = make_folio()
+        items = self.add_items(folio, [Decimal('100.00'), Decimal('200.00'), Decimal('300.00')])
+        allocations = allocate_payment(make_payment(folio, Decimal('250.00'), 'PMS-1'))
+        self.assertEqual([a.amount for a in allocations], [Decimal('100.00'), Decimal('150.00')])
+
+        statuses = {item.pk: (item.status, item.amount_paid) for item in FolioLineItem.objects.filter(folio=folio)}
+        self.assertEqual(statuses[items[0].pk], ('paid', Decimal('100.00')))
+        self.assertEqual(statuses[items[1].pk], ('partial', Decimal('150.00')))
+        self.assertEqual(statuses[items[2].pk], ('unpaid', Decimal('0.00')))
+
+        # The next payment picks up where the last one stopped
+        allocations = allocate_payment(make_payment(folio, Decimal('100.00'), 'PMS-2'))
+        self.assertEqual([(a.line_item_id, a.amount) for a in allocations], [(items[1].pk, Decimal('50.00')), (items[2].pk, Decimal('50.00'))])
+
+    def test_query_count_does_not_grow_with_line_items(self):
+        folio = make_folio()
+        self.add_items(folio, [Decimal('10.00')] * 300)
+        payment = make_payment(folio, Decimal('2995.00'), 'PMS-1')
+        with self.assertNumQueries(9):
+            allocations = allocate_payment(payment)
+        self.assertEqual(len(allocations), 300)
+        self.assertEqual(FolioLineItem.objects.filter(folio=folio, status='paid').count(), 299)
+        self.assertEqual(allocate_payment(payment), list(payment.allocations.all()))
+
+    def test_reversal_restores_line_items(self):
+        folio = make_folio()
+        self.add_items(folio, [Decimal('100.00'), Decimal('100.00')])
+        first = make_payment(folio, Decimal('50.00'), 'PMS-1')
+        second = make_payment(folio, Decimal('120.00'), 'PMS-2')
+        allocate_payment(first)
+        allocate_payment(second)
+
+        self.assertEqual(reverse_allocation(second), 2)
+        self.assertEqual(
+            list(FolioLineItem.objects.filter(folio=folio).order_by('created_at').values_list('status', 'amount_paid')),
+            [('partial', Decimal('50.00')), ('unpaid', Decimal('0.00'))],
+        )
+        self.assertEqual(reverse_allocation(second), 0)
+        self.assertFalse(second.allocations.filter(reversed_at__isnull=True).exists())
+
+
+class NightAuditTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.room_type = RoomType.objects.create(name='single', base_price=Decimal('100.00'), max_occupancy=1)
+        self.guest = Guest.objects.create(first_name='Ada', last_name='Obi', email='ada@example.com', phone='1')
+
+    def make_stay(self, number, check_in, check_out, status='checked_in'):
+        room = Room.objects.create(room_number=str(number), floor=1, room_type=self.room_type, price_per_night=Decimal('100.00'))
+        nights = (check_out - check_in).days
+        reservation = Reservation.objects.create(
+            guest=self.guest, room=room, status=status,
+            check_in_date=check_in, check_out_date=check_out,
+            number_of_guests=1, total_price=Decimal('100.00') * nights,
+        )
+        if status == 'checked_in':
+            Folio.objects.create(
+                reservation=reservation, guest=self.guest, room_charges=room.price_per_night,
+                total_amount=reservation.total_price, balance=reservation.total_price,
+            )
+        return reservation
+
+    def test_audit_posts_taxes_overstays_and_no_shows(self):
+        yesterday = self.today - timedelta(days=1)
+        booked = self.make_stay(101, yesterday, self.today + timedelta(days=2))
+        overstay = self.make_stay(102, yesterday - timedelta(days=1), self.today)
+        no_show = self.make_stay(103, self.today, self.today + timedelta(days=1), status='confirmed')
+        RoomNight.objects.create(room=no_show.room, reservation=no_show, date=self.today)
+
+        with self.settings(ROOM_TAX_RATE='0.075'):
+            audit = run_night_audit(self.today)
+
+        booked.folio.refresh_from_db()
+        self.assertEqual(list(booked.folio.line_items.values_list('total', flat=True)), [Decimal('7.50')])
+        self.assertEqual((booked.folio.total_amount, booked.folio.taxes), (Decimal('307.50'), Decimal('7.50')))
+        overstay.folio.refresh_from_db()
+        self.assertEqual(sorted(overstay.folio.line_items.values_list('total', flat=True)), [Decimal('7.50'), Decimal('100.00')])
+        self.assertEqual(overstay.folio.balance, Decimal('307.50'))
+        self.assertEqual(verify_folio_totals(), {})
+
+        no_show.refresh_from_db()
+        self.assertEqual(no_show.status, 'no_show')
+        self.assertFalse(no_show.room_nights.exists())
+        self.assertTrue(DailyMetrics.objects.filter(date=self.today).exists())
+        self.assertEqual(
+            (audit.rooms_charged, audit.room_revenue, audit.taxes, audit.no_shows),
+            (2, Decimal('100.00'), Decimal('15.00'), 1),
+        )
+
+        self.assertEqual(current_business_date(), self.today + timedelta(days=1))
+        with self.assertRaises(ValueError):
+            run_night_audit(self.today)
+
+    def test_taxes_are_found_by_category_not_description(self):
+        stay = self.make_stay(101, self.today - timedelta(days=1), self.today + timedelta(days=1))
+        post_charge(stay.folio, Decimal('20.00'), 'Room tax refund correction')
+
+        with self.settings(ROOM_TAX_RATE='0.075'):
+            audit = run_night_audit(self.today)
+
+        stay.folio.refresh_from_db()
+        self.assertEqual((stay.folio.taxes, audit.taxes, audit.room_revenue), (Decimal('7.50'), Decimal('7.50'), Decimal('0')))
+        self.assertEqual(
+            sorted(stay.folio.entries.values_list('category', 'amount')),
+            [('', Decimal('20.00')), ('room', Decimal('200.00')), ('tax', Decimal('7.50'))],
+        )
+
+    def test_no_shows_expire_cached_snapshots(self):
+        no_show = self.make_stay(103, self.today, self.today + timedelta(days=1), status='confirmed')
+        builds = []
+        build = lambda: builds.append(1) or len(builds)
+        models = ['reservations.Reservation', 'rooms.Room']
+        cached_snapshot('analytics_dashboard', (self.today,), build, models=models)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            run_night_audit(self.today)
+
+        no_show.refresh_from_db()
+        self.assertEqual(no_show.status, 'no_show')
+        self.assertEqual(cached_snapshot('analytics_dashboard', (self.today,), build, models=models), 2)
+
+    def test_dates_before_the_last_closed_day_are_refused(self):
+        run_night_audit(self.today)
+        with self.assertRaisesMessage(ValueError, 'before the last closed business day'):
+            run_night_audit(self.today - timedelta(days=3))
+        self.assertFalse(NightAudit.objects.filter(business_date=self.today - timedelta(days=3)).exists())
+
+    def test_query_count_does_not_grow_with_hotel_size(self):
+        counts = []
+        for offset, rooms in [(0, 3), (1, 12)]:
+            audit_date = self.today - timedelta(days=10 - offset)
+            for i in range(rooms):
+                self.make_stay(offset * 100 + i, audit_date, audit_date + timedelta(days=1))
+            self.make_stay(offset * 100 + 50, audit_date, audit_date + timedelta(days=1), status='confirmed')
+            with CaptureQueriesContext(connection) as queries:
+                run_night_audit(audit_date)
+            counts.append(len(queries))
+            Reservation.objects.filter(status='checked_in').update(status='checked_out')
+        self.assertEqual(counts[0], counts[1])
+
+
+class AccountingReportTests(TestCase):
+    def setUp(self):
+        self.folio = make_folio()
+        self.today = timezone.localdate()
+        methods = ['cash', 'card', 'bank_transfer', 'paystack', 'cheque']
+        Payment.objects.bulk_create([
+            Payment(
+                folio=self.folio, amount=Decimal('10.00'), payment_method=methods[i % 5],
+                status='completed', transaction_ref=f'PMS-{i:04d}', business_date=self.today,
+            )
+            for i in range(120)
+        ] + [
+            Payment(folio=self.folio, amount=Decimal('99.00'), payment_method='cash', status='pending', transaction_ref='PMS-PENDING', business_date=self.today),
+            Payment(folio=self.folio, amount=Decimal('99.00'), payment_method='cash', status='completed', transaction_ref='PMS-OLD', business_date=self.today - timedelta(days=400)),
+        ])
+        self.client.force_login(CustomUser.objects.create_user(username='accountant', password='pw', role='accounting'))
+        self.range = {'start_date': self.today.isoformat(), 'end_date': self.today.isoformat()}
+
+    def test_totals_and_keyset_pages_cover_the_range_once(self):
+        response = self.client.get(reverse('accounting_report'), self.range)
+        self.assertEqual(response.context['total_revenue'], Decimal('1200.00'))
+        self.assertEqual({row['method']: row['total'] for row in response.context['method_totals']}['Cheque'], Decimal('240.00'))
+
+        seen, pages = [], 0
+        params = dict(self.range)
+        while True:
+            response = self.client.get(reverse('accounting_report'), params)
+            pages += 1
+            seen += [payment.transaction_ref for payment in response.context['payments']]
+            if not response.context['next_cursor']:
+                break
+            params['after'] = response.context['next_cursor']
+        self.assertEqual(pages, 3)
+        self.assertEqual(sorted(seen), [f'PMS-{i:04d}' for i in range(120)])
+
+    def test_export_streams_every_payment_in_the_range(self):
+        response = self.client.get(reverse('accounting_export'), self.range)
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0][0], 'Business Date')
+        self.assertEqual(len(rows), 121)
+        self.assertEqual(rows[1][2:], ['PMS-0000', 'Ada Obi', 'Cash', '10.00', 'completed'])
+
+
+class BillingDashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.folio = make_folio(Decimal('5000.00'))
+        self.today = hotel_today()
+        for i, (method, amount, days_ago) in enumerate([
+            ('cash', '100.00', 0), ('cash', '50.00', 0), ('card', '200.00', 0), ('paystack', '300.00', 3), ('cheque', '400.00', 20),
+        ]):
+            payment = make_payment(self.folio, Decimal(amount), f'PMS-{i}')
+            payment.payment_method = method
+            payment.business_date = self.today - timedelta(days=days_ago)
+            payment.save()
+            post_payment(payment)
+
+    def test_rollup_tracks_credited_payments(self):
+        cash = PaymentDailyTotal.objects.get(business_date=self.today, payment_method='cash')
+        self.assertEqual((cash.count, cash.amount), (2, Decimal('150.00')))
+        # Posting the same payment again does not count it twice
+        post_payment(Payment.objects.get(transaction_ref='PMS-0'))
+        self.assertEqual(verify_payment_totals(), {})
+
+        PaymentDailyTotal.objects.filter(pk=cash.pk).update(count=7)
+        drift = verify_payment_totals(fix=True)
+        self.assertEqual(drift, {(self.today, 'cash'): ((7, Decimal('150.00')), (2, Decimal('150.00')))})
+        self.assertEqual(verify_payment_totals(), {})
+
+    def test_snapshot_in_three_queries(self):
+        with self.assertNumQueries(3):
+            snapshot = _billing_dashboard_snapshot(self.today, '7')
+        self.assertEqual((snapshot['today_revenue'], snapshot['settled_today']), (Decimal('350.00'), 3))
+        self.assertEqual(snapshot['payment_methods_data']['Cash'], 50.0)
+        self.assertEqual(snapshot['payment_methods_data']['Cheque'], 0)
+        self.assertEqual(_billing_dashboard_snapshot(self.today, 'all')['payment_methods_data']['Cheque'], 20.0)
+        self.assertEqual(snapshot['partial_folios'], 1)
+
+    def test_dashboard_window_selection(self):
+        self.client.force_login(CustomUser.objects.create_user(username='accountant', password='pw', role='accounting'))
+        response = self.client.get(reverse('billing_dashboard'), {'window': 'bogus'})
+        self.assertEqual(response.context['window'], '30')
+        response = self.client.get(reverse('billing_dashboard'), {'window': 'all'})
+        self.assertEqual(response.context['payment_methods_data']['Cheque'], 20.0)
+
+
+class PaystackTests(TestCase):
+    SECRET = 'sk_test_standin'
+
+    def setUp(self):
+        self.server = StandInServer(('127.0.0.1', 0), secret_key=self.SECRET)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        overrides = self.settings(
+            PAYSTACK_BASE_URL=self.server.base_url, PAYSTACK_SECRET_KEY=self.SECRET, PAYSTACK_RETRY_BACKOFF=0,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        reset_paystack_client()
+        self.addCleanup(reset_paystack_client)
+
+        self.folio = make_folio()
+        user = CustomUser.objects.create_user(username='cashier', password='pw', role='accounting')
+        self.client.force_login(user)
+
+    def start_payment(self):
+        response = self.client.post(reverse('record_payment', args=[self.folio.pk]), {'amount': '1000.00', 'payment_method': 'paystack'})
+        self.assertEqual(response.status_code, 200)
+        return PaystackTransaction.objects.filter(payment__folio=self.folio).latest('created_at')
+
+    def send_webhook(self, data, secret=SECRET):
+        body = json.dumps({'event': 'charge.success', 'data': data}).encode()
+        signature = hmac.new(secret.encode(), body, hashlib.sha512).hexdigest()
+        return self.client.post(
+            reverse('paystack_webhook'), body, content_type='application/json',
+            HTTP_X_PAYSTACK_SIGNATURE=signature,
+        )
+
+    def test_callback_and_webhook_credit_the_folio_once(self):
+        txn = self.start_payment()
+        self.assertEqual(txn.status, 'pending')
+        checkout = httpx.get(txn.authorization_url)
+        self.assertEqual(checkout.status_code, 302)
+
+        response = self.client.get(reverse('paystack_callback'), {'reference': txn.paystack_reference})
+        self.assertRedirects(response, reverse('folio_detail', args=[self.folio.pk]), fetch_redirect_response=False)
+        txn.refresh_from_db()
+        self.assertEqual((txn.status, txn.payment.status), ('success', 'completed'))
+
+        # Paystack's webhook for the same charge arrives after the redirect
+        data = get_paystack_client().verify_transaction(txn.paystack_reference)
+        self.assertEqual(self.send_webhook(data).status_code, 200)
+        self.client.get(reverse('paystack_callback'), {'reference': txn.paystack_reference})
+        self.folio.refresh_from_db()
+        self.assertEqual((self.folio.amount_paid, self.folio.status), (Decimal('1000.00'), 'settled'))
+        self.assertEqual(self.folio.entries.filter(kind='payment').count(), 1)
+
+    def test_webhook_confirms_without_the_browser(self):
+        txn = self.start_payment()
+        httpx.get(txn.authorization_url)
+        data = asyncio.run(self.verify_async(txn.paystack_reference))
+        self.assertEqual(self.send_webhook(data, secret='sk_test_wrong').status_code, 401)
+        self.assertEqual(PaystackTransaction.objects.get(pk=txn.pk).status, 'pending')
+
+        self.assertEqual(self.send_webhook(data).status_code, 200)
+        self.folio.refresh_from_db()
+        self.assertEqual(self.folio.balance, Decimal('0.00'))
+
+    def test_tampered_amount_fails_the_payment(self):
+        txn = self.start_payment()
+        httpx.get(txn.authorization_url)
+        data = get_paystack_client().verify_transaction(txn.paystack_reference)
+        self.send_webhook({**data, 'amount': 100})
+        txn.refresh_from_db()
+        self.assertEqual((txn.status, txn.payment.status), ('failed', 'failed'))
+        self.folio.refresh_from_db()
+        self.assertEqual(self.folio.amount_paid, Decimal('0.00'))
+
+    def test_client_gives_up_after_retries(self):
+        self.server.failure_rate = 1.0
+        with self.assertRaises(PaystackError):
+            PaystackClient(retries=2, backoff=0).verify_transaction('missing')
+
+    def test_only_unsent_posts_are_retried(self):
+        paystack = PaystackClient(retries=2, backoff=0)
+        self.addCleanup(paystack.close)
+        for method, error, calls in [
+            ('POST', httpx.ReadTimeout, 1),
+            ('POST', httpx.ConnectError, 3),
+            ('GET', httpx.ReadTimeout, 3),
+        ]:
+            requests = []
+            def fail(request):
+                requests.append(request)
+                raise error('no answer', request=request)
+            paystack.client = httpx.Client(base_url=paystack.base_url, transport=httpx.MockTransport(fail))
+            with self.assertRaises(PaystackError):
+                paystack.request(method, '/transaction/initialize' if method == 'POST' else '/transaction/verify/ref')
+            self.assertEqual(len(requests), calls, f'{method} after {error.__name__}')
+
+        # An initialize answered with a 5xx may still have gone through at Paystack
+        self.server.failure_rate = 1.0
+        paystack.client = httpx.Client(**paystack.client_options())
+        with self.assertRaises(PaystackError):
+            paystack.initialize_transaction('ada@example.com', Decimal('10'), 'PMS-RETRY', 'http://testserver/')
+        self.server.failure_rate = 0.0
+        self.assertEqual(paystack.initialize_transaction('ada@example.com', Decimal('10'), 'PMS-RETRY', 'http://testserver/')['reference'], 'PMS-RETRY')
+
+    def test_reconcile_settles_stale_transactions(self):
+        paid, declined, abandoned, recent = [self.start_payment() for _ in range(4)]
+        httpx.get(paid.authorization_url)
+        httpx.get(declined.authorization_url, params={'outcome': 'failed'})
+        httpx.get(recent.authorization_url)
+        PaystackTransaction.objects.exclude(pk=recent.pk).update(created_at=timezone.now() - timedelta(days=2))
+
+        dry_run = reconcile_pending(dry_run=True, concurrency=2)
+        self.assertEqual((dry_run['checked'], dry_run['succeeded'], dry_run['expired']), (3, 1, 1))
+        self.assertEqual(PaystackTransaction.objects.filter(status='pending').count(), 4)
+
+        stats = reconcile_pending(concurrency=2, batch_size=2)
+        self.assertEqual(
+            {key: stats[key] for key in ['checked', 'succeeded', 'failed', 'expired', 'errors']},
+            {'checked': 3, 'succeeded': 1, 'failed': 1, 'expired': 1, 'errors': 0},
+        )
+        statuses = dict(PaystackTransaction.objects.values_list('pk', 'status'))
+        self.assertEqual(
+            [statuses[txn.pk] for txn in [paid, declined, abandoned, recent]],
+            ['success', 'failed', 'failed', 'pending'],
+        )
+        self.assertEqual(Payment.objects.get(pk=abandoned.payment_id).status, 'failed')
+        self.folio.refresh_from_db()
+        self.assertEqual(self.folio.amount_paid, Decimal('1000.00'))
+        self.assertEqual(reconcile_pending()['checked'], 0)
+
+    def test_reconcile_isolates_failing_references(self):
+        paid, unknown, broken = [self.start_payment() for _ in range(3)]
+        httpx.get(paid.authorization_url)
+        httpx.get(broken.authorization_url)
+        del self.server.transactions[unknown.paystack_reference]
+        PaystackTransaction.objects.update(created_at=timezone.now() - timedelta(days=2))
+
+        def confirm(reference, data):
+            if reference == broken.paystack_reference:
+                raise Payment.DoesNotExist('payment deleted')
+            return confirm_transaction(reference, data)
+
+        with mock.patch('billing.reconcile.confirm_transaction', side_effect=confirm), mock.patch('builtins.print'):
+            stats = reconcile_pending(batch_size=10)
+        self.assertEqual((stats['succeeded'], stats['errors'], stats['expired']), (1, 2, 2))
+        statuses = dict(PaystackTransaction.objects.values_list('pk', 'status'))
+        self.assertEqual([statuses[txn.pk] for txn in [paid, unknown, broken]], ['success', 'failed', 'failed'])
+
+        # Paystack unreachable: nothing is expired on the strength of a transport error
+        recent = self.start_payment()
+        PaystackTransaction.objects.filter(pk=recent.pk).update(created_at=timezone.now() - timedelta(days=2))
+        with mock.patch('builtins.print'):
+            stats = reconcile_pending(base_url='http://127.0.0.1:9', retries=0)
+        self.assertEqual((stats['errors'], stats['expired']), (1, 0))
+        self.assertEqual(PaystackTransaction.objects.get(pk=recent.pk).status, 'pending')
+
+    def test_late_confirmation_counts_revenue_on_the_payment_day(self):
+        yesterday = hotel_today() - timedelta(days=1)
+        txn = self.start_payment()
+        httpx.get(txn.authorization_url)
+        Payment.objects.filter(pk=txn.payment_id).update(business_date=yesterday)
+        PaystackTransaction.objects.filter(pk=txn.pk).update(created_at=timezone.now() - timedelta(hours=2))
+        update_daily_metrics(yesterday)
+        update_daily_metrics(hotel_today())
+
+        self.assertEqual(reconcile_pending()['succeeded'], 1)
+        self.assertEqual(reconcile_daily_metrics(yesterday), {})
+        self.assertEqual(reconcile_daily_metrics(hotel_today()), {})
+        self.assertEqual(DailyMetrics.objects.get(date=yesterday).total_revenue, Decimal('1000.00'))
+
+    async def verify_async(self, reference):
+        async with AsyncPaystackClient() as paystack:
+            return await paystack.verify_transaction(reference)
+
+
+class ConcurrentPostingTests(TransactionTestCase):
+    threads = 8
+    postings = 10
+
+    def test_concurrent_postings_do_not_lose_updates(self):
+        folio = make_folio(Decimal('5000.00'))
+        errors = []
+
+        def worker(n):
+            try:
+                for i in range(self.postings):
+                    post_charge(Folio(pk=folio.pk), Decimal('10.00'), f'Minibar {n}-{i}')
+                    post_payment(make_payment(folio, Decimal('15.00'), f'PMS-{n}-{i}'))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(n,)) for n in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        folio.refresh_from_db()
+        postings = self.threads * self.postings
+        self.assertEqual(folio.total_amount, Decimal('5000.00') + postings * Decimal('10.00'))
+        self.assertEqual(folio.amount_paid, postings * Decimal('15.00'))
+        self.assertEqual(folio.balance, folio.total_amount - folio.amount_paid)
+        self.assertEqual(FolioEntry.objects.filter(folio=folio).count(), 1 + 2 * postings)
+        self.assertEqual(verify_folio_totals(), {})
@@ -9,6 +9,7 @@ urlpatterns = [
     path('folios/<uuid:pk>/charge/', views.add_folio_charge, name='add_charge'),
     path('payment/<uuid:pk>/', views.record_payment, name='record_payment'),
     path('paystack/callback/', views.paystack_callback, name='paystack_callback'),
+    path('paystack/webhook/', views.paystack_webhook, name='paystack_webhook'),
     path('reports/accounting/', views.accounting_report, name='accounting_report'),
-    path('paystack/callback/', views.paystack_callback, name='paystack_callback'),
+    path('reports/accounting/export/', views.accounting_export, name='accounting_export'),
 ]
\ No newline at end of file
@@ -1,79 +1,98 @@
 # billing/views.py
-import requests
+import csv
+import json
 import uuid
+from datetime import datetime, timedelta
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.conf import settings
-from django.utils import timezone
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from django.db import transaction
 from django.db.models import Sum, Count,Q
 from core.decorators import role_required
+from core.utils import get_hotel_timezone, hotel_today
 from reservations.models import ReservationAddon
-from .models import Folio, Payment, FolioLineItem, PaystackTransaction
+from .models import Folio, Payment, FolioLineItem, PaymentDailyTotal, PaystackTransaction
 from .forms import FolioForm, PaymentForm, FolioLineItemForm
 from django.urls import reverse
-from analytics.utils import update_daily_metrics
-from .utils  import update_folio_totals 
+from analytics.cache import cached_snapshot
+from analytics.utils import apply_metrics_delta
+from .allocation import allocate_payment
+from .ledger import post_charge, post_payment
+from .paystack import PaystackError, confirm_transaction, get_paystack_client, valid_signature
 from guests.models import Guest
 
-@login_required(login_url='login')
-@role_required(['admin', 'manager', 'accounting'])
-def billing_dashboard(request):
-    today = timezone.now().date()
-
-    today_payments = Payment.objects.filter(
-        created_at__date=today,
-        status='completed'
-    ).aggregate(total=Sum('amount'))['total'] or 0
-
-    open_folios = Folio.objects.filter(status='open').count()
-    partial_folios = Folio.objects.filter(status='partial').count()
-    settled_today = Payment.objects.filter(
-        created_at__date=today,
-        status='completed'
-    ).count()
-
-    recent_payments = Payment.objects.select_related(
-        'folio__guest'
-    ).order_by('-created_at')[:10]
-
-    PAYMENT_METHODS = {
-        'cash': 'Cash',
-        'card': 'Card',
-        'bank_transfer': 'Bank Transfer',
-        'paystack': 'Paystack',
-        'cheque': 'Cheque',
-    }
-
-    payment_queryset = (
-        Payment.objects
-        .filter(status='completed')
-        .values('payment_method')
-        .annotate(total=Count('id'))
+# Payment-method breakdown windows offered on the dashboard, in days (None for all time)
+DASHBOARD_WINDOWS = {'7': 7, '30': 30, '90': 90, '365': 365, 'all': None}
+DEFAULT_DASHBOARD_WINDOW = '30'
+
+
+def _billing_dashboard_snapshot(today, window):
+    """
+    Dashboard figures in three queries: today's takings and the window's
+    method breakdown from the PaymentDailyTotal rollup (one grouped,
+    conditional aggregate), folio counts by status, and recent payments.
+    """
+    rollup = PaymentDailyTotal.objects.filter(business_date__lte=today)
+    days = DASHBOARD_WINDOWS[window]
+    if days is not None:
+        rollup = rollup.filter(business_date__gt=today - timedelta(days=days))
+    by_method = (
+        rollup.order_by().values('payment_method')
+        .annotate(
+            window_count=Sum('count'),
+            today_count=Sum('count', filter=Q(business_date=today)),
+            today_amount=Sum('amount', filter=Q(business_date=today)),
+        )
+    )
+    totals_by_method = {}
+    today_payments = settled_today = 0
+    for row in by_method:
+        totals_by_method[row['payment_method']] = row['window_count']
+        today_payments += row['today_amount'] or 0
+        settled_today += row['today_count'] or 0
+
+    folios = Folio.objects.aggregate(
+        open=Count('id', filter=Q(status='open')),
+        partial=Count('id', filter=Q(status='partial')),
     )
 
-    totals_by_method = {
-        item['payment_method']: item['total']
-        for item in payment_queryset
-    }
+    recent_payments = list(Payment.objects.select_related(
+        'folio__guest'
+    ).order_by('-created_at')[:10])
 
     total_payments = sum(totals_by_method.values()) or 1
 
     payment_methods_data = {
         label: round((totals_by_method.get(key, 0) / total_payments) * 100, 1)
-        for key, label in PAYMENT_METHODS.items()
+        for key, label in Payment.PAYMENT_METHOD_CHOICES
     }
 
-    context = {
-        'title': 'Billing Dashboard',
+    return {
         'today_revenue': today_payments,
-        'open_folios': open_folios,
-        'partial_folios': partial_folios,
+        'open_folios': folios['open'],
+        'partial_folios': folios['partial'],
         'settled_today': settled_today,
         'recent_payments': recent_payments,
         'payment_methods_data': payment_methods_data,
     }
 
+@login_required(login_url='login')
+@role_required(['admin', 'manager', 'accounting'])
+def billing_dashboard(request):
+    today = hotel_today()
+    window = request.GET.get('window')
+    if window not in DASHBOARD_WINDOWS:
+        window = DEFAULT_DASHBOARD_WINDOW
+    context = {
+        'title': 'Billing Dashboard',
+        'window': window,
+        'window_choices': list(DASHBOARD_WINDOWS),
+        **cached_snapshot('billing_dashboard', (today, window), lambda: _billing_dashboard_snapshot(today, window)),
+    }
+
     return render(request, 'billing/dashboard.html', context)
 @login_required(login_url='login')
 @role_required(['admin', 'manager', 'accounting'])
@@ -128,10 +147,10 @@ def add_folio_charge(request, pk):
         if form.is_valid():
             line_item = form.save(commit=False)
             line_item.folio = folio
-            print(folio.balance)
             line_item.total = line_item.amount * line_item.quantity
-            line_item.save()
-            update_folio_totals(folio)
+            with transaction.atomic():
+                line_item.save()
+                post_charge(folio, line_item.total, line_item.description, line_item=line_item, user=request.user)
             ReservationAddon.objects.create(reservation=folio.reservation, name=line_item.description, price=line_item.amount, quantity=line_item.quantity)
             messages.success(request, 'Charge added to folio')
             return redirect('folio_detail', pk=pk)
@@ -164,36 +183,20 @@ def record_payment(request, pk):
                 payment.save()
                 return initiate_paystack_payment(request, payment, folio)
             else:
-                payment.status = 'completed'
-                payment.save()
-                guest = folio.guest
-                guest.total_spent += payment.amount
-                guest.total_stays += 1
-                guest.save()
-                if guest.total_spent >= 100000:
-                    guest.vip = True
+                with transaction.atomic():
+                    payment.status = 'completed'
+                    payment.save()
+                    guest = folio.guest
+                    guest.total_spent += payment.amount
+                    guest.total_stays += 1
                     guest.save()
-                folio.amount_paid = (folio.amount_paid or 0) + payment.amount
-                folio.balance-=folio.amount_paid
-                remaining_payment = payment.amount
-                unpaid_items = folio.line_items.filter(status='unpaid').order_by('created_at')
-
-                for item in unpaid_items:
-                    if remaining_payment >= item.total:
-                        item.status = 'paid'
-                        item.save()
-                        remaining_payment -= item.total
-                    else:
-                        break
-                update_folio_totals(folio)
-                if folio.balance <= 0:
-                    folio.status = 'settled'
-                else:
-                    folio.status = 'partial'
-                folio.save()
-                update_daily_metrics()
-                
-               
+                    if guest.total_spent >= 100000:
+                        guest.vip = True
+                        guest.save()
+                    post_payment(payment, user=request.user)
+                    allocate_payment(payment)
+                    apply_metrics_delta(total_revenue=payment.amount)
+
                 messages.success(request, f'Payment of ₦{payment.amount} recorded successfully')
                 return redirect('folio_detail', pk=pk)
 
@@ -208,199 +211,189 @@ def record_payment(request, pk):
     return render(request, 'billing/record_payment.html', context)
 
 def initiate_paystack_payment(request, payment, folio):
-    PAYSTACK_SECRET_KEY = settings.PAYSTACK_SECRET_KEY
+    try:
+        data = get_paystack_client().initialize_transaction(
+            email=folio.guest.email,
+            amount=payment.amount,
+            reference=payment.transaction_ref,
+            callback_url=request.build_absolute_uri(reverse('paystack_callback')),
+        )
+    except PaystackError as e:
+        print(f"Paystack initialize error: {str(e)}")
+        messages.error(request, 'Failed to initiate Paystack payment. Please try again.')
+        return redirect('record_payment', pk=folio.pk)
 
-    headers = {
-        'Authorization': f'Bearer {PAYSTACK_SECRET_KEY}',
-        'Content-Type': 'application/json',
-    }
+    PaystackTransaction.objects.create(
+        payment=payment,
+        authorization_url=data['authorization_url'],
+        access_code=data['access_code'],
+        paystack_reference=data['reference'],
+        amount=payment.amount,
+        status='pending'
+    )
 
-    payload = {
-        'email': folio.guest.email,
-        'amount': int(payment.amount * 100),
-        'reference': payment.transaction_ref,
-        'callback_url': request.build_absolute_uri(reverse('paystack_callback')),
+    payment.status = 'pending'
+    payment.save()
+    context = {
+        'folio': folio,
+        'payment': payment,
+        'authorization_url': data['authorization_url'],
     }
+    return render(request, 'billing/confirm_paystack.html', context)
 
-    try:
-        response = requests.post(
-            'https://api.paystack.co/transaction/initialize',
-            json=payload,
-            headers=headers,
-            timeout=10
-        )
-        if response.status_code == 200:
-            data = response.json()
-            
-            PaystackTransaction.objects.create(
-                payment=payment,
-                authorization_url=data['data']['authorization_url'],
-                access_code=data['data']['access_code'],
-                paystack_reference=data['data']['reference'],
-                amount=payment.amount,
-                status='pending'
-            )
-            
-            payment.status = 'pending'
-            payment.save()
-            context = {
-                'folio': folio,
-                'payment': payment,
-                'authorization_url': data['data']['authorization_url'],
-            }
-            return render(request, 'billing/confirm_paystack.html', context)
-
-        else:
-            messages.error(request, 'Failed to initiate Paystack payment. Please try again.')
-            return redirect('record_payment', pk=folio.pk)
-    
-    except requests.RequestException as e:
-        messages.error(request, f'Payment error: {str(e)}')
-        return redirect('record_payment', pk=folio.pk)
 @login_required(login_url='login')
 @role_required(['admin', 'manager', 'accounting'])
 def paystack_callback(request):
-    """Handle Paystack callback"""
+    """Paystack redirects the browser here after checkout; the webhook may already have confirmed the payment."""
     reference = request.GET.get('reference')
-    PAYSTACK_SECRET_KEY = settings.PAYSTACK_SECRET_KEY
-    
-    headers = {
-        'Authorization': f'Bearer {PAYSTACK_SECRET_KEY}',
-    }
-    
+    if not reference:
+        messages.error(request, "No transaction reference found.")
+        return redirect('billing_dashboard')
+
     try:
-        response = requests.get(
-            f'https://api.paystack.co/transaction/verify/{reference}',
-            headers=headers,
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            
-            if data['data']['status'] == 'success':
-                # Update PaystackTransaction
-                paystack_txn = PaystackTransaction.objects.get(paystack_reference=reference)
-                paystack_txn.status = 'success'
-                paystack_txn.paid_at = timezone.now()
-                paystack_txn.save()
-                
-                # Update Payment
-                payment = paystack_txn.payment
-                payment.status = 'completed'
-                payment.save()
-                
-                # Update Folio
-                folio = payment.folio
-                folio.amount_paid = (folio.amount_paid or 0) + payment.amount
-                folio.balance = folio.total_amount - folio.amount_paid
-                
-                if folio.balance <= 0:
-                    folio.status = 'settled'
-                else:
-                    folio.status = 'partial'
-                
-                folio.save()
-                
-                messages.success(request, f'Payment of ₦{payment.amount} completed successfully')
-                return redirect('folio_detail', pk=folio.pk)
-            else:
-                paystack_txn = PaystackTransaction.objects.get(paystack_reference=reference)
-                paystack_txn.status = 'failed'
-                paystack_txn.save()
-                
-                payment = paystack_txn.payment
-                payment.status = 'failed'
-                payment.save()
-                
-                messages.error('Payment failed. Please try again.')
-                return redirect('folio_detail', pk=payment.folio.pk)
-    
-    except Exception as e:
-        messages.error(f'Error processing payment: {str(e)}')
+        txn = PaystackTransaction.objects.select_related('payment').get(paystack_reference=reference)
+    except PaystackTransaction.DoesNotExist:
+        messages.error(request, "Transaction not found in system.")
         return redirect('billing_dashboard')
 
+    if txn.status == 'pending':
+        try:
+            txn, _ = confirm_transaction(reference, get_paystack_client().verify_transaction(reference))
+        except PaystackError as e:
+            print(f"Paystack verify error: {str(e)}")
+            messages.error(request, 'Could not verify the payment with Paystack yet; it will be confirmed when Paystack notifies us.')
+            return redirect('folio_detail', pk=txn.payment.folio_id)
+
+    if txn.status == 'success':
+        messages.success(request, f"Payment of ₦{txn.amount} was successful.")
+    else:
+        messages.error(request, "Payment verification failed or cancelled.")
+    return redirect('folio_detail', pk=txn.payment.folio_id)
+
+@csrf_exempt
+@require_POST
+def paystack_webhook(request):
+    """
+    Server-to-server notification from Paystack, signed with the secret
+    key. Confirms charge.success events whether or not the guest's browser
+    ever comes back to the callback; repeats are ignored.
+    """
+    if not valid_signature(request.body, request.headers.get('X-Paystack-Signature')):
+        return HttpResponse(status=401)
+    try:
+        event = json.loads(request.body)
+    except ValueError:
+        return HttpResponse(status=400)
 
+    if event.get('event') == 'charge.success':
+        data = event.get('data') or {}
+        try:
+            confirm_transaction(data.get('reference'), data)
+        except PaystackTransaction.DoesNotExist:
+            print(f"Paystack webhook for unknown reference {data.get('reference')}")
+    # Acknowledge everything else so Paystack stops retrying
+    return HttpResponse(status=200)
 
-def paystack_callback(request):
-    reference = request.GET.get('reference')
-    
-    if not reference:
-        messages.error(request, "No transaction reference found.")
-        return redirect('dashboard')
+ACCOUNTING_PAGE_SIZE = 50
+EXPORT_CHUNK_SIZE = 2000
 
-    url = f"https://api.paystack.co/transaction/verify/{reference}"
-    headers = {
-        "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
-    }
 
-    response = requests.get(url, headers=headers)
-    data = response.json()
+def _accounting_range(request):
+    """Report dates from the query string; the month to date when missing or invalid."""
+    today = hotel_today()
+    try:
+        start_date = datetime.strptime(request.GET.get('start_date', ''), '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.GET.get('end_date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return today.replace(day=1), today
+    return start_date, end_date
+
+def _accounting_payments(start_date, end_date):
+    return Payment.objects.filter(
+        status='completed',
+        business_date__gte=start_date,
+        business_date__lte=end_date
+    )
 
-    if data["status"] and data["data"]["status"] == "success":
-        try:
-            txn = PaystackTransaction.objects.get(paystack_reference=reference)
-            payment = txn.payment
-            folio = payment.folio
-
-            txn.status = "completed"
-            txn.save()
-
-            payment.status = "completed"
-            payment.save()
-
-            folio.amount_paid = (folio.amount_paid or 0) + payment.amount
-            folio.balance = folio.total_amount - folio.amount_paid
-            folio.status = "settled" if folio.balance <= 0 else "partial"
-            folio.save()
-            
-            # UPDATE DAILY METRICS AFTER SUCCESSFUL PAYMENT
-            update_daily_metrics()
-
-            messages.success(request, f"Payment of ₦{payment.amount} was successful.")
-            return redirect('folio_detail', pk=folio.pk)
-        except PaystackTransaction.DoesNotExist:
-            messages.error(request, "Transaction not found in system.")
-            return redirect('dashboard')
-    else:
-        messages.error(request, "Payment verification failed or cancelled.")
-        return redirect('dashboard')
+def _encode_cursor(payment):
+    return f"{payment.created_at.isoformat()}|{payment.pk}"
+
+def _after_cursor(payments, cursor):
+    """Payments that come after `cursor` in newest-first order (keyset paging); all of them for a bad cursor."""
+    try:
+        created_at, pk = cursor.split('|')
+        created_at, pk = datetime.fromisoformat(created_at), uuid.UUID(pk)
+    except ValueError:
+        return payments
+    return payments.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
 
 @login_required(login_url='login')
 @role_required(['admin', 'manager', 'accounting'])
 def accounting_report(request):
-    start_date = request.GET.get('start_date')
-    end_date = request.GET.get('end_date')
-
-    if start_date and end_date:
-        payments = Payment.objects.filter(
-            status='completed',
-            created_at__date__gte=start_date,
-            created_at__date__lte=end_date
-        ).order_by('payment_method')
-    else:
-        payments = list(
-            Payment.objects.filter(status='completed')
-            .order_by('payment_method')[:30]
-        )
+    start_date, end_date = _accounting_range(request)
+    payments = _accounting_payments(start_date, end_date)
+
+    # One grouped query for every method's total
+    totals = dict(
+        payments.order_by().values('payment_method')
+        .annotate(total=Sum('amount')).values_list('payment_method', 'total')
+    )
+    method_totals = [
+        {'method': label, 'total': totals.get(method) or 0}
+        for method, label in Payment.PAYMENT_METHOD_CHOICES
+    ]
+    total_revenue = sum(totals.values())
+
+    # Newest first, seeking past the last row shown rather than counting an OFFSET
+    cursor = request.GET.get('after')
+    page = payments.select_related('folio__guest').order_by('-created_at', '-pk')
+    if cursor:
+        page = _after_cursor(page, cursor)
+    page = list(page[:ACCOUNTING_PAGE_SIZE + 1])
+    next_cursor = _encode_cursor(page[ACCOUNTING_PAGE_SIZE - 1]) if len(page) > ACCOUNTING_PAGE_SIZE else None
 
-    # Compute totals
-    cash_total = sum(p.amount for p in payments if p.payment_method == 'cash')
-    card_total = sum(p.amount for p in payments if p.payment_method == 'card')
-    bank_total = sum(p.amount for p in payments if p.payment_method == 'bank_transfer')
-    paystack_total = sum(p.amount for p in payments if p.payment_method == 'paystack')
-    
-    total_revenue = cash_total + card_total + bank_total + paystack_total
-    
     context = {
         'title': 'Accounting Report',
-        'payments': payments,
-        'cash_total': cash_total,
-        'card_total': card_total,
-        'bank_total': bank_total,
-        'paystack_total': paystack_total,
+        'payments': page[:ACCOUNTING_PAGE_SIZE],
+        'method_totals': method_totals,
         'total_revenue': total_revenue,
-        'start_date': start_date,
-        'end_date': end_date,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'next_cursor': next_cursor,
+        'is_first_page': not cursor,
     }
-    return render(request, 'billing/accounting_report.html', context)
\ No newline at end of file
+    return render(request, 'billing/accounting_report.html', context)
+
+class _Echo:
+    """File-like object whose write() hands the line back, so csv.writer can feed a streaming response."""
+    def write(self, value):
+        return value
+
+@login_required(login_url='login')
+@role_required(['admin', 'manager', 'accounting'])
+def accounting_export(request):
+    start_date, end_date = _accounting_range(request)
+    rows = _accounting_payments(start_date, end_date).order_by('business_date', 'created_at', 'pk').values_list(
+        'business_date', 'created_at', 'transaction_ref', 'folio__guest__first_name', 'folio__guest__last_name',
+        'payment_method', 'amount', 'status',
+    )
+    methods = dict(Payment.PAYMENT_METHOD_CHOICES)
+    tz = get_hotel_timezone()
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield writer.writerow(['Business Date', 'Recorded At', 'Reference', 'Guest', 'Method', 'Amount', 'Status'])
+        for business_date, created_at, reference, first_name, last_name, method, amount, status in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield writer.writerow([
+                business_date.isoformat(),
+                created_at.astimezone(tz).strftime('%Y-%m-%d %H:%M'),
+                reference,
+                f'{first_name} {last_name}',
+                methods.get(method, method),
+                amount,
+                status,
+            ])
+
+    response = StreamingHttpResponse(lines(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="accounting_{start_date}_{end_date}.csv"'
+    return response
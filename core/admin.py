@@ -8,15 +8,23 @@ from reservations.models import *
 from rooms.models import *
 
 admin.site.register(AIReport)
+admin.site.register(AIJob)
+admin.site.register(ReportPayload)
 admin.site.register(DailyMetrics)
 admin.site.register(Folio)
 admin.site.register(FolioLineItem)
+admin.site.register(FolioEntry)
+admin.site.register(PaymentAllocation)
+admin.site.register(NightAudit)
+admin.site.register(PaymentDailyTotal)
 admin.site.register(Payment)
 admin.site.register(PaystackTransaction)
 admin.site.register(Guest)
 admin.site.register(GuestContact)
 admin.site.register(Reservation)
 admin.site.register(ReservationAddon)
+admin.site.register(RoomNight)
+admin.site.register(GroupBooking)
 admin.site.register(RoomType)
 admin.site.register(Room)
 admin.site.register(HousekeepingTask)
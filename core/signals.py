@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Hotel
+from .utils import clear_hotel_timezone
+
+
+@receiver(post_save, sender=Hotel)
+@receiver(post_delete, sender=Hotel)
+def reset_hotel_timezone(sender, **kwargs):
+    clear_hotel_timezone()
@@ -1,3 +1,44 @@
+from datetime import date, datetime, timezone as dt_timezone
+
 from django.test import TestCase
+from guests.models import Guest
+from .models import Hotel
+from .utils import get_hotel_timezone, time_series
+
+
+class TimeSeriesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Hotel.objects.create(name='Test Hotel', address='1 Marina', phone='0', email='hotel@example.com', timezone='Africa/Lagos')
+        created = [
+            datetime(2026, 3, 2, 10, 0, tzinfo=dt_timezone.utc),
+            datetime(2026, 3, 2, 12, 0, tzinfo=dt_timezone.utc),
+            # 00:30 on 5 March in Lagos (UTC+1)
+            datetime(2026, 3, 4, 23, 30, tzinfo=dt_timezone.utc),
+            datetime(2026, 4, 15, 9, 0, tzinfo=dt_timezone.utc),
+        ]
+        for i, created_at in enumerate(created):
+            guest = Guest.objects.create(first_name='Guest', last_name=str(i), email=f'guest{i}@example.com', phone=str(i))
+            Guest.objects.filter(pk=guest.pk).update(created_at=created_at)
+
+    def test_daily_buckets_are_zero_filled_in_hotel_timezone(self):
+        series = time_series(Guest.objects.all(), 'created_at', date(2026, 3, 1), date(2026, 3, 5))
+        self.assertEqual([(point['date'].day, point['count']) for point in series], [
+            (1, 0), (2, 2), (3, 0), (4, 0), (5, 1),
+        ])
+
+    def test_weekly_and_monthly_buckets(self):
+        weekly = time_series(Guest.objects.all(), 'created_at', date(2026, 3, 1), date(2026, 3, 14), 'week')
+        self.assertEqual([(point['date'], point['count']) for point in weekly], [
+            (date(2026, 2, 23), 0), (date(2026, 3, 2), 3), (date(2026, 3, 9), 0),
+        ])
+        monthly = time_series(Guest.objects.all(), 'created_at', date(2026, 1, 1), date(2026, 12, 31), 'month')
+        self.assertEqual(len(monthly), 12)
+        self.assertEqual([point['count'] for point in monthly[2:4]], [3, 1])
 
-# Create your tests here.
+    def test_long_ranges_use_one_query(self):
+        tz = get_hotel_timezone()
+        with self.assertNumQueries(1):
+            series = time_series(Guest.objects.all(), 'created_at', date(2025, 4, 16), date(2026, 4, 15), tz=tz)
+        self.assertEqual(len(series), 365)
+        self.assertEqual(sum(point['count'] for point in series), 4)
@@ -0,0 +1,97 @@
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db import models
+from django.db.models import Count
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from .models import Hotel
+
+SERIES_PERIODS = ['day', 'week', 'month']
+
+_hotel_timezone = None
+
+
+def get_hotel_timezone():
+    """
+    Timezone configured on the Hotel record, falling back to TIME_ZONE.
+    Looked up once per process; saving a Hotel clears it.
+    """
+    global _hotel_timezone
+    if _hotel_timezone is None:
+        tz = timezone.get_default_timezone()
+        name = Hotel.objects.values_list('timezone', flat=True).first()
+        if name:
+            try:
+                tz = ZoneInfo(name)
+            except (ZoneInfoNotFoundError, ValueError):
+                pass
+        _hotel_timezone = tz
+    return _hotel_timezone
+
+def clear_hotel_timezone():
+    global _hotel_timezone
+    _hotel_timezone = None
+
+def hotel_today(tz=None):
+    return timezone.now().astimezone(tz or get_hotel_timezone()).date()
+
+def business_date(moment, tz=None):
+    """Hotel-local calendar date of an aware datetime."""
+    if moment is None:
+        return None
+    return moment.astimezone(tz or get_hotel_timezone()).date()
+
+def bucket_start(day, period):
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+def series_buckets(start_date, end_date, period='day'):
+    """Every bucket start date covering [start_date, end_date]."""
+    buckets = []
+    current = bucket_start(start_date, period)
+    while current <= end_date:
+        buckets.append(current)
+        if period == 'week':
+            current += timedelta(days=7)
+        elif period == 'month':
+            current = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+        else:
+            current += timedelta(days=1)
+    return buckets
+
+def time_series(queryset, field, start_date, end_date, period='day', tz=None, **aggregates):
+    """
+    Aggregate `queryset` into day/week/month buckets of `field` between
+    start_date and end_date inclusive with a single GROUP BY, returning one
+    dict per bucket ({'date': bucket, <aggregate>: value, ...}) with empty
+    buckets zero-filled. DateTimeFields are bucketed in the hotel timezone.
+    Without aggregates each bucket carries a row `count`.
+    """
+    if period not in SERIES_PERIODS:
+        raise ValueError(f'period must be one of {", ".join(SERIES_PERIODS)}')
+    aggregates = aggregates or {'count': Count('pk')}
+
+    if isinstance(queryset.model._meta.get_field(field), models.DateTimeField):
+        tz = tz or get_hotel_timezone()
+        queryset = queryset.filter(**{
+            f'{field}__gte': datetime.combine(start_date, time.min, tzinfo=tz),
+            f'{field}__lt': datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=tz),
+        })
+        bucket = Trunc(field, period, output_field=models.DateField(), tzinfo=tz)
+    else:
+        queryset = queryset.filter(**{f'{field}__gte': start_date, f'{field}__lte': end_date})
+        bucket = Trunc(field, period, output_field=models.DateField())
+
+    rows = {
+        row['bucket']: row
+        for row in queryset.order_by().annotate(bucket=bucket).values('bucket').annotate(**aggregates)
+    }
+    series = []
+    for day in series_buckets(start_date, end_date, period):
+        row = rows.get(day, {})
+        series.append({'date': day, **{name: row.get(name) or 0 for name in aggregates}})
+    return series
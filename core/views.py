@@ -6,13 +6,12 @@ from django.contrib import messages
 from .forms import LoginForm, CustomUserCreationForm
 from .decorators import role_required
 from .models import CustomUser, Hotel
+from .utils import hotel_today, time_series
 from rooms.models import Room
 from guests.models  import Guest
 from billing.models import Payment
-from django.utils import timezone
 from django.db.models import Sum, Case, When, IntegerField,Count
 from datetime import timedelta
-from datetime import datetime, timedelta
 
 def login_view(request):
     if request.user.is_authenticated:
@@ -41,27 +40,17 @@ def dashboard(request):
     rooms_count = Room.objects.count()
     occupied_count = Room.objects.filter(status='occupied').count()
     guests_count = Guest.objects.count()
-    today = timezone.now().date()
-    today_payments = Payment.objects.filter(
-        created_at__date=today,
-        status='completed'
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    today = hotel_today()
 
     start_date = today - timedelta(days=11)
-    dates = [(start_date + timedelta(days=i)) for i in range(12)]
-    revenue_labels = [d.strftime('%d %b') for d in dates]
-    room_revenue = []
-    service_revenue = []
-
-    for date in dates:
-        start = datetime.combine(date, datetime.min.time())
-        end = datetime.combine(date, datetime.max.time())
-        daily_total = Payment.objects.filter(
-            created_at__range=(start, end),
-            status='completed'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        room_revenue.append(float(daily_total)) 
-        service_revenue.append(0)
+    revenue_series = time_series(
+        Payment.objects.filter(status='completed'), 'business_date',
+        start_date, today, total=Sum('amount')
+    )
+    today_payments = revenue_series[-1]['total']
+    revenue_labels = [point['date'].strftime('%d %b') for point in revenue_series]
+    room_revenue = [float(point['total']) for point in revenue_series]
+    service_revenue = [0] * len(revenue_series)
 
     room_types_qs = (
     Room.objects
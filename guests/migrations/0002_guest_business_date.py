@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:47
+
+import core.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('guests', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guest',
+            name='business_date',
+            field=models.DateField(default=core.utils.hotel_today),
+        ),
+        migrations.AddIndex(
+            model_name='guest',
+            index=models.Index(fields=['business_date'], name='guests_gues_busines_d968d7_idx'),
+        ),
+    ]
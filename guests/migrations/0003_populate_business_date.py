@@ -0,0 +1,32 @@
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db import migrations
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def hotel_timezone(apps):
+    Hotel = apps.get_model('core', 'Hotel')
+    name = Hotel.objects.values_list('timezone', flat=True).first()
+    try:
+        return ZoneInfo(name) if name else timezone.get_default_timezone()
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.get_default_timezone()
+
+
+def populate_business_dates(apps, schema_editor):
+    tz = hotel_timezone(apps)
+    Guest = apps.get_model('guests', 'Guest')
+    Guest.objects.update(business_date=TruncDate('created_at', tzinfo=tz))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('guests', '0002_guest_business_date'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_business_dates, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from core.utils import hotel_today
 import uuid
 
 class Guest(models.Model):
@@ -29,12 +30,14 @@ class Guest(models.Model):
     vip = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    business_date = models.DateField(default=hotel_today)
     
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['email']),
             models.Index(fields=['phone']),
+            models.Index(fields=['business_date']),
         ]
     
     def __str__(self):
@@ -1,7 +1,10 @@
+from datetime import datetime
 from django.shortcuts import render, redirect
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from reservations.forms import ReservationForm
+from reservations.booking import book_reservation
+from reservations.utils import find_available_rooms
 from guests.forms import  GuestForm
 from guests.models import Guest
 
@@ -64,24 +67,33 @@ def reservation(request):
             room_price = reservation.room.price_per_night
             reservation.total_price = room_price * nights
 
-            # Save reservation
-            reservation.save()
-
-            # Update room status to reserved
-            room = reservation.room
-            room.status = 'reserved'
-            room.save()
+            # Save reservation, hold its nights and mark the room reserved
+            result = book_reservation(reservation)
+            if not result['ok']:
+                rform.add_error('room', result['message'])
 
             # Optional redirect
             # return redirect('reservation_success')
 
     else:
         gform = GuestForm()
-        rform = ReservationForm()
+        rform = ReservationForm(initial={
+            'check_in_date': request.GET.get('check_in'),
+            'check_out_date': request.GET.get('check_out'),
+        })
 
         if 'guest' in rform.fields:
             rform.fields.pop('guest')
 
+        # Only offer rooms that are free for the dates searched on the home page
+        try:
+            check_in = datetime.strptime(request.GET.get('check_in', ''), '%Y-%m-%d').date()
+            check_out = datetime.strptime(request.GET.get('check_out', ''), '%Y-%m-%d').date()
+        except ValueError:
+            check_in = check_out = None
+        if check_in and check_out and check_in < check_out:
+            rform.fields['room'].queryset = find_available_rooms(check_in, check_out)
+
     context = {
         "gform": gform,
         "rform": rform
@@ -93,6 +93,22 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Take the write lock at BEGIN so concurrent bookings queue instead of failing with "database is locked"
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # On disk so threaded tests wait on the write lock; shared in-memory test databases fail instead
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'hotel-pms',
     }
 }
 
@@ -151,4 +167,56 @@ EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL")
 PAYSTACK_PUBLIC_KEY = os.getenv("PAYSTACK_PUBLIC_KEY")
 PAYSTACK_SECRET_KEY = os.getenv("PAYSTACK_SECRET_KEY")
-HUGGINGFACE_API_TOKEN =os.getenv("HUGGINGFACE_API_TOKEN")
\ No newline at end of file
+HUGGINGFACE_API_TOKEN =os.getenv("HUGGINGFACE_API_TOKEN")
+
+# Forward inventory kept in memory by reservations.availability
+AVAILABILITY_HORIZON_DAYS = 365
+AVAILABILITY_ENGINE_TTL = 300
+
+# Cached analytics snapshots (analytics.cache), expired by model signals or after this many seconds
+ANALYTICS_SNAPSHOT_TTL = 300
+
+# Paystack API (billing.paystack); point PAYSTACK_BASE_URL at run_paystack_standin to test locally
+PAYSTACK_BASE_URL = os.getenv('PAYSTACK_BASE_URL', 'https://api.paystack.co')
+PAYSTACK_TIMEOUT = 10
+PAYSTACK_RETRIES = 2
+PAYSTACK_RETRY_BACKOFF = 0.5
+PAYSTACK_MAX_CONNECTIONS = 20
+
+# Tax the night audit (billing.night_audit) adds to each in-house room night, as a fraction of the rate
+ROOM_TAX_RATE = os.getenv('ROOM_TAX_RATE', '0.075')
+
+# Where AIReport analytics data is kept: "shared" stores each distinct payload once
+# (zlib-compressed when AI_REPORT_COMPRESS), "inline" keeps it on the report row.
+# `manage.py prune_ai_reports` drops reports older than AI_REPORT_RETENTION_DAYS.
+AI_REPORT_STORAGE = os.getenv('AI_REPORT_STORAGE', 'shared')
+AI_REPORT_COMPRESS = True
+AI_REPORT_RETENTION_DAYS = 90
+
+# LLM calls from analytics.llm: response cache, circuit breaker and request timeout
+LLM_CACHE_TTL = 3600
+LLM_CACHE_MAX_ENTRIES = 128
+LLM_BREAKER_FAILURES = 3
+LLM_BREAKER_COOLDOWN = 60
+LLM_TIMEOUT = 30
+
+# AI backends for analytics.ai_backends; AI_BACKEND picks the one in use.
+# "local" talks to the stand-in server started with `manage.py run_ai_standin`.
+AI_BACKEND = os.getenv('AI_BACKEND', 'remote')
+AI_BACKENDS = {
+    'remote': {
+        'type': 'chat_completions',
+        'url': os.getenv('AI_REMOTE_URL', 'https://router.huggingface.co/v1/chat/completions'),
+        'model': os.getenv('AI_REMOTE_MODEL', 'meta-llama/Llama-3.2-3B-Instruct:novita'),
+        'api_key': HUGGINGFACE_API_TOKEN,
+    },
+    'local': {
+        'type': 'chat_completions',
+        'url': os.getenv('AI_LOCAL_URL', 'http://127.0.0.1:8765/v1/chat/completions'),
+        'model': 'hotel-pms-standin',
+        'label': 'Local stand-in model',
+    },
+    'rules': {
+        'type': 'rules',
+    },
+}
@@ -0,0 +1,273 @@
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from core.utils import hotel_today
+from rooms.models import Room
+from .models import InventoryVersion, RoomNight
+from .utils import UNSELLABLE_ROOM_STATUSES
+
+
+def inventory_version():
+    """The shared inventory version, so each process can tell when another one has sold or released nights behind its engine."""
+    version = InventoryVersion.objects.filter(pk=1).values_list('version', flat=True).first()
+    return 0 if version is None else version
+
+def bump_inventory_version():
+    """Count one committed inventory change and return the new version."""
+    with transaction.atomic():
+        if not InventoryVersion.objects.filter(pk=1).update(version=F('version') + 1):
+            try:
+                with transaction.atomic():
+                    InventoryVersion.objects.create(pk=1, version=1)
+            except IntegrityError:
+                # Another process created the row first
+                InventoryVersion.objects.filter(pk=1).update(version=F('version') + 1)
+        # The UPDATE holds the row until commit, so this reads our own bump
+        return InventoryVersion.objects.values_list('version', flat=True).get(pk=1)
+
+
+class AvailabilityEngine:
+    """
+    In-memory forward inventory: a rooms x nights boolean matrix where True
+    means the night is booked. Built from RoomNight on first use, patched
+    in place when reservations change and rebuilt when it goes stale or
+    another process changes the inventory. Patches that arrive while a
+    rebuild is reading RoomNight are replayed onto the new matrix.
+    Answers are a fast pre-filter; bookings re-check RoomNight inside
+    their transaction.
+    """
+
+    def __init__(self, horizon=365, ttl=300):
+        self.horizon = horizon
+        self.ttl = ttl
+        self.lock = threading.RLock()
+        self.rebuild_lock = threading.Lock()
+        # Patches received during a rebuild, None when no rebuild is running
+        self.pending = None
+        self.version = None
+        self.stale = True
+        self.built_at = 0
+        self.start = None
+        self.room_ids = []
+        self.room_index = {}
+        self.room_type_names = []
+        self.room_type_codes = np.zeros(0, dtype=np.intp)
+        self.sellable = np.zeros(0, dtype=bool)
+        self.booked = np.zeros((0, horizon), dtype=bool)
+
+    def rebuild(self):
+        with self.rebuild_lock:
+            with self.lock:
+                self.pending = []
+            try:
+                self._rebuild()
+            finally:
+                with self.lock:
+                    self.pending = None
+
+    def _rebuild(self):
+        # Read the version first: a change committed after it bumps past it
+        version = inventory_version()
+        start = hotel_today()
+        rooms = list(
+            Room.objects.order_by('floor', 'room_number')
+            .values_list('id', 'room_type__name', 'status')
+        )
+        type_names = sorted({room_type for _, room_type, _ in rooms})
+        type_index = {name: i for i, name in enumerate(type_names)}
+        room_index = {room_id: i for i, (room_id, _, _) in enumerate(rooms)}
+
+        booked = np.zeros((len(rooms), self.horizon), dtype=bool)
+        nights = RoomNight.objects.filter(
+            date__gte=start,
+            date__lt=start + timedelta(days=self.horizon)
+        ).values_list('room_id', 'date')
+        rows, cols = [], []
+        for room_id, night in nights.iterator(chunk_size=5000):
+            if room_id in room_index:
+                rows.append(room_index[room_id])
+                cols.append((night - start).days)
+        booked[rows, cols] = True
+
+        with self.lock:
+            self.start = start
+            self.room_ids = [room_id for room_id, _, _ in rooms]
+            self.room_index = room_index
+            self.room_type_names = type_names
+            self.room_type_codes = np.array([type_index[room_type] for _, room_type, _ in rooms], dtype=np.intp)
+            self.sellable = np.array([status not in UNSELLABLE_ROOM_STATUSES for _, _, status in rooms], dtype=bool)
+            self.booked = booked
+            self.built_at = time.monotonic()
+            self.version = version
+            self.stale = False
+            for patch in self.pending:
+                self._apply(*patch)
+
+    def ensure_fresh(self):
+        if (
+            self.stale
+            or self.start != hotel_today()
+            or time.monotonic() - self.built_at > self.ttl
+            or self.version != inventory_version()
+        ):
+            self.rebuild()
+
+    def invalidate(self):
+        self.stale = True
+
+    def _advance(self, version):
+        """Account for inventory change `version`; any gap means a change this engine never saw."""
+        if version is None or self.version is None or version <= self.version:
+            return
+        if version == self.version + 1:
+            self.version = version
+        else:
+            self.stale = True
+
+    def _apply(self, method, args, version):
+        method(*args)
+        self._advance(version)
+
+    def _patch(self, method, *args, version=None):
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append((method, args, version))
+            self._apply(method, args, version)
+
+    def _columns(self, check_in, check_out):
+        """Matrix columns for [check_in, check_out), or None when outside the horizon."""
+        first = (check_in - self.start).days
+        last = (check_out - self.start).days
+        if first < 0 or last > self.horizon or first >= last:
+            return None
+        return first, last
+
+    def _mark(self, room_id, check_in, check_out, value):
+        row = self.room_index.get(room_id)
+        if row is None or self.start is None:
+            self.stale = True
+            return
+        first = max((check_in - self.start).days, 0)
+        last = min((check_out - self.start).days, self.horizon)
+        if first < last:
+            self.booked[row, first:last] = value
+
+    def _set_sellable(self, room_id, sellable):
+        row = self.room_index.get(room_id)
+        if row is None:
+            self.stale = True
+        else:
+            self.sellable[row] = sellable
+
+    def book(self, room_id, check_in, check_out, version=None):
+        self._patch(self._mark, room_id, check_in, check_out, True, version=version)
+
+    def release(self, room_id, check_in, check_out, version=None):
+        self._patch(self._mark, room_id, check_in, check_out, False, version=version)
+
+    def set_sellable(self, room_id, sellable, version=None):
+        self._patch(self._set_sellable, room_id, sellable, version=version)
+
+    def free_mask(self, check_in, check_out):
+        """Boolean vector over rooms that are free every night of the stay."""
+        with self.lock:
+            columns = self._columns(check_in, check_out)
+            if columns is None:
+                return None
+            first, last = columns
+            return self.sellable & ~self.booked[:, first:last].any(axis=1)
+
+    def available_room_ids(self, check_in, check_out, room_type=None):
+        with self.lock:
+            mask = self.free_mask(check_in, check_out)
+            if mask is None:
+                return None
+            if room_type:
+                if room_type not in self.room_type_names:
+                    return []
+                mask = mask & (self.room_type_codes == self.room_type_names.index(room_type))
+            return [self.room_ids[i] for i in np.flatnonzero(mask)]
+
+    def is_free(self, room_id, check_in, check_out):
+        with self.lock:
+            row = self.room_index.get(room_id)
+            columns = self._columns(check_in, check_out)
+            if row is None or columns is None:
+                return None
+            first, last = columns
+            return bool(self.sellable[row] and not self.booked[row, first:last].any())
+
+    def count_free_by_room_type(self, check_in, check_out):
+        with self.lock:
+            mask = self.free_mask(check_in, check_out)
+            if mask is None:
+                return None
+            counts = np.bincount(self.room_type_codes[mask], minlength=len(self.room_type_names))
+            return dict(zip(self.room_type_names, counts.tolist()))
+
+    def _run_starts(self, nights, date_from, date_to):
+        """rooms x start-dates matrix of positions that begin `nights` free nights in a row."""
+        columns = self._columns(date_from, date_to)
+        if columns is None or nights < 1:
+            return None, None
+        first, last = columns
+        free = ~self.booked[:, first:last] & self.sellable[:, None]
+        if free.shape[1] < nights:
+            return np.zeros((free.shape[0], 0), dtype=bool), first
+        totals = np.zeros((free.shape[0], free.shape[1] + 1), dtype=np.int32)
+        np.cumsum(free, axis=1, out=totals[:, 1:])
+        return (totals[:, nights:] - totals[:, :-nights]) == nights, first
+
+    def first_free_date(self, nights, date_from=None, room_id=None, room_type=None):
+        """Earliest arrival date from which `nights` consecutive nights are free."""
+        with self.lock:
+            date_from = date_from or self.start
+            starts, offset = self._run_starts(nights, date_from, self.start + timedelta(days=self.horizon))
+            if starts is None:
+                return None
+            if room_id is not None:
+                if room_id not in self.room_index:
+                    return None
+                starts = starts[self.room_index[room_id]][None, :]
+            elif room_type:
+                if room_type not in self.room_type_names:
+                    return None
+                starts = starts[self.room_type_codes == self.room_type_names.index(room_type)]
+            candidates = starts.any(axis=0)
+            if not candidates.any():
+                return None
+            return self.start + timedelta(days=offset + int(candidates.argmax()))
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_availability_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AvailabilityEngine(
+                horizon=getattr(settings, 'AVAILABILITY_HORIZON_DAYS', 365),
+                ttl=getattr(settings, 'AVAILABILITY_ENGINE_TTL', 300),
+            )
+        _engine.ensure_fresh()
+    return _engine
+
+def invalidate_availability_engine():
+    if _engine is not None:
+        _engine.invalidate()
+
+def inventory_changed(action, *args):
+    """
+    Record a committed inventory change: bump the shared version so other
+    processes rebuild, and patch this process's engine with
+    `action(*args)` ('book', 'release' or 'set_sellable').
+    """
+    version = bump_inventory_version()
+    if _engine is not None:
+        getattr(_engine, action)(*args, version=version)
@@ -0,0 +1,255 @@
+from django.db import IntegrityError, transaction
+from analytics.cache import invalidate_snapshots
+from rooms.models import Room
+from .availability import bump_inventory_version, invalidate_availability_engine
+from .models import Reservation, RoomNight
+from .utils import (
+    HOLDING_STATUSES, UNSELLABLE_ROOM_STATUSES, hold_room_nights,
+    get_available_rooms, stay_dates, sync_availability_engine,
+)
+
+
+def find_conflicts(room, check_in, check_out, exclude=None):
+    conflicts = Reservation.objects.filter(
+        room=room,
+        status__in=HOLDING_STATUSES,
+        check_in_date__lt=check_out,
+        check_out_date__gt=check_in,
+    )
+    if exclude is not None:
+        conflicts = conflicts.exclude(pk=exclude.pk)
+    return [
+        {
+            'reservation_id': str(conflict['id']),
+            'guest': f"{conflict['guest__first_name']} {conflict['guest__last_name']}",
+            'check_in_date': conflict['check_in_date'],
+            'check_out_date': conflict['check_out_date'],
+            'status': conflict['status'],
+        }
+        for conflict in conflicts.order_by('check_in_date').values(
+            'id', 'guest__first_name', 'guest__last_name',
+            'check_in_date', 'check_out_date', 'status',
+        )
+    ]
+
+
+def booking_result(reservation=None, reason=None, message='', conflicts=None):
+    return {
+        'ok': reason is None,
+        'reservation': reservation,
+        'reason': reason,
+        'message': message,
+        'conflicts': conflicts or [],
+    }
+
+
+def book_reservation(reservation):
+    """
+    Save an unsaved Reservation and hold its room nights, refusing to
+    double-sell. The room row is locked with SELECT ... FOR UPDATE so
+    concurrent bookings for the same room queue up behind each other, and
+    the nights are re-checked against RoomNight under that lock rather
+    than trusting the in-memory engine, which may lag other processes.
+    The unique (room, date) inventory constraint (plus the exclusion
+    constraint on PostgreSQL) catches anything that slips past.
+    """
+    check_in = reservation.check_in_date
+    check_out = reservation.check_out_date
+
+    try:
+        with transaction.atomic():
+            room = Room.objects.select_for_update().get(pk=reservation.room_id)
+            if room.status in UNSELLABLE_ROOM_STATUSES:
+                return booking_result(
+                    reason='unavailable',
+                    message=f'Room {room.room_number} is {room.get_status_display().lower()} and cannot be booked.',
+                )
+            held = RoomNight.objects.filter(room=room, date__gte=check_in, date__lt=check_out).exists()
+            conflicts = find_conflicts(room, check_in, check_out)
+            if held or conflicts:
+                invalidate_availability_engine()
+                return booking_result(
+                    reason='conflict',
+                    message=f'Room {room.room_number} is already booked for some of the selected nights.',
+                    conflicts=conflicts,
+                )
+            reservation.save()
+            hold_room_nights(reservation)
+            Room.objects.filter(pk=room.pk, status='available').update(status='reserved')
+    except IntegrityError:
+        invalidate_availability_engine()
+        room = Room.objects.get(pk=reservation.room_id)
+        return booking_result(
+            reason='conflict',
+            message=f'Room {room.room_number} was just booked for some of the selected nights.',
+            conflicts=find_conflicts(room, check_in, check_out),
+        )
+
+    return booking_result(reservation=reservation)
+
+
+def book_group(group, room_requests, guests_per_room=1, created_by=None):
+    """
+    Allocate a block of rooms for a GroupBooking in one transaction.
+    `room_requests` maps room type names to how many rooms of that type are
+    needed. Rooms are picked floor by floor from the free inventory, locked,
+    and written with a handful of bulk statements however large the block.
+    Nothing is saved unless every requested room can be allocated.
+    """
+    check_in = group.check_in_date
+    check_out = group.check_out_date
+    nights = stay_dates(check_in, check_out)
+
+    try:
+        with transaction.atomic():
+            rooms = []
+            shortfall = {}
+            for room_type, count in room_requests.items():
+                if count <= 0:
+                    continue
+                candidates = list(
+                    get_available_rooms(check_in, check_out, room_type=room_type)
+                    .select_for_update(of=('self',))
+                    .order_by('floor', 'room_number')[:count]
+                )
+                if len(candidates) < count:
+                    shortfall[room_type] = count - len(candidates)
+                rooms.extend(candidates)
+
+            if shortfall:
+                missing = ', '.join(f'{count} {room_type}' for room_type, count in shortfall.items())
+                return {
+                    'ok': False,
+                    'group': group,
+                    'reservations': [],
+                    'reason': 'shortfall',
+                    'message': f'Not enough free rooms for these dates: short by {missing}.',
+                    'shortfall': shortfall,
+                }
+
+            group.created_by = created_by
+            group.save()
+            reservations = Reservation.objects.bulk_create([
+                Reservation(
+                    guest=group.contact_guest,
+                    room=room,
+                    group=group,
+                    check_in_date=check_in,
+                    check_out_date=check_out,
+                    number_of_guests=guests_per_room,
+                    total_price=room.price_per_night * len(nights),
+                    created_by=created_by,
+                )
+                for room in rooms
+            ])
+            RoomNight.objects.bulk_create([
+                RoomNight(room_id=reservation.room_id, reservation=reservation, date=night)
+                for reservation in reservations
+                for night in nights
+            ], batch_size=1000)
+            Room.objects.filter(
+                id__in=[room.id for room in rooms],
+                status='available'
+            ).update(status='reserved')
+            for room in rooms:
+                sync_availability_engine('book', room.id, check_in, check_out)
+    except IntegrityError:
+        invalidate_availability_engine()
+        return {
+            'ok': False,
+            'group': group,
+            'reservations': [],
+            'reason': 'conflict',
+            'message': 'Some of the selected rooms were booked while the block was being allocated. Please try again.',
+            'shortfall': {},
+        }
+
+    return {
+        'ok': True,
+        'group': group,
+        'reservations': reservations,
+        'reason': None,
+        'message': f'{len(reservations)} rooms booked for {group.name}.',
+        'shortfall': {},
+    }
+
+
+def find_overlaps():
+    """
+    (kept, overlapping) pairs of holding reservations that share a room on
+    some night, as value dicts. Per room the earlier arrival keeps it,
+    unless the later one is the guest already checked in.
+    """
+    stays = (
+        Reservation.objects.filter(status__in=HOLDING_STATUSES)
+        .order_by('room_id', 'check_in_date', 'created_at')
+        .values('id', 'room_id', 'status', 'check_in_date', 'check_out_date')
+    )
+    overlaps = []
+    holder = None
+    for stay in stays.iterator():
+        if holder is None or holder['room_id'] != stay['room_id'] or stay['check_in_date'] >= holder['check_out_date']:
+            holder = stay
+            continue
+        if stay['status'] == 'checked_in' and holder['status'] != 'checked_in':
+            holder, stay = stay, holder
+        overlaps.append((holder, stay))
+    return overlaps
+
+
+def reassign_overlaps(dry_run=False):
+    """
+    Move each overlapping confirmed reservation to a free room of the same
+    type and rebuild both stays' room nights, all in one transaction
+    (rolled back with dry_run). Returns (moved, unresolved): moved as
+    (overlapping, kept, room number) and unresolved as (kept, overlapping),
+    both with the value dicts of find_overlaps. Only the columns involved
+    are read and written, so this also runs on a database still waiting
+    for later reservation migrations.
+    """
+    moved, unresolved = [], []
+    with transaction.atomic():
+        for kept, overlapping in find_overlaps():
+            check_in, check_out = overlapping['check_in_date'], overlapping['check_out_date']
+            room = None
+            if overlapping['status'] == 'confirmed':
+                room_type_id = Room.objects.filter(pk=overlapping['room_id']).values_list('room_type_id', flat=True).first()
+                room = (
+                    Room.objects.filter(room_type_id=room_type_id)
+                    .exclude(status__in=UNSELLABLE_ROOM_STATUSES)
+                    .exclude(id__in=RoomNight.objects.filter(date__gte=check_in, date__lt=check_out).values('room_id'))
+                    .exclude(id__in=Reservation.objects.filter(
+                        status__in=HOLDING_STATUSES, check_in_date__lt=check_out, check_out_date__gt=check_in,
+                    ).values('room_id'))
+                    .order_by('floor', 'room_number')
+                    .values('id', 'room_number')
+                    .first()
+                )
+            if room is None:
+                unresolved.append((kept, overlapping))
+                continue
+
+            RoomNight.objects.filter(reservation_id=overlapping['id']).delete()
+            Reservation.objects.filter(pk=overlapping['id']).update(room_id=room['id'])
+            RoomNight.objects.bulk_create([
+                RoomNight(reservation_id=overlapping['id'], room_id=room['id'], date=night)
+                for night in stay_dates(check_in, check_out)
+            ])
+            # Give the kept stay back any nights the overlapping one had claimed
+            RoomNight.objects.bulk_create([
+                RoomNight(reservation_id=kept['id'], room_id=kept['room_id'], date=night)
+                for night in stay_dates(kept['check_in_date'], kept['check_out_date'])
+            ], ignore_conflicts=True)
+            Room.objects.filter(pk=room['id'], status='available').update(status='reserved')
+            moved.append((overlapping, kept, room['room_number']))
+
+        if dry_run:
+            transaction.set_rollback(True)
+        elif moved:
+            # The moves are bulk UPDATEs, so tell the engines and analytics snapshots by hand
+            def expire():
+                bump_inventory_version()
+                invalidate_availability_engine()
+                invalidate_snapshots('reservations.Reservation')
+            transaction.on_commit(expire)
+    return moved, unresolved
@@ -1,16 +1,17 @@
 # reservations/forms.py
 from django import forms
 from django.utils import timezone
-from .models import Reservation, ReservationAddon
+from .models import Reservation, ReservationAddon, GroupBooking
 from guests.models import Guest
-from rooms.models import Room
+from rooms.models import Room, RoomType
+from .utils import UNSELLABLE_ROOM_STATUSES, is_room_available
 class ReservationForm(forms.ModelForm):
     guest = forms.ModelChoiceField(
         queryset=Guest.objects.all(),
         widget=forms.Select(attrs={'class': 'form-input'})
     )
     room = forms.ModelChoiceField(
-        queryset=Room.objects.filter(status='available'),
+        queryset=Room.objects.exclude(status__in=UNSELLABLE_ROOM_STATUSES),
         widget=forms.Select(attrs={'class': 'form-input'})
     )
     
@@ -35,9 +36,68 @@ class ReservationForm(forms.ModelForm):
                 raise forms.ValidationError("Check-out date must be after check-in date.")
             if check_in < timezone.now().date():
                 raise forms.ValidationError("Check-in date cannot be in the past.")
+            room = cleaned_data.get('room')
+            if room and not is_room_available(room, check_in, check_out):
+                raise forms.ValidationError(f"Room {room.room_number} is already booked for some of the selected nights.")
         
         return cleaned_data
 
+class GroupBookingForm(forms.ModelForm):
+    contact_guest = forms.ModelChoiceField(
+        queryset=Guest.objects.all(),
+        widget=forms.Select(attrs={'class': 'form-input'})
+    )
+    guests_per_room = forms.IntegerField(
+        min_value=1,
+        initial=1,
+        widget=forms.NumberInput(attrs={'class': 'form-input', 'min': '1'})
+    )
+
+    class Meta:
+        model = GroupBooking
+        fields = ['name', 'contact_guest', 'check_in_date', 'check_out_date', 'notes']
+        widgets = {
+            'name': forms.TextInput(attrs={'class': 'form-input', 'placeholder': 'Group or event name'}),
+            'check_in_date': forms.DateInput(attrs={'type': 'date', 'class': 'form-input'}),
+            'check_out_date': forms.DateInput(attrs={'type': 'date', 'class': 'form-input'}),
+            'notes': forms.Textarea(attrs={'class': 'form-input', 'rows': 3, 'placeholder': 'Rooming list, billing instructions...'}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name, label in RoomType.NAME_CHOICES:
+            self.fields[f'{name}_rooms'] = forms.IntegerField(
+                label=f'{label} Rooms',
+                min_value=0,
+                initial=0,
+                required=False,
+                widget=forms.NumberInput(attrs={'class': 'form-input', 'min': '0'})
+            )
+
+    def room_count_fields(self):
+        return [self[f'{name}_rooms'] for name, _ in RoomType.NAME_CHOICES]
+
+    def room_requests(self):
+        return {
+            name: self.cleaned_data.get(f'{name}_rooms') or 0
+            for name, _ in RoomType.NAME_CHOICES
+        }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        check_in = cleaned_data.get('check_in_date')
+        check_out = cleaned_data.get('check_out_date')
+
+        if check_in and check_out:
+            if check_in >= check_out:
+                raise forms.ValidationError("Check-out date must be after check-in date.")
+            if check_in < timezone.now().date():
+                raise forms.ValidationError("Check-in date cannot be in the past.")
+        if not any(self.room_requests().values()):
+            raise forms.ValidationError("Request at least one room for the group.")
+
+        return cleaned_data
+
 class CheckInForm(forms.Form):
     PAYMENT_METHOD_CHOICES = [
         ('cash', 'Cash'),
@@ -0,0 +1,116 @@
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.utils import timezone
+from guests.models import Guest
+from rooms.models import Room, RoomType
+from reservations.booking import book_reservation
+from reservations.models import Reservation, RoomNight
+
+
+class Command(BaseCommand):
+    help = 'Fire concurrent bookings at a shared set of rooms and report success rate and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=500, help='Number of booking attempts')
+        parser.add_argument('--threads', type=int, default=16, help='Number of concurrent clerks')
+        parser.add_argument('--rooms', type=int, default=10, help='Size of the contested room set')
+        parser.add_argument('--days', type=int, default=60, help='Window of arrival dates to pick from')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark rooms and reservations')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        room_type, rooms, guest = self.seed(options['rooms'])
+        room_ids = [room.id for room in rooms]
+        try:
+            self.benchmark(today, guest, room_ids, options)
+        finally:
+            if not options['keep']:
+                self.cleanup(room_type, room_ids, guest)
+
+    def seed(self, count):
+        # A per-run prefix keeps the unique room numbers clear of rooms a crashed run left behind
+        run = uuid.uuid4().hex[:8]
+        room_type = RoomType.objects.create(name='single', base_price=100, max_occupancy=2, description='Booking benchmark')
+        rooms = Room.objects.bulk_create([
+            Room(room_number=f'BENCH-{run}-{i:03d}', floor=0, room_type=room_type, price_per_night=100)
+            for i in range(count)
+        ])
+        guest = Guest.objects.create(first_name='Benchmark', last_name='Guest', email='benchmark@example.com', phone='0')
+        return room_type, rooms, guest
+
+    def cleanup(self, room_type, room_ids, guest):
+        RoomNight.objects.filter(room_id__in=room_ids).delete()
+        Reservation.objects.filter(room_id__in=room_ids).delete()
+        Room.objects.filter(id__in=room_ids).delete()
+        guest.delete()
+        room_type.delete()
+
+    def benchmark(self, today, guest, room_ids, options):
+        def attempt(_):
+            check_in = today + timedelta(days=random.randrange(options['days']))
+            reservation = Reservation(
+                guest=guest,
+                room_id=random.choice(room_ids),
+                check_in_date=check_in,
+                check_out_date=check_in + timedelta(days=random.randint(1, 4)),
+                number_of_guests=1,
+                total_price=100,
+            )
+            started = time.perf_counter()
+            try:
+                outcome = 'booked' if book_reservation(reservation)['ok'] else 'conflict'
+            except Exception as e:
+                outcome = f'error: {e.__class__.__name__}'
+            finally:
+                connection.close()
+            return outcome, time.perf_counter() - started
+
+        self.stdout.write(
+            f"Booking {options['bookings']} stays across {options['rooms']} rooms with {options['threads']} threads..."
+        )
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            results = list(pool.map(attempt, range(options['bookings'])))
+        elapsed = time.perf_counter() - started
+        connections.close_all()
+
+        latencies = sorted(latency for _, latency in results)
+        outcomes = {}
+        for outcome, _ in results:
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        booked = outcomes.get('booked', 0)
+        errors = sum(count for outcome, count in outcomes.items() if outcome.startswith('error'))
+
+        double_sold = 0
+        for room_id in room_ids:
+            stays = list(
+                Reservation.objects.filter(room_id=room_id, status__in=['confirmed', 'checked_in'])
+                .order_by('check_in_date').values_list('check_in_date', 'check_out_date')
+            )
+            double_sold += sum(1 for previous, current in zip(stays, stays[1:]) if current[0] < previous[1])
+
+        self.stdout.write(
+            f'Attempts: {len(results)}\n'
+            f'Booked: {booked}\n'
+            f"Conflicts refused: {outcomes.get('conflict', 0)}\n"
+            f'Errors: {errors}\n'
+            f'Success rate (completed without error): {(len(results) - errors) / len(results) * 100:.1f}%\n'
+            f'Booking rate: {booked / len(results) * 100:.1f}%\n'
+            f'Throughput: {len(results) / elapsed:.1f} bookings/s\n'
+            f'Latency p50: {latencies[len(latencies) // 2] * 1000:.1f} ms\n'
+            f'Latency p95: {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms'
+        )
+        for outcome, count in outcomes.items():
+            if outcome.startswith('error'):
+                self.stdout.write(self.style.WARNING(f'{outcome}: {count}'))
+
+        if double_sold:
+            self.stdout.write(self.style.ERROR(f'Double-sold stays: {double_sold}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('No room was double-sold'))
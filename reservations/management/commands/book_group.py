@@ -0,0 +1,67 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from guests.models import Guest
+from reservations.booking import book_group
+from reservations.models import GroupBooking
+from reservations.utils import group_confirmation_message, send_notification
+
+
+class Command(BaseCommand):
+    help = 'Book a block of rooms for a group in a single transaction'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--name', required=True, help='Group or event name')
+        parser.add_argument('--guest-email', required=True, help='Email of the group contact guest')
+        parser.add_argument('--check-in', required=True, help='Arrival date (YYYY-MM-DD format)')
+        parser.add_argument('--check-out', required=True, help='Departure date (YYYY-MM-DD format)')
+        parser.add_argument(
+            '--rooms',
+            action='append',
+            required=True,
+            help='Rooms per type as TYPE=COUNT, e.g. --rooms single=40 --rooms double=60',
+        )
+        parser.add_argument('--guests-per-room', type=int, default=1)
+        parser.add_argument('--no-email', action='store_true', help='Skip the confirmation email')
+
+    def handle(self, *args, **options):
+        try:
+            check_in = datetime.strptime(options['check_in'], '%Y-%m-%d').date()
+            check_out = datetime.strptime(options['check_out'], '%Y-%m-%d').date()
+            room_requests = {}
+            for item in options['rooms']:
+                room_type, count = item.split('=')
+                room_requests[room_type] = room_requests.get(room_type, 0) + int(count)
+        except ValueError:
+            raise CommandError('Dates must be YYYY-MM-DD and rooms must be TYPE=COUNT.')
+        if check_in >= check_out:
+            raise CommandError('Check-out date must be after check-in date.')
+
+        guest = Guest.objects.filter(email=options['guest_email']).first()
+        if guest is None:
+            raise CommandError(f"No guest with email {options['guest_email']}.")
+
+        group = GroupBooking(
+            name=options['name'],
+            contact_guest=guest,
+            check_in_date=check_in,
+            check_out_date=check_out,
+        )
+        started = time.perf_counter()
+        result = book_group(group, room_requests, guests_per_room=options['guests_per_room'])
+        elapsed = time.perf_counter() - started
+
+        if not result['ok']:
+            raise CommandError(result['message'])
+
+        if not options['no_email']:
+            try:
+                subject, message = group_confirmation_message(group, result['reservations'])
+                send_notification(subject, message, receiver=guest.email)
+            except Exception:
+                self.stdout.write(self.style.WARNING('Could not send the confirmation email'))
+
+        self.stdout.write(
+            self.style.SUCCESS(f"{result['message']} ({elapsed * 1000:.0f} ms)")
+        )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from reservations.booking import reassign_overlaps
+
+
+class Command(BaseCommand):
+    help = 'Move confirmed reservations that share a room on some night to a free room of the same type'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Show the moves without saving them')
+
+    def handle(self, *args, **options):
+        moved, unresolved = reassign_overlaps(dry_run=options['dry_run'])
+        verb = 'Would move' if options['dry_run'] else 'Moved'
+        for overlapping, kept, room_number in moved:
+            self.stdout.write(
+                f"{verb} reservation {overlapping['id']} ({overlapping['check_in_date']} - {overlapping['check_out_date']}) "
+                f"to room {room_number}; it overlapped {kept['id']}"
+            )
+        for kept, overlapping in unresolved:
+            self.stdout.write(self.style.WARNING(
+                f"No free room for {overlapping['id']} ({overlapping['status']}, "
+                f"{overlapping['check_in_date']} - {overlapping['check_out_date']}), "
+                f"which overlaps {kept['id']} ({kept['status']}, {kept['check_in_date']} - {kept['check_out_date']}); "
+                'move or cancel one of them by hand'
+            ))
+
+        if unresolved:
+            self.stdout.write(self.style.WARNING(f'{len(moved)} moved, {len(unresolved)} left to resolve by hand'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{len(moved)} moved, no overlapping reservations left'))
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.db import migrations
+
+
+def populate_room_nights(apps, schema_editor):
+    Reservation = apps.get_model('reservations', 'Reservation')
+    RoomNight = apps.get_model('reservations', 'RoomNight')
+
+    nights = []
+    reservations = Reservation.objects.filter(
+        status__in=['confirmed', 'checked_in']
+    ).values_list('id', 'room_id', 'check_in_date', 'check_out_date')
+    for reservation_id, room_id, check_in, check_out in reservations.iterator():
+        for i in range((check_out - check_in).days):
+            nights.append(RoomNight(
+                reservation_id=reservation_id,
+                room_id=room_id,
+                date=check_in + timedelta(days=i),
+            ))
+    # Overlapping legacy bookings keep whichever reservation claimed the night first.
+    RoomNight.objects.bulk_create(nights, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0002_roomnight'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_room_nights, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guests', '0001_initial'),
+        ('reservations', '0003_populate_roomnight'),
+        ('rooms', '0002_alter_room_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['room', 'check_in_date', 'check_out_date'], name='reservation_room_id_fcd2bc_idx'),
+        ),
+    ]
@@ -0,0 +1,82 @@
+from django.db import migrations
+
+HOLDING_STATUSES = ['confirmed', 'checked_in']
+
+
+def find_overlaps(Reservation):
+    """
+    (kept, overlapping) pairs of holding reservations that share a room on
+    some night. Per room the earlier arrival keeps it, unless the later one
+    is the guest already checked in.
+    """
+    stays = (
+        Reservation.objects.filter(status__in=HOLDING_STATUSES)
+        .order_by('room_id', 'check_in_date', 'created_at')
+        .values('id', 'room_id', 'status', 'check_in_date', 'check_out_date')
+    )
+    overlaps = []
+    holder = None
+    for stay in stays.iterator():
+        if holder is None or holder['room_id'] != stay['room_id'] or stay['check_in_date'] >= holder['check_out_date']:
+            holder = stay
+            continue
+        if stay['status'] == 'checked_in' and holder['status'] != 'checked_in':
+            holder, stay = stay, holder
+        overlaps.append((holder, stay))
+    return overlaps
+
+
+def check_overlaps(apps, schema_editor):
+    """
+    Legacy data can hold the same room twice for a night (0003 kept the
+    first claimant's RoomNight and skipped the rest). Which guest moves is
+    a front-desk decision, so stop here and list the pairs instead of
+    reassigning anyone.
+    """
+    Reservation = apps.get_model('reservations', 'Reservation')
+    overlaps = find_overlaps(Reservation)
+    if not overlaps:
+        return
+    report = '\n'.join(
+        f"  {overlapping['id']} ({overlapping['status']}, {overlapping['check_in_date']} - {overlapping['check_out_date']}) "
+        f"overlaps {kept['id']} ({kept['status']}, {kept['check_in_date']} - {kept['check_out_date']})"
+        for kept, overlapping in overlaps
+    )
+    raise RuntimeError(
+        'These reservations hold the same room on the same nights. Run '
+        '`python manage.py resolve_overlapping_reservations` to move the confirmed ones to free rooms '
+        f'of the same type, or move or cancel one of each pair by hand, then run migrate again:\n{report}'
+    )
+
+
+def add_exclusion_constraint(apps, schema_editor):
+    # PostgreSQL can refuse overlapping stays itself; other backends rely on
+    # the unique (room, date) constraint on RoomNight.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    schema_editor.execute(
+        "ALTER TABLE reservations_reservation ADD CONSTRAINT reservation_no_overlap "
+        "EXCLUDE USING gist (room_id WITH =, daterange(check_in_date, check_out_date) WITH &&) "
+        "WHERE (status IN ('confirmed', 'checked_in'))"
+    )
+
+
+def drop_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'ALTER TABLE reservations_reservation DROP CONSTRAINT IF EXISTS reservation_no_overlap'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0004_reservation_conflict_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_overlaps, migrations.RunPython.noop),
+        migrations.RunPython(add_exclusion_constraint, drop_exclusion_constraint),
+    ]
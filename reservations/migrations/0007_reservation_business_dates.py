@@ -0,0 +1,55 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:47
+
+import core.utils
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('guests', '0002_guest_business_date'),
+        ('reservations', '0006_groupbooking'),
+        ('rooms', '0002_alter_room_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservation',
+            name='business_date',
+            field=models.DateField(default=core.utils.hotel_today),
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='cancelled_on',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='checked_in_on',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='checked_out_on',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['business_date'], name='reservation_busines_dab964_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['checked_in_on'], name='reservation_checked_db9d72_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['checked_out_on'], name='reservation_checked_66daa3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['cancelled_on'], name='reservation_cancell_4450d9_idx'),
+        ),
+    ]
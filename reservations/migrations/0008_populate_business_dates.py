@@ -0,0 +1,42 @@
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db import migrations
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def hotel_timezone(apps):
+    Hotel = apps.get_model('core', 'Hotel')
+    name = Hotel.objects.values_list('timezone', flat=True).first()
+    try:
+        return ZoneInfo(name) if name else timezone.get_default_timezone()
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.get_default_timezone()
+
+
+def populate_business_dates(apps, schema_editor):
+    tz = hotel_timezone(apps)
+    Reservation = apps.get_model('reservations', 'Reservation')
+    Reservation.objects.update(business_date=TruncDate('created_at', tzinfo=tz))
+    Reservation.objects.filter(checked_in_at__isnull=False).update(
+        checked_in_on=TruncDate('checked_in_at', tzinfo=tz)
+    )
+    Reservation.objects.filter(checked_out_at__isnull=False).update(
+        checked_out_on=TruncDate('checked_out_at', tzinfo=tz)
+    )
+    # updated_at is the best record of when a legacy cancellation happened
+    Reservation.objects.filter(status='cancelled').update(
+        cancelled_on=TruncDate('updated_at', tzinfo=tz)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('reservations', '0007_reservation_business_dates'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_business_dates, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,24 @@
 from django.db import models
 from django.utils import timezone
+from core.utils import business_date, hotel_today
 import uuid
 
+class GroupBooking(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=255)
+    contact_guest = models.ForeignKey('guests.Guest', on_delete=models.PROTECT, related_name='group_bookings')
+    check_in_date = models.DateField()
+    check_out_date = models.DateField()
+    notes = models.TextField(blank=True)
+    created_by = models.ForeignKey('core.CustomUser', on_delete=models.SET_NULL, null=True, related_name='group_bookings_created')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.name} ({self.check_in_date} - {self.check_out_date})"
+
 class Reservation(models.Model):
     STATUS_CHOICES = [
         ('confirmed', 'Confirmed'),
@@ -14,6 +31,7 @@ class Reservation(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     guest = models.ForeignKey('guests.Guest', on_delete=models.PROTECT, related_name='reservations')
     room = models.ForeignKey('rooms.Room', on_delete=models.PROTECT, related_name='reservations')
+    group = models.ForeignKey(GroupBooking, on_delete=models.SET_NULL, null=True, blank=True, related_name='reservations')
     check_in_date = models.DateField()
     check_out_date = models.DateField()
     number_of_guests = models.IntegerField()
@@ -26,17 +44,37 @@ class Reservation(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     checked_in_at = models.DateTimeField(null=True, blank=True)
     checked_out_at = models.DateTimeField(null=True, blank=True)
+    # Hotel-local dates of booking, check-in, check-out and cancellation,
+    # stored so date filters can use an index
+    business_date = models.DateField(default=hotel_today)
+    checked_in_on = models.DateField(null=True, blank=True)
+    checked_out_on = models.DateField(null=True, blank=True)
+    cancelled_on = models.DateField(null=True, blank=True)
     
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['check_in_date', 'check_out_date']),
             models.Index(fields=['status']),
+            models.Index(fields=['room', 'check_in_date', 'check_out_date']),
+            models.Index(fields=['business_date']),
+            models.Index(fields=['checked_in_on']),
+            models.Index(fields=['checked_out_on']),
+            models.Index(fields=['cancelled_on']),
         ]
     
     def __str__(self):
         return f"{self.guest.first_name} - Room {self.room.room_number} ({self.check_in_date})"
     
+    def save(self, *args, **kwargs):
+        if self.checked_in_at and self.checked_in_on is None:
+            self.checked_in_on = business_date(self.checked_in_at)
+        if self.checked_out_at and self.checked_out_on is None:
+            self.checked_out_on = business_date(self.checked_out_at)
+        if self.status == 'cancelled' and self.cancelled_on is None:
+            self.cancelled_on = hotel_today()
+        super().save(*args, **kwargs)
+    
     def is_active(self):
         today = timezone.now().date()
         return self.check_in_date <= today <= self.check_out_date
@@ -48,4 +86,32 @@ class ReservationAddon(models.Model):
     quantity = models.IntegerField(default=1)
     
     def __str__(self):
-        return f"{self.name} x{self.quantity} for {self.reservation.guest.first_name} {self.reservation.guest.last_name}"
\ No newline at end of file
+        return f"{self.name} x{self.quantity} for {self.reservation.guest.first_name} {self.reservation.guest.last_name}"
+
+class RoomNight(models.Model):
+    room = models.ForeignKey('rooms.Room', on_delete=models.CASCADE, related_name='room_nights')
+    reservation = models.ForeignKey(Reservation, on_delete=models.CASCADE, related_name='room_nights')
+    date = models.DateField()
+
+    class Meta:
+        ordering = ['room', 'date']
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'date'], name='unique_room_night'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'room']),
+        ]
+
+    def __str__(self):
+        return f"Room {self.room.room_number} - {self.date}"
+
+class InventoryVersion(models.Model):
+    """
+    Single-row counter bumped on every committed inventory change. It lives
+    in the database rather than the cache so every worker process sees the
+    same value, whatever cache backend is configured.
+    """
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Inventory version {self.version}"
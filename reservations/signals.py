@@ -0,0 +1,22 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rooms.models import Room
+from . import availability
+from .utils import UNSELLABLE_ROOM_STATUSES
+
+
+@receiver(post_save, sender=Room)
+def sync_room_availability(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: availability.bump_inventory_version())
+        availability.invalidate_availability_engine()
+    else:
+        sellable = instance.status not in UNSELLABLE_ROOM_STATUSES
+        transaction.on_commit(lambda: availability.inventory_changed('set_sellable', instance.id, sellable))
+
+
+@receiver(post_delete, sender=Room)
+def drop_room_availability(sender, instance, **kwargs):
+    transaction.on_commit(lambda: availability.bump_inventory_version())
+    availability.invalidate_availability_engine()
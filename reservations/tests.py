@@ -1,3 +1,330 @@
-from django.test import TestCase
+import importlib
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from core.models import CustomUser
+from guests.models import Guest
+from rooms.models import Room, RoomType
+from . import availability
+from .availability import AvailabilityEngine, bump_inventory_version, get_availability_engine
+from .booking import book_group, book_reservation, find_overlaps, reassign_overlaps
+from .models import GroupBooking, InventoryVersion, Reservation, RoomNight
+from .utils import build_tape_chart, get_available_rooms, release_room_nights, stay_dates
+
+no_overlap_migration = importlib.import_module('reservations.migrations.0005_reservation_no_overlap')
+
+
+def make_rooms(count, room_type='single', floor=1, price=100):
+    room_type, _ = RoomType.objects.get_or_create(name=room_type, defaults={'base_price': price, 'max_occupancy': 2})
+    return [
+        Room.objects.create(room_number=f'{floor}{i:02d}', floor=floor, room_type=room_type, price_per_night=price)
+        for i in range(1, count + 1)
+    ]
+
+def make_guest(name='Ada'):
+    return Guest.objects.create(first_name=name, last_name='Obi', email=f'{name.lower()}@example.com', phone='1')
+
+def new_reservation(guest, room, check_in, nights=2, **fields):
+    return Reservation(
+        guest=guest, room=room, check_in_date=check_in, check_out_date=check_in + timedelta(days=nights),
+        number_of_guests=1, total_price=room.price_per_night * nights, **fields,
+    )
+
+
+class RoomNightTests(TestCase):
+    def setUp(self):
+        self.room, self.other = make_rooms(2)
+        self.guest = make_guest()
+        self.check_in = timezone.localdate() + timedelta(days=2)
+
+    def test_booking_holds_one_night_per_night_of_the_stay(self):
+        result = book_reservation(new_reservation(self.guest, self.room, self.check_in, nights=3))
+        self.assertTrue(result['ok'])
+        self.assertEqual(
+            list(RoomNight.objects.filter(reservation=result['reservation']).values_list('date', flat=True)),
+            stay_dates(self.check_in, self.check_in + timedelta(days=3)),
+        )
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.status, 'reserved')
+
+        overlapping = get_available_rooms(self.check_in + timedelta(days=2), self.check_in + timedelta(days=4))
+        self.assertEqual(list(overlapping), [self.other])
+        # Checkout morning is free for the next arrival
+        back_to_back = get_available_rooms(self.check_in + timedelta(days=3), self.check_in + timedelta(days=5))
+        self.assertIn(self.room, back_to_back)
+
+    def test_release_from_a_date_keeps_the_nights_already_stayed(self):
+        reservation = book_reservation(new_reservation(self.guest, self.room, self.check_in, nights=3))['reservation']
+        self.assertEqual(release_room_nights(reservation, from_date=self.check_in + timedelta(days=1)), 2)
+        self.assertEqual(list(reservation.room_nights.values_list('date', flat=True)), [self.check_in])
+
+    def test_cancelling_gives_the_nights_back(self):
+        reservation = book_reservation(new_reservation(self.guest, self.room, self.check_in))['reservation']
+        user = CustomUser.objects.create_user(username='desk', password='pw', role='receptionist')
+        self.client.force_login(user)
+
+        self.client.post(reverse('cancel_reservation', args=[reservation.pk]))
+
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.status, 'cancelled')
+        self.assertFalse(RoomNight.objects.exists())
+        self.assertTrue(book_reservation(new_reservation(make_guest('Tunde'), self.room, self.check_in))['ok'])
+
+
+class GroupBookingTests(TestCase):
+    def setUp(self):
+        self.upper = make_rooms(3, floor=2)
+        self.lower = make_rooms(3, floor=1)
+        self.doubles = make_rooms(2, room_type='double', floor=3, price=150)
+        self.guest = make_guest()
+        self.check_in = timezone.localdate() + timedelta(days=7)
+
+    def group(self, nights=2):
+        return GroupBooking(
+            name='Conference', contact_guest=self.guest,
+            check_in_date=self.check_in, check_out_date=self.check_in + timedelta(days=nights),
+        )
+
+    def test_block_is_allocated_floor_by_floor_around_existing_bookings(self):
+        book_reservation(new_reservation(make_guest('Tunde'), self.lower[0], self.check_in))
+        result = book_group(self.group(), {'single': 3, 'double': 1}, guests_per_room=2)
+
+        self.assertTrue(result['ok'])
+        rooms = sorted(reservation.room.room_number for reservation in result['reservations'])
+        self.assertEqual(rooms, ['102', '103', '201', '301'])
+        self.assertEqual(Reservation.objects.filter(group=result['group']).count(), 4)
+        self.assertEqual(RoomNight.objects.filter(reservation__group=result['group']).count(), 8)
+        self.assertEqual(Room.objects.filter(status='reserved').count(), 5)
+        double = next(r for r in result['reservations'] if r.room.room_type.name == 'double')
+        self.assertEqual((double.total_price, double.number_of_guests), (300, 2))
+
+    def test_shortfall_saves_nothing(self):
+        result = book_group(self.group(), {'single': 2, 'double': 3})
+        self.assertFalse(result['ok'])
+        self.assertEqual(result['shortfall'], {'double': 1})
+        self.assertFalse(GroupBooking.objects.exists())
+        self.assertFalse(Reservation.objects.exists())
+        self.assertFalse(RoomNight.objects.exists())
+
+    def test_query_count_does_not_grow_with_the_block(self):
+        with CaptureQueriesContext(connection) as small:
+            book_group(self.group(), {'single': 1})
+        self.check_in += timedelta(days=10)
+        with CaptureQueriesContext(connection) as large:
+            book_group(self.group(), {'single': 6, 'double': 2})
+        # Only the second room type adds a query (its free-room lookup)
+        self.assertEqual(len(large), len(small) + 1)
+
+    def test_list_filters_by_group_and_ignores_bad_group_ids(self):
+        group = book_group(self.group(), {'single': 2})['group']
+        book_reservation(new_reservation(make_guest('Tunde'), self.doubles[0], self.check_in))
+        self.client.force_login(CustomUser.objects.create_user(username='desk', password='pw', role='receptionist'))
+
+        response = self.client.get(reverse('reservation_list'), {'group': str(group.id)})
+        self.assertEqual(len(response.context['reservations']), 2)
+        response = self.client.get(reverse('reservation_list'), {'group': 'not-a-uuid'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((len(response.context['reservations']), response.context['group_filter']), (3, ''))
+
+
+class TapeChartTests(TestCase):
+    def setUp(self):
+        self.rooms = make_rooms(2, floor=1) + make_rooms(1, floor=2) + make_rooms(1, floor=3)
+        self.start = timezone.localdate()
+        self.stay = book_reservation(new_reservation(make_guest(), self.rooms[0], self.start + timedelta(days=2), nights=3))['reservation']
+
+    def test_pages_of_floors_follow_the_last_floor_shown(self):
+        first = build_tape_chart(self.start, 7, floor_limit=2)
+        self.assertEqual([row['floor'] for row in first['rows']], [1, 1, 2])
+        self.assertEqual(first['next_floor'], 2)
+
+        second = build_tape_chart(self.start, 7, after_floor=first['next_floor'], floor_limit=2)
+        self.assertEqual([row['room_number'] for row in second['rows']], ['301'])
+        self.assertIsNone(second['next_floor'])
+
+    def test_cells_cover_every_night_once(self):
+        with self.assertNumQueries(3):
+            chart = build_tape_chart(self.start, 7, floor_limit=5)
+        cells = chart['rows'][0]['cells']
+        self.assertEqual([(cell['offset'], cell['span']) for cell in cells], [(0, 2), (2, 3), (5, 2)])
+        self.assertEqual(cells[1]['reservation']['id'], str(self.stay.id))
+        for row in chart['rows']:
+            self.assertEqual(sum(cell['span'] for cell in row['cells']), 7)
+
+    def test_json_page(self):
+        user = CustomUser.objects.create_user(username='desk', password='pw', role='receptionist')
+        self.client.force_login(user)
+        response = self.client.get(reverse('tape_chart'), {
+            'format': 'json', 'start': self.start.isoformat(), 'days': 3, 'floors': 1, 'after_floor': 1,
+        })
+        data = response.json()
+        self.assertEqual(len(data['dates']), 3)
+        self.assertEqual([row['room_number'] for row in data['rows']], ['201'])
+        self.assertEqual(data['next_floor'], 2)
+
+
+class AvailabilityEngineTests(TestCase):
+    def setUp(self):
+        self.singles = make_rooms(2)
+        self.double = make_rooms(1, room_type='double', floor=2)[0]
+        self.today = timezone.localdate()
+        self.guest = make_guest()
+        book_reservation(new_reservation(self.guest, self.singles[0], self.today + timedelta(days=1), nights=3))
+        patcher = mock.patch.object(availability, '_engine', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def engine(self):
+        engine = AvailabilityEngine(horizon=30)
+        engine.rebuild()
+        return engine
+
+    def test_matrix_answers_match_room_nights(self):
+        engine = self.engine()
+        stay = (self.today + timedelta(days=2), self.today + timedelta(days=3))
+        self.assertFalse(engine.is_free(self.singles[0].id, *stay))
+        self.assertTrue(engine.is_free(self.singles[0].id, self.today, self.today + timedelta(days=1)))
+        self.assertEqual(engine.available_room_ids(*stay, room_type='single'), [self.singles[1].id])
+        self.assertEqual(engine.count_free_by_room_type(*stay), {'double': 1, 'single': 1})
+        self.assertEqual(engine.first_free_date(2, room_id=self.singles[0].id), self.today + timedelta(days=4))
+        # Outside the horizon the callers fall back to the database
+        self.assertIsNone(engine.is_free(self.double.id, self.today, self.today + timedelta(days=31)))
+
+    def test_patches_arriving_during_a_rebuild_are_kept(self):
+        engine = self.engine()
+        stay = (self.today + timedelta(days=5), self.today + timedelta(days=7))
+        nights = RoomNight.objects.filter(date__gte=self.today).values_list('room_id', 'date')
+
+        def read_then_book(chunk_size):
+            yield from nights
+            # Another request commits a booking after the rebuild has read RoomNight
+            engine.book(self.double.id, *stay)
+
+        room_nights = mock.Mock()
+        room_nights.objects.filter.return_value.values_list.return_value.iterator.side_effect = read_then_book
+        with mock.patch('reservations.availability.RoomNight', room_nights):
+            engine.rebuild()
+        self.assertFalse(engine.is_free(self.double.id, *stay))
+
+    def test_changes_committed_by_another_process_trigger_a_rebuild(self):
+        engine = get_availability_engine()
+        stay = (self.today + timedelta(days=10), self.today + timedelta(days=12))
+        self.assertTrue(engine.is_free(self.double.id, *stay))
+        # Sold elsewhere: the rows and the shared version change, this engine is not patched
+        reservation = new_reservation(make_guest('Tunde'), self.double, stay[0])
+        reservation.save()
+        RoomNight.objects.bulk_create([RoomNight(room=self.double, reservation=reservation, date=night) for night in stay_dates(*stay)])
+        bump_inventory_version()
+        self.assertFalse(get_availability_engine().is_free(self.double.id, *stay))
+
+    def test_inventory_version_is_kept_in_the_database(self):
+        engine = get_availability_engine()
+        version = InventoryVersion.objects.get().version
+        self.assertEqual(engine.version, version)
+        # A per-process cache must not hide another worker's bump
+        cache.clear()
+        self.assertEqual(bump_inventory_version(), version + 1)
+        self.assertEqual(InventoryVersion.objects.get().version, version + 1)
+        get_availability_engine()
+        self.assertEqual(engine.version, version + 1)
+
+    def test_booking_rechecks_room_nights_when_the_engine_lags(self):
+        engine = self.engine()
+        stay = (self.today + timedelta(days=10), self.today + timedelta(days=12))
+        RoomNight.objects.create(room=self.double, reservation=Reservation.objects.get(), date=stay[0])
+        self.assertTrue(engine.is_free(self.double.id, *stay))
+        result = book_reservation(new_reservation(make_guest('Tunde'), self.double, stay[0]))
+        self.assertEqual(result['reason'], 'conflict')
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    def test_competing_bookings_for_the_same_nights_sell_the_room_once(self):
+        room = make_rooms(1)[0]
+        guests = [make_guest('Ada'), make_guest('Tunde')]
+        check_in = timezone.localdate() + timedelta(days=5)
+        start = threading.Barrier(len(guests))
+        results, errors = [], []
+
+        def worker(guest):
+            try:
+                start.wait()
+                results.append(book_reservation(new_reservation(guest, room, check_in, nights=3)))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(guest,)) for guest in guests]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(result['ok'] for result in results), [False, True])
+        refused = next(result for result in results if not result['ok'])
+        self.assertEqual(refused['reason'], 'conflict')
+        self.assertEqual(len(refused['conflicts']), 1)
+        self.assertEqual(Reservation.objects.count(), 1)
+        self.assertEqual(RoomNight.objects.filter(room=room).count(), 3)
+
+
+class OverlapTests(TestCase):
+    def overlapping_stays(self):
+        first, second, other_type = make_rooms(2) + make_rooms(1, room_type='double', floor=2)
+        check_in = timezone.localdate()
+        kept = new_reservation(make_guest('Ada'), first, check_in, nights=3)
+        kept.save()
+        moved = new_reservation(make_guest('Tunde'), first, check_in + timedelta(days=1), nights=3)
+        moved.save()
+        # The legacy backfill gave the shared nights to whichever stay came first
+        RoomNight.objects.bulk_create([
+            RoomNight(room=first, reservation=moved, date=check_in + timedelta(days=i)) for i in range(1, 4)
+        ])
+        return kept, moved, second
+
+    def test_migration_lists_overlaps_without_moving_anyone(self):
+        kept, moved, _ = self.overlapping_stays()
+        with self.assertRaisesMessage(RuntimeError, f'{moved.id} (confirmed'):
+            no_overlap_migration.check_overlaps(apps, connection.schema_editor())
+        moved.refresh_from_db()
+        self.assertEqual(moved.room, kept.room)
+
+    def test_command_moves_overlapping_confirmed_stay_to_a_free_room_of_its_type(self):
+        kept, moved, second = self.overlapping_stays()
+        output = StringIO()
+        call_command('resolve_overlapping_reservations', '--dry-run', stdout=output)
+        self.assertIn(f'Would move reservation {moved.id}', output.getvalue())
+        self.assertEqual(Reservation.objects.get(pk=moved.pk).room, kept.room)
+
+        call_command('resolve_overlapping_reservations', stdout=StringIO())
+        moved.refresh_from_db()
+        self.assertEqual(moved.room, second)
+        self.assertEqual(RoomNight.objects.filter(reservation=moved, room=second).count(), 3)
+        self.assertEqual(RoomNight.objects.filter(reservation=kept, room=kept.room).count(), 3)
+        self.assertEqual(find_overlaps(), [])
+        no_overlap_migration.check_overlaps(apps, connection.schema_editor())
+
+    def test_checked_in_guest_keeps_the_room_and_unmovable_stays_are_reported(self):
+        room = make_rooms(1)[0]
+        check_in = timezone.localdate()
+        confirmed = new_reservation(make_guest('Ada'), room, check_in, nights=3)
+        confirmed.save()
+        in_house = new_reservation(make_guest('Tunde'), room, check_in + timedelta(days=1), status='checked_in')
+        in_house.save()
+
+        moved, unresolved = reassign_overlaps()
+        self.assertEqual(moved, [])
+        self.assertEqual([(kept['id'], other['id']) for kept, other in unresolved], [(in_house.id, confirmed.id)])
+        confirmed.refresh_from_db()
+        self.assertEqual(confirmed.room, room)
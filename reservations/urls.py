@@ -5,11 +5,14 @@ from . import views
 urlpatterns = [
     path('', views.reservation_list, name='reservation_list'),
     path('create/', views.create_reservation, name='create_reservation'),
+    path('groups/create/', views.create_group_booking, name='create_group_booking'),
     path('<uuid:pk>/', views.reservation_detail, name='reservation_detail'),
     path('<uuid:pk>/check-in/', views.check_in, name='check_in'),
     path('<uuid:pk>/check-out/', views.check_out, name='check_out'),
     path('<uuid:pk>/cancel/', views.cancel_reservation, name='cancel_reservation'),
     path('arrivals/today/', views.daily_arrivals, name='daily_arrivals'),
     path('departures/today/', views.daily_departures, name='daily_departures'),
+    path('tape-chart/', views.tape_chart, name='tape_chart'),
+    path('availability/', views.room_availability, name='room_availability'),
     path('initiate-payment/<uuid:pk>/', views.initiate_checkin_payment, name='initiate_checkin_payment'),
 ]
\ No newline at end of file
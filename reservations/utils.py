@@ -1,5 +1,14 @@
+from datetime import timedelta
 from django.core.mail import send_mail
+from django.db import transaction
 from hotel_pms import settings as SETTINGS
+from rooms.models import Room
+from .models import RoomNight
+
+# Reservations in these states hold their room for every night of the stay.
+HOLDING_STATUSES = ['confirmed', 'checked_in']
+# Rooms in these states cannot be sold regardless of the inventory.
+UNSELLABLE_ROOM_STATUSES = ['maintenance', 'blocked']
 
 def send_notification(subject, message,receiver):
     send_mail(
@@ -8,4 +17,166 @@ def send_notification(subject, message,receiver):
         from_email=SETTINGS.DEFAULT_FROM_EMAIL,   
         recipient_list=[receiver],
         fail_silently=False,
-    )
\ No newline at end of file
+    )
+
+def group_confirmation_message(group, reservations):
+    rooms = ', '.join(sorted(reservation.room.room_number for reservation in reservations))
+    subject = f"Group Booking Confirmed – {group.name}"
+    message = f"""
+    Hello {group.contact_guest.first_name} {group.contact_guest.last_name},
+
+    Your group booking "{group.name}" has been confirmed.
+
+    Rooms booked: {len(reservations)}
+    Room Numbers: {rooms}
+    Check in Date: {group.check_in_date}
+    Check out Date: {group.check_out_date} at 12:00pm
+
+    Please send your rooming list to the front desk before arrival.
+
+    Thank you for choosing our hotel. We look forward to hosting your group.
+    """
+    return subject, message
+
+def stay_dates(check_in, check_out):
+    return [check_in + timedelta(days=i) for i in range((check_out - check_in).days)]
+
+def hold_room_nights(reservation):
+    nights = [
+        RoomNight(room_id=reservation.room_id, reservation=reservation, date=night)
+        for night in stay_dates(reservation.check_in_date, reservation.check_out_date)
+    ]
+    created = RoomNight.objects.bulk_create(nights)
+    sync_availability_engine('book', reservation.room_id, reservation.check_in_date, reservation.check_out_date)
+    return created
+
+def release_room_nights(reservation, from_date=None):
+    nights = reservation.room_nights.all()
+    check_in = reservation.check_in_date
+    if from_date is not None:
+        nights = nights.filter(date__gte=from_date)
+        check_in = max(check_in, from_date)
+    released = nights.delete()[0]
+    sync_availability_engine('release', reservation.room_id, check_in, reservation.check_out_date)
+    return released
+
+def sync_availability_engine(action, room_id, check_in, check_out):
+    # Patch the in-memory availability engines once the inventory change is committed.
+    from . import availability
+    transaction.on_commit(lambda: availability.inventory_changed(action, room_id, check_in, check_out))
+
+def booked_room_ids(check_in, check_out):
+    return RoomNight.objects.filter(
+        date__gte=check_in,
+        date__lt=check_out
+    ).values('room_id')
+
+def get_available_rooms(check_in, check_out, room_type=None):
+    rooms = Room.objects.exclude(
+        status__in=UNSELLABLE_ROOM_STATUSES
+    ).exclude(id__in=booked_room_ids(check_in, check_out))
+    if room_type:
+        rooms = rooms.filter(room_type__name=room_type)
+    return rooms
+
+def find_available_rooms(check_in, check_out, room_type=None):
+    from .availability import get_availability_engine
+    room_ids = get_availability_engine().available_room_ids(check_in, check_out, room_type=room_type)
+    if room_ids is None:
+        return get_available_rooms(check_in, check_out, room_type=room_type)
+    return Room.objects.filter(id__in=room_ids)
+
+def is_room_available(room, check_in, check_out):
+    from .availability import get_availability_engine
+    free = get_availability_engine().is_free(room.id, check_in, check_out)
+    if free is not None:
+        return free
+    return not RoomNight.objects.filter(
+        room=room,
+        date__gte=check_in,
+        date__lt=check_out
+    ).exists()
+
+# Reservation statuses drawn on the tape chart.
+TAPE_CHART_STATUSES = ['confirmed', 'checked_in', 'checked_out']
+
+def build_tape_chart(start, days, after_floor=None, floor_limit=5):
+    """
+    Rooms x dates grid for `days` nights from `start`, one page of floors at
+    a time (keyset paging on floor). Uses one query for the page of floors,
+    one for its rooms and one range query for the reservations, then a
+    single sweep over the reservations sorted by room and arrival.
+    """
+    from .models import Reservation
+    end = start + timedelta(days=days)
+
+    floors = Room.objects.order_by('floor').values_list('floor', flat=True).distinct()
+    if after_floor is not None:
+        floors = floors.filter(floor__gt=after_floor)
+    floors = list(floors[:floor_limit + 1])
+    next_floor = floors[floor_limit - 1] if len(floors) > floor_limit else None
+    floors = floors[:floor_limit]
+
+    rooms = list(
+        Room.objects.filter(floor__in=floors)
+        .order_by('floor', 'room_number')
+        .values('id', 'room_number', 'floor', 'status', 'room_type__name')
+    )
+    reservations = (
+        Reservation.objects.filter(
+            room__floor__in=floors,
+            status__in=TAPE_CHART_STATUSES,
+            check_in_date__lt=end,
+            check_out_date__gt=start,
+        )
+        .order_by('room_id', 'check_in_date')
+        .values('id', 'room_id', 'check_in_date', 'check_out_date', 'status',
+                'guest__first_name', 'guest__last_name')
+    )
+
+    bookings_by_room = {}
+    for booking in reservations:
+        first = max((booking['check_in_date'] - start).days, 0)
+        last = min((booking['check_out_date'] - start).days, days)
+        cells = bookings_by_room.setdefault(booking['room_id'], [])
+        # Legacy overlaps: never draw a bar over a night already on the chart.
+        position = cells[-1]['offset'] + cells[-1]['span'] if cells else 0
+        first = max(first, position)
+        if first >= last:
+            continue
+        if first > position:
+            cells.append({'offset': position, 'span': first - position, 'reservation': None})
+        cells.append({
+            'offset': first,
+            'span': last - first,
+            'reservation': {
+                'id': str(booking['id']),
+                'guest': f"{booking['guest__first_name']} {booking['guest__last_name']}",
+                'status': booking['status'],
+                'check_in_date': booking['check_in_date'].isoformat(),
+                'check_out_date': booking['check_out_date'].isoformat(),
+            },
+        })
+
+    rows = []
+    for room in rooms:
+        cells = bookings_by_room.get(room['id'], [])
+        position = cells[-1]['offset'] + cells[-1]['span'] if cells else 0
+        if position < days:
+            cells.append({'offset': position, 'span': days - position, 'reservation': None})
+        rows.append({
+            'id': str(room['id']),
+            'room_number': room['room_number'],
+            'floor': room['floor'],
+            'status': room['status'],
+            'room_type': room['room_type__name'],
+            'cells': cells,
+        })
+
+    return {
+        'start': start,
+        'end': end,
+        'dates': stay_dates(start, end),
+        'rows': rows,
+        'next_floor': next_floor,
+    }
@@ -1,18 +1,25 @@
 # reservations/views.py
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Q
-from datetime import timedelta
+from django.http import JsonResponse
+from datetime import datetime, timedelta
+import uuid
 from core.decorators import role_required
+from core.utils import hotel_today
 from .models import Reservation, ReservationAddon
-from .forms import ReservationForm, CheckInForm, CheckOutForm
+from .forms import ReservationForm, CheckInForm, CheckOutForm, GroupBookingForm
 from rooms.models import Room
 from billing.models import Folio,FolioLineItem, Payment
-from analytics.utils import update_daily_metrics
+from analytics.utils import apply_metrics_delta, occupancy_delta
 
-from .utils import send_notification
+from .booking import book_reservation, book_group
+from .utils import send_notification, group_confirmation_message, release_room_nights, find_available_rooms, build_tape_chart
+from .availability import get_availability_engine
 
 
 @login_required(login_url='login')
@@ -20,11 +27,19 @@ from .utils import send_notification
 def reservation_list(request):
     status_filter = request.GET.get('status', '')
     search = request.GET.get('search', '')
+    group_filter = request.GET.get('group', '')
     
     reservations = Reservation.objects.select_related('guest', 'room').order_by('-created_at')
     
     if status_filter:
         reservations = reservations.filter(status=status_filter)
+
+    if group_filter:
+        try:
+            reservations = reservations.filter(group_id=uuid.UUID(group_filter))
+        except ValueError:
+            # Not a group id (a mangled link); list everything instead of failing
+            group_filter = ''
     
     if search:
         reservations = reservations.filter(
@@ -39,6 +54,7 @@ def reservation_list(request):
         'reservations': reservations,
         'status_filter': status_filter,
         'search': search,
+        'group_filter': group_filter,
         'status_choices': Reservation.STATUS_CHOICES,
     }
     return render(request, 'reservations/reservation_list.html', context)
@@ -61,10 +77,10 @@ def create_reservation(request):
             if guest > room_max:
                  messages.warning(request, f'Max Occupancy Reached, Current listed guests is {guest}. This room can hold {room_max}, consider other Room Types ')
                  return redirect('create_reservation')
-            reservation.save()
-            room = reservation.room
-            room.status ="reserved"
-            room.save()
+            result = book_reservation(reservation)
+            if not result['ok']:
+                messages.error(request, result['message'])
+                return redirect('create_reservation')
             messages.success(request, f'Reservation created successfully for {reservation.guest.first_name}')
             try:
                 subject = f"Rerservation Created Successfully"
@@ -96,6 +112,38 @@ def create_reservation(request):
     return render(request, 'reservations/create_reservation.html', context)
 
 
+@login_required(login_url='login')
+@role_required(['admin', 'manager', 'receptionist'])
+def create_group_booking(request):
+    if request.method == 'POST':
+        form = GroupBookingForm(request.POST)
+        if form.is_valid():
+            group = form.save(commit=False)
+            result = book_group(
+                group,
+                form.room_requests(),
+                guests_per_room=form.cleaned_data['guests_per_room'],
+                created_by=request.user,
+            )
+            if result['ok']:
+                messages.success(request, result['message'])
+                try:
+                    subject, message = group_confirmation_message(group, result['reservations'])
+                    send_notification(subject, message, receiver=group.contact_guest.email)
+                except:
+                    print("cannot send email")
+                return redirect(f"{reverse('reservation_list')}?group={group.pk}")
+            messages.error(request, result['message'])
+    else:
+        form = GroupBookingForm()
+
+    context = {
+        'title': 'Create Group Booking',
+        'form': form,
+    }
+    return render(request, 'reservations/create_group_booking.html', context)
+
+
 @login_required(login_url='login')
 @role_required(['admin', 'manager', 'receptionist'])
 def reservation_detail(request, pk):
@@ -137,14 +185,19 @@ def check_in(request, pk):
     if request.method == 'POST':
         form = CheckInForm(request.POST)
         if form.is_valid():
-            reservation.status = 'checked_in'
-            reservation.checked_in_at = timezone.now()
-            reservation.save()
-            
-            reservation.room.status = 'occupied'
-            reservation.room.save()
+            with transaction.atomic():
+                reservation.status = 'checked_in'
+                reservation.checked_in_at = timezone.now()
+                reservation.save()
+
+                reservation.room.status = 'occupied'
+                reservation.room.save()
 
-            update_daily_metrics()
+                apply_metrics_delta(
+                    check_ins=1,
+                    guest_count=reservation.number_of_guests + reservation.number_of_children,
+                    **occupancy_delta(1)
+                )
             
             messages.success(
                 request, 
@@ -212,14 +265,20 @@ def check_out(request, pk):
     if request.method == 'POST':
         form = CheckOutForm(request.POST)
         if form.is_valid():
-            reservation.status = 'checked_out'
-            reservation.checked_out_at = timezone.now()
-            reservation.save()
-            
-            reservation.room.status = 'cleaning'
-            reservation.room.save()
-            
-            update_daily_metrics()
+            with transaction.atomic():
+                reservation.status = 'checked_out'
+                reservation.checked_out_at = timezone.now()
+                reservation.save()
+                release_room_nights(reservation, from_date=hotel_today())
+
+                reservation.room.status = 'cleaning'
+                reservation.room.save()
+
+                apply_metrics_delta(
+                    check_outs=1,
+                    guest_count=-(reservation.number_of_guests + reservation.number_of_children),
+                    **occupancy_delta(-1)
+                )
             
             messages.success(
                 request, 
@@ -263,13 +322,15 @@ def cancel_reservation(request, pk):
     reservation = get_object_or_404(Reservation, pk=pk)
     if request.method == 'POST':
         if reservation.status not in ['checked_in', 'checked_out']:
-            reservation.status = 'cancelled'
-            reservation.save()
-            
-            if reservation.room.status == 'occupied' or reservation.room.status=='reserved':
-                reservation.room.status = 'available'
-                reservation.room.save()
-            update_daily_metrics()
+            with transaction.atomic():
+                reservation.status = 'cancelled'
+                reservation.save()
+                release_room_nights(reservation)
+
+                if reservation.room.status == 'occupied' or reservation.room.status=='reserved':
+                    reservation.room.status = 'available'
+                    reservation.room.save()
+                apply_metrics_delta(cancellations=1)
             
             messages.success(request, 'Reservation cancelled successfully')
         else:
@@ -311,6 +372,67 @@ def daily_departures(request):
     }
     return render(request, 'reservations/daily_departures.html', context)
 
+@login_required(login_url='login')
+@role_required(['admin', 'manager', 'receptionist'])
+def room_availability(request):
+    try:
+        check_in = datetime.strptime(request.GET.get('check_in', ''), '%Y-%m-%d').date()
+        check_out = datetime.strptime(request.GET.get('check_out', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return JsonResponse({'error': 'check_in and check_out must be dates in YYYY-MM-DD format.'}, status=400)
+    if check_in >= check_out:
+        return JsonResponse({'error': 'Check-out date must be after check-in date.'}, status=400)
+
+    room_type = request.GET.get('room_type') or None
+    rooms = find_available_rooms(check_in, check_out, room_type=room_type)
+    rooms = rooms.order_by('floor', 'room_number').values('id', 'room_number', 'floor', 'room_type__name', 'price_per_night')
 
-    
-    
+    return JsonResponse({
+        'check_in': check_in.isoformat(),
+        'check_out': check_out.isoformat(),
+        'free_by_room_type': get_availability_engine().count_free_by_room_type(check_in, check_out),
+        'rooms': [
+            {
+                'id': str(room['id']),
+                'room_number': room['room_number'],
+                'floor': room['floor'],
+                'room_type': room['room_type__name'],
+                'price_per_night': float(room['price_per_night']),
+            }
+            for room in rooms
+        ],
+    })
+
+@login_required(login_url='login')
+@role_required(['admin', 'manager', 'receptionist'])
+def tape_chart(request):
+    try:
+        start = datetime.strptime(request.GET.get('start', ''), '%Y-%m-%d').date()
+    except ValueError:
+        start = hotel_today()
+    try:
+        days = min(max(int(request.GET.get('days', 30)), 1), 90)
+        floor_limit = min(max(int(request.GET.get('floors', 5)), 1), 50)
+        after_floor = int(request.GET['after_floor']) if request.GET.get('after_floor') else None
+    except ValueError:
+        return JsonResponse({'error': 'days, floors and after_floor must be whole numbers.'}, status=400)
+
+    chart = build_tape_chart(start, days, after_floor=after_floor, floor_limit=floor_limit)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'start': chart['start'].isoformat(),
+            'end': chart['end'].isoformat(),
+            'dates': [night.isoformat() for night in chart['dates']],
+            'rows': chart['rows'],
+            'next_floor': chart['next_floor'],
+        })
+
+    context = {
+        'title': 'Tape Chart',
+        'chart': chart,
+        'days': days,
+        'floors': floor_limit,
+        'start': start,
+    }
+    return render(request, 'reservations/tape_chart.html', context)